@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+# 合成 APlog 抓取目录，用于基准测试和回归对比：
+# 按固定随机种子生成 kernel_log / main_log / sys_log / radio_log / events_log，
+# 其中一部分行是各解析脚本查找的格式（MTK_BH、orignal batt_temp、wmt_dev_tm_temp_query、
+# Cpus Usage、healthd、rssi、[LTE] dbm、网络类型变化、ANR 等），其余为噪声行。
+# kernel_log 为原始格式（开机时间 + android time 同步点），与真实抓取一样需要边读边换算本地时间。
+# 同样的参数总是生成完全相同的文件；生成的行数、字节数和各规则命中数写在 MANIFEST_NAME 中。
+
+CAPTURE_TIME = '2024_1021_140300'
+START = datetime(2024, 10, 21, 14, 3, 0)
+MANIFEST_NAME = 'aplog_manifest.json'
+GENERATOR_VERSION = 2
+# 各文件占总大小的比例
+DEFAULT_SHARES = {'kernel_log': 0.35, 'main_log': 0.35, 'sys_log': 0.15, 'radio_log': 0.1, 'events_log': 0.05}
+# 解析脚本关心的行占全部行的比例
+DEFAULT_HIT_RATE = 0.02
+# 日志覆盖的时长（秒）
+DEFAULT_DURATION = 3600
+# kernel_log 每隔多少行输出一次 android time 同步点
+SYNC_EVERY = 20000
+# 第一批行的时间步长按这个平均行长（字节）估算，之后按这个文件已写出的实际平均行长校正
+AVERAGE_LINE_BYTES = 110
+BATCH = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _cpu_usage(rng):
+    usage = [rng.randint(0, 100) for _ in range(8)]
+    return "Cpus Usage [{}], [{}], [{}], [{}], [{}] [{}], [{}], [{}]".format(*usage)
+
+
+# 每种日志的命中行：(规则名, 权重, 生成消息的函数)；消息函数的参数为 (rng, 当前时间)
+KERNEL_HITS = [
+    ('mtk_bh', 3, lambda rng, now: f"MTK_BH: bat_id=1 vbat=3950 tmp:{rng.randint(300, 450)} {rng.randint(300, 450)} {rng.randint(300, 450)}"),
+    ('batt_temp_kernel', 3, lambda rng, now: f"[battery] orignal batt_temp = {rng.randint(250, 450)}"),
+    ('wmt', 1, lambda rng, now: f"[WMT-DEV]wmt_dev_tm_temp_query: current_temp = 0x{rng.randint(0x20, 0x40):x}"),
+    ('healthd', 2, lambda rng, now: f"healthd: battery l={rng.randint(1, 100)} v={rng.randint(3500, 4400)} t={rng.randint(250, 450) / 10:.1f} h=2 st=3 chg=u"),
+    ('cpu_usage', 4, lambda rng, now: _cpu_usage(rng)),
+    ('touch', 4, lambda rng, now: f"touch_report info: touch {rng.choice(('down', 'up'))}[res:8] :Finger 0: x = {rng.randint(0, 1080)}, y = {rng.randint(0, 2400)}"),
+    ('fps', 1, lambda rng, now: f"[DISP][fps]: drm_invoke_fps_chg_callbacks,new_fps ={rng.choice((60, 90, 120))}"),
+    ('perf_start', 1, lambda rng, now: f"[K][Perf] TRAN Perf Statistic start ({now.strftime('%m-%d %H:%M:%S')})"),
+]
+MAIN_HITS = [
+    ('battery_main', 3, lambda rng, now: f"BatteryLabService: current level == {rng.randint(1, 100)}, temperature == {rng.randint(250, 450)}"),
+    ('cellular_signal', 4, lambda rng, now: f"TranSignalStrengthComponentImpl: [LTE] dbm: -{rng.randint(60, 120)}"),
+    ('wifi_signal', 4, lambda rng, now: f"TranWifiSmartAssistantController: ====>>rssi :-{rng.randint(30, 90)}"),
+    ('network_type', 1, lambda rng, now: f"NetworkStatusMonitor: onNetworkTypeChanged {rng.choice(('LTE', 'NR', 'WIFI'))} => {rng.choice(('LTE', 'NR', 'WIFI'))}"),
+    ('backlight', 2, lambda rng, now: f"LightsService: write {rng.randint(0, 255)} to /sys/class/leds/lcd-backlight/brightness"),
+    ('anr_warning', 1, lambda rng, now: "InputDispatcher: [ANR Warning] Input dispatching timed out"),
+    ('app_not_responding', 1, lambda rng, now: "ActivityManager: Input event dispatching timed out, application is not responding"),
+]
+SYS_HITS = [
+    ('wifi_signal', 3, MAIN_HITS[2][2]),
+    ('cellular_signal', 2, MAIN_HITS[1][2]),
+    ('network_type', 1, MAIN_HITS[3][2]),
+]
+RADIO_HITS = [
+    ('cellular_signal', 1, MAIN_HITS[1][2]),
+]
+EVENTS_HITS = [
+    ('am_anr', 1, lambda rng, now: f"am_anr: [0,{rng.randint(1000, 30000)},com.example.app,952745540,Input dispatching timed out]"),
+]
+
+KERNEL_NOISE = [
+    lambda rng: f"binder: {rng.randint(100, 9999)}:{rng.randint(100, 9999)} transaction failed 29189/-22, size 0-0 line 3071",
+    lambda rng: f"[name:spm&][SPM] md_settle = {rng.randint(0, 99)}, settle = {rng.randint(0, 99)}",
+    lambda rng: f"kworker/u16:{rng.randint(0, 9)}: lowmem_reserve[]: 0 {rng.randint(0, 9999)} {rng.randint(0, 9999)}",
+]
+TEXT_NOISE = [
+    lambda rng: f"ActivityTaskManager: START u0 {{flg=0x10000000 cmp=com.example/.Main{rng.randint(0, 99)}}} from uid {rng.randint(1000, 20000)}",
+    lambda rng: f"WindowManager: Changing focus from Window{{{rng.randrange(1 << 28):x} u0 com.example}} to null",
+    lambda rng: f"PowerManagerService: Waking up from Asleep (uid={rng.randint(1000, 1999)}, reason=WAKE_REASON_POWER_BUTTON)",
+    lambda rng: f"chatty  : uid={rng.randint(1000, 20000)} system_server expire {rng.randint(1, 99)} lines",
+]
+EVENTS_NOISE = [
+    lambda rng: f"am_proc_start: [0,{rng.randint(1000, 30000)},10{rng.randint(100, 999)},com.example.app,activity,com.example/.Main]",
+    lambda rng: f"am_focused_stack: [0,{rng.randint(0, 9)},{rng.randint(0, 9)},reason]",
+]
+
+LOG_KINDS = {
+    'kernel_log': (KERNEL_HITS, KERNEL_NOISE),
+    'main_log': (MAIN_HITS, TEXT_NOISE),
+    'sys_log': (SYS_HITS, TEXT_NOISE),
+    'radio_log': (RADIO_HITS, TEXT_NOISE),
+    'events_log': (EVENTS_HITS, EVENTS_NOISE),
+}
+
+
+def log_file_name(kind):
+    return f"{kind}_1__{CAPTURE_TIME}"
+
+
+class _Clock:
+    # 按固定步长推进的本地时间，"MM-DD HH:MM:SS" 同一秒只格式化一次
+    def __init__(self, step_us):
+        self.us = (START - _EPOCH) // timedelta(microseconds=1)
+        self.step_us = max(int(step_us), 1)
+        self.second = None
+        self.head = None
+
+    def tick(self):
+        self.us += self.step_us
+        second, fraction = divmod(self.us, 1000000)
+        if second != self.second:
+            self.second = second
+            self.now = _EPOCH + timedelta(seconds=second)
+            self.head = self.now.strftime('%m-%d %H:%M:%S')
+        return fraction
+
+
+def write_log(path, kind, target_bytes, hit_rate, duration, seed):
+    # 返回 {'bytes', 'lines', 'hits': {规则名: 行数}}
+    # 各种日志的行长差别很大（kernel_log 的行比 main_log 短得多），按固定行长算步长时覆盖的时长会偏离 duration；
+    # 每批之前用已写出的实际平均行长重新估算剩余行数，把剩余时长均分给它们，写满 target_bytes 时正好到 duration
+    hits, noise = LOG_KINDS[kind]
+    rng = random.Random(f"{seed}:{kind}")
+    names = [name for name, _, _ in hits]
+    weights = [weight for _, weight, _ in hits]
+    makers = {name: make for name, _, make in hits}
+    clock = _Clock(duration * 1000000 * AVERAGE_LINE_BYTES / max(target_bytes, 1))
+    start_us = clock.us
+    end_us = start_us + duration * 1000000
+    counts = dict.fromkeys(names, 0)
+    written = 0
+    lines = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        while written < target_bytes:
+            line_bytes = written / lines if lines else AVERAGE_LINE_BYTES
+            remaining = max(round((target_bytes - written) / line_bytes), 1)
+            clock.step_us = max((end_us - clock.us) // remaining, 1)
+            batch = []
+            for _ in range(min(remaining, BATCH)):
+                fraction = clock.tick()
+                if rng.random() < hit_rate:
+                    name = rng.choices(names, weights)[0]
+                    counts[name] += 1
+                    message = makers[name](rng, clock.now)
+                else:
+                    message = rng.choice(noise)(rng)
+                if kind == 'kernel_log':
+                    uptime = (clock.us - start_us) / 1000000 + 5
+                    if lines % SYNC_EVERY == 0:
+                        wall = (_EPOCH + timedelta(microseconds=clock.us)).strftime('%Y-%m-%d %H:%M:%S.%f')
+                        batch.append(f"<6>[{uptime:12.6f}][T1] android time {wall}\n")
+                    batch.append(f"<6>[{uptime:12.6f}][T{rng.randint(1, 9999)}] {message}\n")
+                else:
+                    pid = rng.randint(500, 30000)
+                    batch.append(f"{clock.head}.{fraction:06d} {pid:5d} {pid + rng.randint(0, 50):5d} {rng.choice('VDIWE')} {message}\n")
+                lines += 1
+            text = ''.join(batch)
+            file.write(text)
+            written += len(text.encode('utf-8'))
+    with open(path, 'rb') as file:
+        line_count = sum(chunk.count(b'\n') for chunk in iter(lambda: file.read(1 << 20), b''))
+    return {'bytes': os.path.getsize(path), 'lines': line_count, 'hits': counts}
+
+
+def generate_capture(folder, size_mb=100, hit_rate=DEFAULT_HIT_RATE, shares=None, duration=DEFAULT_DURATION, seed=0):
+    # 在 folder 下生成一个抓取目录的全部日志，返回 manifest；参数相同且文件已存在时直接复用
+    shares = shares or DEFAULT_SHARES
+    params = {'version': GENERATOR_VERSION, 'size_mb': size_mb, 'hit_rate': hit_rate, 'shares': shares,
+              'duration': duration, 'seed': seed}
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
+    manifest = load_manifest(folder)
+    if manifest is not None and manifest['params'] == params and all(
+            os.path.exists(os.path.join(folder, name)) for name in manifest['files']):
+        return manifest
+    os.makedirs(folder, exist_ok=True)
+    files = {}
+    for kind, share in shares.items():
+        name = log_file_name(kind)
+        files[name] = write_log(os.path.join(folder, name), kind, int(size_mb * share * 1024 * 1024), hit_rate, duration, seed)
+        files[name]['kind'] = kind
+    manifest = {'params': params, 'files': files}
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _parse_shares(text):
+    # "kernel_log=0.5,main_log=0.5"
+    shares = {}
+    for item in text.split(','):
+        kind, _, share = item.partition('=')
+        if kind.strip() not in LOG_KINDS:
+            raise argparse.ArgumentTypeError(f"未知的日志类型 {kind}，可用: {', '.join(LOG_KINDS)}")
+        shares[kind.strip()] = float(share)
+    return shares
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('--size', type=float, default=100, help='生成的日志总大小(MB)，默认 100')
+    parser.add_argument('--hit-rate', type=float, default=DEFAULT_HIT_RATE, help=f'解析规则命中行的比例，默认 {DEFAULT_HIT_RATE}')
+    parser.add_argument('--mix', type=_parse_shares, default=None,
+                        help='各日志占总大小的比例，例如 "kernel_log=0.5,main_log=0.3,sys_log=0.2"')
+    parser.add_argument('--duration', type=int, default=DEFAULT_DURATION, help=f'日志覆盖的时长(秒)，默认 {DEFAULT_DURATION}')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子，默认 0')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='生成合成的 APlog 抓取目录')
+    parser.add_argument('folder', help='输出目录')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    manifest = generate_capture(args.folder, args.size, args.hit_rate, args.mix, args.duration, args.seed)
+    for name, info in manifest['files'].items():
+        print(f"{name}: {info['bytes'] / 1024 ** 2:.1f} MB, {info['lines']:,} 行, 命中 {sum(info['hits'].values()):,} 行")
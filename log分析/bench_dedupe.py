@@ -0,0 +1,119 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from metric_rules import get_classifier, MetricExtractor, DEDUPE_WINDOW
+from series_store import SeriesStore
+
+# 时间戳去重的回归基准：
+# 原来的 process_temp_file 用一个全局的时间戳集合，同一微秒出现过任何一行之后，后面同一时间戳的行都跳过，
+# 不同指标恰好同一时间戳打印时会丢样本，集合还随文件大小一直增长；
+# 现在按 (规则, 时间戳) 去重，每条规则只记住最近 DEDUPE_WINDOW 个时间戳。
+# 生成基本有序的温度/CPU 日志行（部分行与上一行同一时间戳但属于不同指标，部分行原样重复打印，
+# 偶尔相邻两行顺序颠倒），对比两种方式保留的样本数、去重状态的内存和耗时。
+# 用法: python bench_dedupe.py [行数]，默认 200 万
+
+TEMP_RULE_NAMES = ('mtk_bh', 'batt_temp_kernel', 'wmt', 'battery_main', 'healthd', 'cpu_usage')
+LINES = {
+    'mtk_bh': "{ts} <6>[ 1234.5678][T123] MTK_BH: bat tmp:{v} {v} {v}",
+    'batt_temp_kernel': "{ts} <6>[ 1234.5678][T123] orignal batt_temp = {v}0",
+    'wmt': "{ts} <6>[ 1234.5678][T123] wmt_dev_tm_temp_query: current_temp = 0x{v:x}",
+    'battery_main': "{ts}  1000  1000 I BatteryLabService: current level == {v}, temperature == {v}0",
+    'healthd': "{ts} <6>[ 1234.5678][T123] healthd: battery l={v} v=4012 t={v}.5",
+    'cpu_usage': "{ts} <6>[ 1234.5678][T123] Cpus Usage [{v}], [{v}], [{v}], [{v}], [{v}] [{v}], [{v}], [{v}]",
+}
+# 与上一行同一时间戳的不同指标、原样重复的行、相邻两行颠倒的比例
+SAME_TIME_RATIO = 0.1
+REPEAT_RATIO = 0.02
+SWAP_RATIO = 0.01
+
+
+def make_lines(count, seed=1):
+    # 返回 (日志行, 应保留的样本数 = 不同的 (规则, 时间戳) 个数)
+    rng = random.Random(seed)
+    names = list(LINES)
+    lines = []
+    expected = set()
+    us = 0
+    previous = None
+    for _ in range(count):
+        roll = rng.random()
+        if previous is not None and roll < REPEAT_RATIO:
+            lines.append(previous)
+            continue
+        if previous is None or roll >= REPEAT_RATIO + SAME_TIME_RATIO:
+            us += rng.randint(1, 3000)
+        name = rng.choice(names)
+        second, micro = divmod(us, 1000000)
+        ts = f"10-21 {14 + second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.{micro:06d}"
+        previous = LINES[name].format(ts=ts, v=rng.randint(20, 60))
+        lines.append(previous)
+        expected.add((name, us))
+    for index in range(1, len(lines)):
+        if rng.random() < SWAP_RATIO:
+            lines[index - 1], lines[index] = lines[index], lines[index - 1]
+    return lines, len(expected)
+
+
+class GlobalSetExtractor(MetricExtractor):
+    # 基线：原来的去重方式，全局时间戳集合，本行的时间戳被任何一行用过就整行跳过
+    def __init__(self, names):
+        super().__init__(names, dedupe=False)
+        self.seen_timestamps = set()
+
+    def feed(self, lines, store):
+        seen = self.seen_timestamps
+        for line in lines:
+            timestamp = self.line_time(line)
+            if timestamp is None or timestamp in seen:
+                continue
+            seen.add(timestamp)
+            for name, match in self.classifier.match_all(line):
+                self._record(self.rules[name], match, timestamp, store)
+
+
+def run_global_set(lines):
+    extractor = GlobalSetExtractor(TEMP_RULE_NAMES)
+    extractor.feed(lines, SeriesStore())
+    return sum(extractor.counts.values()), extractor.seen_timestamps
+
+
+def run_extractor(lines):
+    extractor = MetricExtractor(TEMP_RULE_NAMES)
+    extractor.feed(lines, SeriesStore())
+    return sum(extractor.counts.values()), extractor.recent
+
+
+def measure(func, lines):
+    # 耗时和内存分开测（tracemalloc 会拖慢分配）；内存只统计去重状态本身，结果 SeriesStore 在返回前已经释放
+    start = time.perf_counter()
+    kept, state = func(lines)
+    elapsed = time.perf_counter() - start
+    del state
+    tracemalloc.start()
+    kept, state = func(lines)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    lines, expected = make_lines(count)
+    print(f"行数: {count:,}, 应保留样本: {expected:,}, 每条规则的去重窗口: {DEDUPE_WINDOW}")
+    results = {}
+    for name, func in (('全局时间戳集合', run_global_set), ('按规则滚动窗口', run_extractor)):
+        kept, state_bytes, elapsed = measure(func, lines)
+        results[name] = kept
+        print(f"{name}: 保留 {kept:,} 个样本（丢失 {expected - kept:,}）, "
+              f"去重状态 {state_bytes / 1024 ** 2:,.2f} MB, 耗时 {elapsed:.2f}s")
+    recovered = results['按规则滚动窗口'] - results['全局时间戳集合']
+    print(f"找回样本: {recovered:,}")
+    if results['按规则滚动窗口'] != expected:
+        print("警告：按规则去重后的样本数与预期不一致")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+import re
+import sys
+import time
+
+from metric_rules import get_classifier
+
+# 对比原来逐条 re.search 与单次分类引擎的吞吐量(行/秒)
+# 用法: python bench_line_classifier.py [行数]
+
+NOISE_LINES = [
+    "10-21 14:03:{s:02d}.{us:06d}  1234  1234 I ActivityManager: Start proc 1234:com.android.app/u0a12 for service {n}",
+    "10-21 14:03:{s:02d}.{us:06d}  2345  2345 D WindowManager: relayout window state appToken=Token{{abc}} hash={n}",
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] charger: online status changed to {n}",
+]
+MATCH_LINES = [
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] MTK_BH: bat tmp:35 36 37",
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] orignal batt_temp = 355",
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] wmt_dev_tm_temp_query: current_temp = 0x2a",
+    "10-21 14:03:{s:02d}.{us:06d}  1000  1000 I BatteryLabService: current level == 87, temperature == 312",
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] healthd: battery l=87 v=4012 t=31.2",
+    "10-21 14:03:{s:02d}.{us:06d} <6>[ 1234.5678][T123] Cpus Usage [12], [3], [45], [6], [7] [8], [9], [10]",
+]
+
+TEMP_RULE_NAMES = ('mtk_bh', 'batt_temp_kernel', 'wmt', 'battery_main', 'healthd', 'cpu_usage')
+
+# 基线：原脚本中 process_temp_file 的 if/continue 链
+BASELINE_PATTERNS = [
+    r'MTK_BH:.*tmp:(\d+) (\d+) (\d+)',
+    r'orignal batt_temp = (\d+)',
+    r'wmt_dev_tm_temp_query.*current_temp = (0x[0-9a-fA-F]+)',
+    r'BatteryLabService: current level == (\d+), temperature == (\d+)',
+    r'healthd: battery l=(\d+) v=\d+ t=([\d.]+)',
+    r'Cpus Usage \[(\d+)\], \[(\d+)\], \[(\d+)\], \[(\d+)\], \[(\d+)\] \[(\d+)\], \[(\d+)\], \[(\d+)\]',
+]
+
+
+def make_lines(count, match_ratio=0.01, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for n in range(count):
+        template = rng.choice(MATCH_LINES if rng.random() < match_ratio else NOISE_LINES)
+        lines.append(template.format(s=n % 60, us=n % 1000000, n=n))
+    return lines
+
+
+def run_baseline(lines):
+    hits = 0
+    for line in lines:
+        for pattern in BASELINE_PATTERNS:
+            if re.search(pattern, line):
+                hits += 1
+                break
+    return hits
+
+
+def run_classifier(lines):
+    classifier = get_classifier(TEMP_RULE_NAMES)
+    hits = 0
+    for line in lines:
+        if classifier.match(line) is not None:
+            hits += 1
+    return hits
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    lines = make_lines(count)
+    results = {}
+    for name, func in (('re.search 链', run_baseline), ('单次分类', run_classifier)):
+        start = time.perf_counter()
+        hits = func(lines)
+        elapsed = time.perf_counter() - start
+        results[name] = hits
+        print(f"{name}: {count / elapsed:,.0f} 行/秒, 命中 {hits} 行, 耗时 {elapsed:.2f}s")
+    if len(set(results.values())) != 1:
+        print("警告：两种方式命中行数不一致")
+
+
+if __name__ == "__main__":
+    main()
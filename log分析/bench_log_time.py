@@ -0,0 +1,61 @@
+import re
+import sys
+import time
+from datetime import datetime
+
+from log_time import parse_timestamp, to_datetime
+
+# 时间戳解析微基准：在合成的 kernel log 上对比 re.search + strptime 与 parse_timestamp
+# 默认 1000 万行，按批生成，不会一次性占用几 GB 内存
+# 用法: python bench_log_time.py [行数]
+
+BATCH = 100000
+LINE = "{mo:02d}-{d:02d} {h:02d}:{mi:02d}:{s:02d}.{us:06d} <6>[{up:10.6f}][T{tid}] kworker: some kernel message {n}"
+_OLD_RE = r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})'
+
+
+def synthetic_kernel_log(count):
+    # 每秒约 2000 行，接近实际 kernel log 的密度
+    for start in range(0, count, BATCH):
+        batch = []
+        for n in range(start, min(start + BATCH, count)):
+            sec = n // 2000
+            batch.append(LINE.format(mo=10, d=21 + sec // 86400 % 5, h=sec // 3600 % 24, mi=sec // 60 % 60,
+                                     s=sec % 60, us=n * 499 % 1000000, up=n / 2000, tid=n % 512, n=n))
+        yield batch
+
+
+def old_extract_timestamp(line):
+    match = re.search(_OLD_RE, line)
+    if match:
+        return datetime.strptime(match.group(1), '%m-%d %H:%M:%S.%f')
+    return None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    old_time = new_time = 0.0
+    checked = False
+    for batch in synthetic_kernel_log(count):
+        start = time.perf_counter()
+        old = [old_extract_timestamp(line) for line in batch]
+        old_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = [parse_timestamp(line) for line in batch]
+        new_time += time.perf_counter() - start
+
+        if not checked:
+            # 抽查第一批结果与 strptime 完全一致
+            if [to_datetime(us) for us in new] != old:
+                print("警告：parse_timestamp 与 strptime 结果不一致")
+            checked = True
+
+    print(f"行数: {count:,}")
+    print(f"re.search + strptime: {count / old_time:,.0f} 行/秒, 耗时 {old_time:.2f}s")
+    print(f"parse_timestamp:      {count / new_time:,.0f} 行/秒, 耗时 {new_time:.2f}s")
+    print(f"加速比: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import time
+
+from metric_rules import get_classifier
+from mmap_scan import scan_log, split_file
+
+# mmap 扫描基准：在合成的 .localtime kernel log 上对比
+# 文本模式逐行解码 + 分类 与 bytes 级锚点扫描 + 只解码命中行
+# 用法: python bench_mmap_scan.py [文件大小MB]，默认 1024MB，文件写在临时目录，测完删除
+
+TEMP_RULE_NAMES = ('mtk_bh', 'batt_temp_kernel', 'wmt', 'battery_main', 'healthd', 'cpu_usage')
+BATCH = 100000
+LINE = "10-21 {h:02d}:{mi:02d}:{s:02d}.{us:06d} <6>[{up:10.6f}][T{tid}] kworker: some kernel message {n}\n"
+HIT = "10-21 {h:02d}:{mi:02d}:{s:02d}.{us:06d} <6>[{up:10.6f}][T{tid}] orignal batt_temp = {n}\n"
+
+
+def write_synthetic_log(path, size):
+    # 约千分之一的行命中温度规则
+    n = 0
+    written = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        while written < size:
+            batch = []
+            for n in range(n, n + BATCH):
+                sec = n // 2000
+                template = HIT if n % 1000 == 0 else LINE
+                batch.append(template.format(h=sec // 3600 % 24, mi=sec // 60 % 60, s=sec % 60,
+                                             us=n * 499 % 1000000, up=n / 2000, tid=n % 512, n=n % 400))
+            n += 1
+            text = ''.join(batch)
+            file.write(text)
+            written += len(text)
+
+
+def text_scan(path, classifier):
+    hits = []
+    with open(path, 'r', encoding='utf-8', errors='ignore') as file:
+        for line in file:
+            hit = classifier.match(line)
+            if hit is not None:
+                hits.append(line)
+    return hits
+
+
+def mmap_scan(path, classifier, start=0, end=None):
+    hits = []
+    with scan_log(path, [rule.anchor for rule in classifier.rules], start, end) as lines:
+        for line in lines:
+            hit = classifier.match(line)
+            if hit is not None:
+                hits.append(line)
+    return hits
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    classifier = get_classifier(TEMP_RULE_NAMES)
+    fd, path = tempfile.mkstemp(suffix='.localtime')
+    os.close(fd)
+    try:
+        write_synthetic_log(path, size_mb * 1024 * 1024)
+
+        start = time.perf_counter()
+        expected = text_scan(path, classifier)
+        text_time = time.perf_counter() - start
+        print(f"文本模式: {size_mb / text_time:,.0f} MB/s ({text_time:.2f}s, 命中 {len(expected):,} 行)")
+
+        start = time.perf_counter()
+        hits = mmap_scan(path, classifier)
+        mmap_time = time.perf_counter() - start
+        print(f"mmap 扫描: {size_mb / mmap_time:,.0f} MB/s ({mmap_time:.2f}s, 加速 {text_time / mmap_time:.1f}x)")
+
+        chunks = split_file(path, 64 * 1024 * 1024)
+        chunked = [line for chunk_start, chunk_end in chunks for line in mmap_scan(path, classifier, chunk_start, chunk_end)]
+        if hits != expected or chunked != expected:
+            print("警告：mmap 扫描结果与文本模式不一致")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
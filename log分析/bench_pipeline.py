@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from aplog_generator import add_generator_arguments, generate_capture, load_manifest
+
+# 解析流水线基准：在 aplog_generator 生成的合成抓取目录上分别运行
+#   process_temp_file / process_network_file / process_file (cpu.py)、plot_kernel_log / plot_main_log (main.py)、
+#   merge_logs (log集合/合并log.py)，
+# 报告每个阶段的耗时、行/秒、MB/秒、峰值内存，绘图阶段另外给出解析和出图各自的耗时。
+# 每个阶段在单独的子进程中运行（峰值内存互不影响，解析缓存用独立的临时目录），
+# 结果保存为 JSON，--compare 与之前的结果对比，变慢超过 --threshold 时返回非 0。
+# 用法: python bench_pipeline.py [--size MB] [--stages ...] [--capture 目录] [--compare 旧结果.json]
+
+LOG_SET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'log集合')
+RESULTS_DIR = 'bench_results'
+# --compare 时耗时增加超过这个比例算退步
+DEFAULT_THRESHOLD = 0.10
+
+
+def _series_points(store):
+    return sum(len(series) for series in store.series.values()) + sum(len(events) for events in store.events.values())
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _process_files(paths, kinds, rule_names_for):
+    import cpu
+    from series_store import SeriesStore
+    store = SeriesStore()
+    start = time.perf_counter()
+    for kind in kinds:
+        cpu.process_file(paths[kind], store, rule_names_for(cpu, kind))
+    return {'seconds': time.perf_counter() - start, 'points': _series_points(store)}
+
+
+def stage_process_temp_file(paths, work_dir):
+    # 只提取温度/CPU 规则（与改成一次扫描之前的温度阶段可比）
+    return _process_files(paths, ('kernel_log', 'main_log'), lambda cpu, kind: cpu.TEMP_RULE_NAMES)
+
+
+def stage_process_network_file(paths, work_dir):
+    return _process_files(paths, ('main_log', 'sys_log'), lambda cpu, kind: cpu.NETWORK_RULE_NAMES)
+
+
+def stage_process_file(paths, work_dir):
+    # cpu.py 的实际做法：每个文件扫描一次，同时提取它参与的全部规则
+    return _process_files(paths, ('kernel_log', 'main_log', 'sys_log'),
+                          lambda cpu, kind: cpu.kinds_rule_names(cpu.log_file_kinds(os.path.basename(paths[kind]))))
+
+
+def _plot_stage(path, kind, rule_names, parse_name, plot_name, work_dir):
+    # 先解析并写入（空的）解析缓存，再计时出图：出图时命中缓存，耗时基本只有绘图和保存
+    import main as main_script
+    from report import select_backend
+    select_backend('Agg')
+    store, parse_seconds = _timed(main_script.load_or_parse, path, kind, getattr(main_script, rule_names),
+                                  getattr(main_script, parse_name))
+    plot = getattr(main_script, plot_name)
+    _, render_seconds = _timed(lambda: plot(path, use_cache=True, output_dir=work_dir, name=os.path.basename(path)))
+    return {'seconds': parse_seconds + render_seconds, 'parse_seconds': parse_seconds,
+            'render_seconds': render_seconds, 'points': _series_points(store)}
+
+
+def stage_plot_kernel_log(paths, work_dir):
+    return _plot_stage(paths['kernel_log'], 'main.kernel', 'KERNEL_RULE_NAMES', 'parse_kernel_log', 'plot_kernel_log', work_dir)
+
+
+def stage_plot_main_log(paths, work_dir):
+    return _plot_stage(paths['main_log'], 'main.main', 'MAIN_RULE_NAMES', 'parse_main_log', 'plot_main_log', work_dir)
+
+
+def stage_merge_logs(paths, work_dir):
+    # 合并log.py 从当前目录读取 log过滤器.txt，输出写在抓取目录中，测完删除
+    sys.path.insert(0, LOG_SET_DIR)
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('merge_log', os.path.join(LOG_SET_DIR, '合并log.py'))
+    merge_log = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(merge_log)
+    shutil.copy(os.path.join(LOG_SET_DIR, 'log_annotations.txt'), os.path.join(work_dir, 'log过滤器.txt'))
+    os.chdir(work_dir)
+    folder = os.path.dirname(paths['main_log'])
+    try:
+        _, seconds = _timed(merge_log.merge_logs, folder)
+        with open(os.path.join(folder, '完整log集合.log'), 'rb') as file:
+            points = sum(chunk.count(b'\n') for chunk in iter(lambda: file.read(1 << 20), b''))
+    finally:
+        for name in ('完整log集合.log', '简约log.log'):
+            if os.path.exists(os.path.join(folder, name)):
+                os.remove(os.path.join(folder, name))
+    return {'seconds': seconds, 'points': points}
+
+
+# 阶段名 -> (读取的日志类型, 函数)
+STAGES = {
+    'process_temp_file': (('kernel_log', 'main_log'), stage_process_temp_file),
+    'process_network_file': (('main_log', 'sys_log'), stage_process_network_file),
+    'process_file': (('kernel_log', 'main_log', 'sys_log'), stage_process_file),
+    'plot_kernel_log': (('kernel_log',), stage_plot_kernel_log),
+    'plot_main_log': (('main_log',), stage_plot_main_log),
+    'merge_logs': (('kernel_log', 'main_log', 'sys_log', 'radio_log', 'events_log'), stage_merge_logs),
+}
+
+
+def peak_rss_mb():
+    # 当前进程的峰值常驻内存(MB)
+    try:
+        import resource
+    except ImportError:
+        # Windows: GetProcessMemoryInfo 的 PeakWorkingSetSize
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 1024 ** 2
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 的单位是 KB，macOS 是字节
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_stage(name, capture, work_dir, result_file):
+    # 子进程入口：运行一个阶段，把测量结果写到 result_file
+    manifest = load_manifest(capture)
+    paths = {info['kind']: os.path.join(capture, file) for file, info in manifest['files'].items()}
+    result = STAGES[name][1](paths, work_dir)
+    result['peak_rss_mb'] = peak_rss_mb()
+    with open(result_file, 'w', encoding='utf-8') as file:
+        json.dump(result, file)
+
+
+def measure_stage(name, capture, manifest):
+    kinds, _ = STAGES[name]
+    inputs = [info for info in manifest['files'].values() if info['kind'] in kinds]
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as work_dir:
+        result_file = os.path.join(work_dir, 'result.json')
+        log_file = os.path.join(work_dir, 'stage.log')
+        # 解析缓存放在临时目录，每次都从空缓存开始
+        env = dict(os.environ, LOG_CACHE_DIR=os.path.join(work_dir, 'cache'), PYTHONIOENCODING='utf-8')
+        command = [sys.executable, os.path.abspath(__file__), '--run-stage', name, '--capture', capture,
+                   '--work-dir', work_dir, '--result-file', result_file]
+        with open(log_file, 'w', encoding='utf-8') as output:
+            process = subprocess.run(command, stdout=output, stderr=subprocess.STDOUT, env=env,
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+        if process.returncode != 0 or not os.path.exists(result_file):
+            with open(log_file, encoding='utf-8', errors='ignore') as output:
+                raise RuntimeError(f"阶段 {name} 失败:\n{output.read()[-4000:]}")
+        with open(result_file, encoding='utf-8') as file:
+            result = json.load(file)
+    result['lines'] = sum(info['lines'] for info in inputs)
+    result['bytes'] = sum(info['bytes'] for info in inputs)
+    seconds = max(result['seconds'], 1e-9)
+    result['lines_per_sec'] = result['lines'] / seconds
+    result['mb_per_sec'] = result['bytes'] / 1024 ** 2 / seconds
+    return result
+
+
+def print_result(name, result):
+    text = (f"{name}: {result['seconds']:.2f}s, {result['lines_per_sec']:,.0f} 行/s, {result['mb_per_sec']:.1f} MB/s, "
+            f"峰值内存 {result['peak_rss_mb']:.0f} MB, 结果 {result['points']:,}")
+    if 'render_seconds' in result:
+        text += f" (解析 {result['parse_seconds']:.2f}s + 出图 {result['render_seconds']:.2f}s)"
+    print(text)
+
+
+def compare(results, previous_path, threshold):
+    # 与之前的结果逐阶段对比耗时，返回是否有阶段退步
+    with open(previous_path, encoding='utf-8') as file:
+        previous = json.load(file)
+    if previous.get('capture') != results['capture']:
+        print("注意：两次的合成日志参数不同，对比仅供参考")
+    regressed = False
+    print(f"对比 {previous_path} ({previous.get('created')}):")
+    for name, result in results['stages'].items():
+        old = previous.get('stages', {}).get(name)
+        if old is None:
+            continue
+        change = result['seconds'] / max(old['seconds'], 1e-9) - 1
+        slower = change > threshold
+        regressed |= slower
+        print(f"  {name}: {old['seconds']:.2f}s -> {result['seconds']:.2f}s ({change:+.1%}), "
+              f"峰值内存 {old['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB{'  退步' if slower else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='log分析 / log集合 解析流水线基准')
+    add_generator_arguments(parser)
+    parser.add_argument('--capture', help='合成日志目录（参数相同时复用），默认使用临时目录，测完删除')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES), help='要运行的阶段，默认全部')
+    parser.add_argument('--results', help=f'结果 JSON 路径，默认 {RESULTS_DIR}/pipeline_<时间>.json')
+    parser.add_argument('--compare', help='与之前保存的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'--compare 时耗时增加超过这个比例算退步，默认 {DEFAULT_THRESHOLD}')
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_stage:
+        run_stage(args.run_stage, args.capture, args.work_dir, args.result_file)
+        return
+
+    capture = args.capture or tempfile.mkdtemp(prefix='aplog_')
+    try:
+        start = time.perf_counter()
+        manifest = generate_capture(capture, args.size, args.hit_rate, args.mix, args.duration, args.seed)
+        total_mb = sum(info['bytes'] for info in manifest['files'].values()) / 1024 ** 2
+        print(f"合成日志: {capture}, {total_mb:.1f} MB ({time.perf_counter() - start:.1f}s)")
+        results = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                   'platform': platform.platform(), 'capture': manifest['params'], 'stages': {}}
+        for name in args.stages:
+            results['stages'][name] = measure_stage(name, capture, manifest)
+            print_result(name, results['stages'][name])
+    finally:
+        if not args.capture:
+            shutil.rmtree(capture, ignore_errors=True)
+
+    results_path = args.results or os.path.join(RESULTS_DIR, f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+    with open(results_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {results_path}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
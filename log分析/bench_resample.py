@@ -0,0 +1,56 @@
+import sys
+import time
+
+import numpy as np
+
+from resample import align, AGGREGATES
+from series_store import SeriesStore, Series
+
+# 对齐性能：一小时的数据按 1 ms 的时间桶对齐（360 万行），目标每种聚合方式都在 1 秒以内。
+# 模拟各指标不同的采样频率：CPU 8 个核心每秒一次、WMT 约 3 秒一次、LTE 信号不定期、
+# 另有一条约 1 kHz 的高频曲线（每个时间桶都有样本）。
+# 用法: python bench_resample.py [小时数] [桶宽微秒]，默认 1 小时、1000 微秒
+
+TARGET_SECONDS = 1.0
+HOUR_US = 3600 * 1000000
+
+
+def make_store(hours, seed=1):
+    rng = np.random.default_rng(seed)
+    span = int(hours * HOUR_US)
+    store = SeriesStore()
+
+    def add(name, timestamps, low, high):
+        timestamps = np.sort(timestamps.astype(np.int64))
+        store.series[name] = Series.from_numpy(name, timestamps, rng.uniform(low, high, len(timestamps)))
+
+    for i in range(8):
+        add(f'cpu{i}', np.arange(0, span, 1000000) + rng.integers(0, 1000, span // 1000000), 0, 100)
+    add('wmt', np.cumsum(rng.integers(2000000, 4000000, span // 3000000)), 30, 60)
+    add('cellular_signal', rng.integers(0, span, span // 5000000), -120, -60)
+    add('fast', np.arange(0, span, 1000) + rng.integers(0, 1000, span // 1000), 0, 1)
+    return store
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    step = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    store = make_store(hours)
+    samples = sum(len(series) for series in store.series.values())
+    print(f"{hours:g} 小时, {len(store.series)} 条曲线, {samples:,} 个样本, 桶宽 {step} 微秒")
+    slow = []
+    for how in AGGREGATES:
+        start = time.perf_counter()
+        aligned = align(store, step=step, how=how)
+        elapsed = time.perf_counter() - start
+        print(f"{how:>5}: {elapsed:.3f}s, {len(aligned):,} 行 x {len(aligned.names)} 列, "
+              f"{aligned.matrix.nbytes / 1024 ** 2:,.1f} MB")
+        if elapsed > TARGET_SECONDS * hours:
+            slow.append(how)
+    if slow:
+        print(f"警告：{', '.join(slow)} 超过目标 {TARGET_SECONDS:g}s/小时")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
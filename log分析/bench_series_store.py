@@ -0,0 +1,57 @@
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from series_store import SeriesStore
+
+# 内存对比：原来的并行 Python 列表(datetime + None 补齐) 与 SeriesStore
+# 用法: python bench_series_store.py [样本数]，默认 500 万
+
+KEYS = ['tmp1', 'tmp2', 'tmp3', 'batt_temp_kernel', 'batt_temp_main', 'batt_temp_healthd',
+        'wmt', 'batt_level_main', 'batt_level_kernel']
+
+
+def fill_lists(count):
+    all_temps = {'timestamp': []}
+    for key in KEYS:
+        all_temps[key] = []
+    base = datetime(1900, 10, 21)
+    for n in range(count):
+        # 每个样本只有一个指标有值，其它列补 None，和原来的 update_temps 一致
+        all_temps['timestamp'].append(base + timedelta(microseconds=n * 1000))
+        hit = KEYS[n % len(KEYS)]
+        for key in KEYS:
+            all_temps[key].append(n % 50 if key == hit else None)
+    return all_temps
+
+
+def fill_store(count):
+    store = SeriesStore()
+    for n in range(count):
+        store.append(KEYS[n % len(KEYS)], n * 1000, n % 50)
+    return store
+
+
+def measure(func, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    _, list_bytes, list_time = measure(fill_lists, count)
+    store, store_bytes, store_time = measure(fill_store, count)
+    print(f"样本数: {count:,}")
+    print(f"并行列表:    {list_bytes / 1024 ** 2:,.1f} MB, 填充耗时 {list_time:.2f}s")
+    print(f"SeriesStore: {store_bytes / 1024 ** 2:,.1f} MB, 填充耗时 {store_time:.2f}s (自报 {store.nbytes() / 1024 ** 2:,.1f} MB)")
+    print(f"内存缩减: {list_bytes / store_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
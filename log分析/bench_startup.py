@@ -0,0 +1,86 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# 启动速度基准：从启动脚本到出现“输入日志路径”提示所用的时间，
+# 以及 python -X importtime 统计的提示出现之前导入最慢的模块。
+# 提示出现之前不应导入 matplotlib / plotly / tkinter（绘图库在第一次绘图时才加载）。
+# 用法: python bench_startup.py [脚本名 ...]，默认测试所有带输入提示的脚本，每个脚本跑 RUNS 次取中位数
+
+SCRIPTS = {
+    'main.py': 'Enter the path to the log file:',
+    'cpu.py': '请输入日志文件路径:',
+    'list_files.py': '请输入日志文件路径:',
+    'all.py': '请输入日志文件路径:',
+    'network_log_processor.py': '请输入日志文件路径:',
+}
+# 目标：提示出现的时间（秒，不含 -X importtime 自身的开销）
+TARGET_SECONDS = 0.5
+RUNS = 5
+TOP_IMPORTS = 8
+HEAVY_MODULES = ('matplotlib', 'plotly', 'tkinter', 'mpl_toolkits')
+_IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_until_prompt(script, prompt, importtime=False):
+    # 返回 (出现提示的秒数, stderr 文本)；提示出现后立即结束子进程
+    command = [sys.executable, '-u'] + (['-X', 'importtime'] if importtime else []) + [script]
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    # -X importtime 的输出很多，写到临时文件，避免管道写满把子进程卡住
+    with tempfile.TemporaryFile() as stderr_file:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+        output = b''
+        expected = prompt.encode('utf-8')
+        while expected not in output:
+            data = os.read(process.stdout.fileno(), 4096)
+            if not data:
+                break
+            output += data
+        elapsed = time.perf_counter() - start
+        process.stdin.close()
+        process.kill()
+        process.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='ignore')
+    if expected not in output:
+        raise RuntimeError(f"{script} 没有出现输入提示:\n{stderr}")
+    return elapsed, stderr
+
+
+def parse_importtime(stderr):
+    # 返回 [(累计微秒, 模块名, 缩进层级)]，按导入顺序
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            modules.append((int(match.group(2)), match.group(4), len(match.group(3)) // 2))
+    return modules
+
+
+def main():
+    scripts = sys.argv[1:] or list(SCRIPTS)
+    failed = False
+    for script in scripts:
+        times = sorted(run_until_prompt(script, SCRIPTS[script])[0] for _ in range(RUNS))
+        median = times[len(times) // 2]
+        _, stderr = run_until_prompt(script, SCRIPTS[script], importtime=True)
+        modules = parse_importtime(stderr)
+        heavy = sorted({name.split('.')[0] for _, name, _ in modules if name.split('.')[0] in HEAVY_MODULES})
+        ok = median <= TARGET_SECONDS and not heavy
+        failed |= not ok
+        print(f"{script}: 提示出现 {median * 1000:.0f} ms (目标 {TARGET_SECONDS * 1000:.0f} ms) {'通过' if ok else '未通过'}")
+        if heavy:
+            print(f"  提示之前导入了绘图库: {', '.join(heavy)}")
+        top = sorted((module for module in modules if module[2] == 0), reverse=True)[:TOP_IMPORTS]
+        for cumulative, name, _ in top:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
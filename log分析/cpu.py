@@ -1,256 +1,178 @@
 import os
 import re
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
-import matplotlib
-from datetime import datetime
-import matplotlib.ticker as ticker
 import sys
-import subprocess
-matplotlib.use('TkAgg')  # 或者尝试 'Qt5Agg'
-matplotlib.rcParams['font.family'] = 'SimHei'  # 选择支持中文的字体，例如 SimHei
-
-# 定义字体属性
-font_path = 'C:/Windows/Fonts/simhei.ttf'
-font_prop = font_manager.FontProperties(fname=font_path)
-
-# 强制使用默认字体的负号符号
-matplotlib.rcParams['axes.unicode_minus'] = False
-
-def process_temp_logs(path):
-    log_files = []
-
-    # 遍历给定路径下的所有文件
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            if re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}\.localtime$', file):
-                log_files.append(os.path.join(root, file))
-            elif re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}$', file):
-                localtime_file = convert_kernel_log(os.path.join(root, file))  # 调用转换函数
-                if localtime_file and os.path.exists(localtime_file):
-                    log_files.append(localtime_file)
-            elif re.match(r'main_log_\d+__\d{4}_\d{4}_\d{6}', file):
-                log_files.append(os.path.join(root, file))
-
-    # 按文件名排序,确保按顺序处理
-    log_files.sort()
-
-    # 用于存储所有数据的字典
-    all_temps = {
-        'timestamp': [], 'tmp1': [], 'tmp2': [], 'tmp3': [], 
-        'batt_temp_kernel': [], 'batt_temp_main': [], 'batt_temp_healthd': [],
-        'wmt': [], 'batt_level_main': [], 'batt_level_kernel': [], 
-        'cpu_usage': [[] for _ in range(8)]  # 为8个CPU核心准备8个列表
-    }
-
-    # 处理每个日志文件
-    processed_files = set()  # 用于跟踪已处理的文件
-    for file_path in log_files:
-        if file_path not in processed_files:
-            process_temp_file(file_path, all_temps)
-            processed_files.add(file_path)
-
-    # 打印数据长度以进行调试
-    print("温度数据长度:")
-    for key, value in all_temps.items():
-        print(f"{key}: {len(value)}")
-
-    return all_temps
-def convert_kernel_log(file_path):
-    ktime_convert = os.path.join(os.path.dirname(__file__), 'ktime_convert.exe')
-    if os.path.exists(ktime_convert):
-        try:
-            subprocess.run([ktime_convert, file_path], check=True)
-            print(f"成功转换文件: {file_path}")
-            return file_path + '.localtime'
-        except subprocess.CalledProcessError:
-            print(f"转换文件失败: {file_path}")
-    else:
-        print("未找到 ktime_convert.exe 文件,无法转换 kernel 日志")
-    return None
-
-def process_temp_file(file_path, all_temps):
-    print(f"处理文件: {file_path}")
-    processed_timestamps = set()
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        for line in file:
-            timestamp = extract_timestamp(line)
-            if timestamp is None or timestamp in processed_timestamps:
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+from metric_rules import ruleset, extract_file, MetricExtractor, stitch_chunks
+from series_store import SeriesStore, merge_stores
+from ktime_convert import kernel_log_source
+from mmap_scan import scan_log, split_file
+from time_index import add_time_range_arguments, time_range_from_args, byte_range
+from resample import add_resample_arguments, export_from_args
+from report import select_backend, pyplot, chinese_font, show_or_save, run_batch, capture_name
+from parse_cache import ruleset_version, load_cached_store, save_cached_store
+import profiler
+from profiler import add_profile_arguments, profile_from_args, stage
+from diagnostics import add_logging_arguments, diagnostics_from_args
+# 或者尝试 'Qt5Agg'；批量出图(--output)时使用 Agg，不导入 tkinter。
+# matplotlib 在第一次绘图时才导入（pyplot()），中文字体和负号设置也在那时完成
+select_backend('TkAgg')
+
+TEMP_RULE_NAMES = ('mtk_bh', 'batt_temp_kernel', 'wmt', 'battery_main', 'healthd', 'cpu_usage')
+NETWORK_RULE_NAMES = ('cellular_signal', 'wifi_signal', 'network_type', 'anr_warning', 'app_not_responding')
+RULE_NAMES = {'temp': TEMP_RULE_NAMES, 'network': NETWORK_RULE_NAMES}
+# 单个温度日志超过这个大小时按换行切成多段，由多个进程同时扫描
+SPLIT_BYTES = 256 * 1024 * 1024
+
+# 温度/电量曲线的图例和颜色（普通图表和实时图表共用）
+TEMP_LABELS = {
+    'tmp1': '芯片组电池温度1',
+    'tmp2': '芯片组电池温度2',
+    'tmp3': '芯片组电池温度3',
+    'batt_temp_kernel': '电池温度 (Kernel)',
+    'batt_temp_main': '电池温度 (Main)',
+    'batt_temp_healthd': '电池温度 (Healthd)',
+    'wmt': 'WMT 温度',
+    'batt_level_main': '电量 (Main)',
+    'batt_level_kernel': '电量 (Kernel)'
+}
+
+TEMP_COLORS = {
+    'tmp1': 'red',
+    'tmp2': 'blue',
+    'tmp3': 'green',
+    'batt_temp_kernel': 'orange',
+    'batt_temp_main': 'pink',
+    'batt_temp_healthd': 'brown',
+    'wmt': 'purple',
+    'batt_level_main': 'black',
+    'batt_level_kernel': 'gray'
+}
+
+def log_file_kinds(file_name, live=False):
+    # 文件参与哪些解析：温度/CPU ('temp')、网络 ('network')；
+    # 实时模式只跟踪原始 kernel_log，不读（不会再增长的）.localtime
+    if re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}\.localtime$', file_name):
+        return () if live else ('temp',)
+    if re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}$', file_name):
+        return ('temp',)
+    if re.match(r'main_log_\d+__\d{4}_\d{4}_\d{6}', file_name):
+        return ('temp', 'network')
+    if re.match(r'sys_log_\d+__\d{4}_\d{4}_\d{6}', file_name):
+        return ('network',)
+    return ()
+
+def kinds_rule_names(kinds):
+    # 文件要提取的规则：各类规则的并集，一次扫描全部提取
+    return tuple(name for kind in kinds for name in RULE_NAMES[kind])
+
+def scan_log_files(path, live=False):
+    # 只遍历一次目录，返回按路径排序的 [(file_path, kinds)]
+    files = {}
+    for root, dirs, names in os.walk(path):
+        for file in names:
+            kinds = log_file_kinds(file, live)
+            if not kinds:
                 continue
-            processed_timestamps.add(timestamp)
-
-            # 匹配MTK_BH温度 (kernel_log)
-            match = re.search(r'MTK_BH:.*tmp:(\d+) (\d+) (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, tmp1=int(match.group(1)), tmp2=int(match.group(2)), tmp3=int(match.group(3)))
-                continue
-
-            # 匹配电池温度 (kernel_log)
-            match = re.search(r'orignal batt_temp = (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_temp_kernel=int(match.group(1)) / 10)
-                continue
-
-            # 匹配无线通讯内部温度 (kernel_log)
-            match = re.search(r'wmt_dev_tm_temp_query.*current_temp = (0x[0-9a-fA-F]+)', line)
-            if match:
-                wmt_temp = int(match.group(1), 16)
-                update_temps(all_temps, timestamp, wmt=wmt_temp)
-                print(f"找到无线通讯温度: {wmt_temp}°C, 时间戳: {timestamp.strftime('%m-%d %H:%M:%S.%f')}")
-                continue
-
-            # 匹配电池电量和温度 (main_log)
-            match = re.search(r'BatteryLabService: current level == (\d+), temperature == (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_temp_main=int(match.group(2)) / 10, batt_level_main=int(match.group(1)))
-                continue
-
-            # 匹配kernel日志中的电池信息
-            match = re.search(r'healthd: battery l=(\d+) v=\d+ t=([\d.]+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_level_kernel=int(match.group(1)), batt_temp_healthd=float(match.group(2)))
-                continue
-
-            # 匹配CPU使用率
-            match = re.search(r'Cpus Usage \[(\d+)\], \[(\d+)\], \[(\d+)\], \[(\d+)\], \[(\d+)\] \[(\d+)\], \[(\d+)\], \[(\d+)\]', line)
-            if match:
-                cpu_usages = [int(match.group(i)) for i in range(1, 9)]
-                for i, usage in enumerate(cpu_usages):
-                    all_temps['cpu_usage'][i].append((timestamp, usage))
-                continue
-
-def update_temps(all_temps, timestamp, tmp1=None, tmp2=None, tmp3=None, 
-                 batt_temp_kernel=None, batt_temp_main=None, batt_temp_healthd=None, 
-                 wmt=None, batt_level_main=None, batt_level_kernel=None):
-    all_temps['timestamp'].append(timestamp)
-    all_temps['tmp1'].append(tmp1)
-    all_temps['tmp2'].append(tmp2)
-    all_temps['tmp3'].append(tmp3)
-    all_temps['batt_temp_kernel'].append(batt_temp_kernel)
-    all_temps['batt_temp_main'].append(batt_temp_main)
-    all_temps['batt_temp_healthd'].append(batt_temp_healthd)
-    if wmt is not None:
-        all_temps['wmt'].append(wmt)
-    all_temps['batt_level_main'].append(batt_level_main)
-    all_temps['batt_level_kernel'].append(batt_level_kernel)
-
-def extract_timestamp(line):
-    match = re.search(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})', line)
-    if match:
-        return datetime.strptime(match.group(1), '%m-%d %H:%M:%S.%f')
-    return None
-
-def process_network_logs(path):
-    log_files = []
-    anr_warning_times = []  # 添加此行
-    app_not_responding_times = []  # 添加此行
-
-    # 遍历给定路径下的所有文件
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            if re.match(r'(main|sys)_log_\d+__\d{4}_\d{4}_\d{6}', file):
-                log_files.append(os.path.join(root, file))
-
-    # 按文件名排序,确保按顺序处理
-    log_files.sort()
-
-    # 用于存储所有网络数据的字典
-    network_data = {
-        'timestamp': [],
-        'cellular_signal': [],
-        'wifi_signal': [],
-        'network_type': []  # 存储网络类型
-    }
-
-    # 处理每个日志文件
-    for file_path in log_files:
-        network_data, anr_warning_times_temp, app_not_responding_times_temp = process_network_file(file_path, network_data)
-        anr_warning_times.extend(anr_warning_times_temp)  # 合并时间戳
-        app_not_responding_times.extend(app_not_responding_times_temp)  # 合并时间戳
+            file_path = os.path.join(root, file)
+            if 'network' not in kinds and not live:
+                # 已有最新的 .localtime 时读 .localtime，否则直接读原始日志、读取时换算本地时间
+                file_path = kernel_log_source(file_path)
+            # kernel 原始日志转换出的 .localtime 可能已经收集过，以路径为键去重
+            files[file_path] = kinds
+    return sorted(files.items())
+
+def parse_log_file(kinds, file_path, start=0, end=None, time_range=None):
+    # 进程池的工作函数：解析单个文件（或其中 [start, end) 一段），返回自己的 SeriesStore
+    store = SeriesStore()
+    with stage('process_file'):
+        process_file(file_path, store, kinds_rule_names(kinds), start, end, time_range)
+    return store
+
+def parse_log_files(tasks, jobs=None, time_range=None):
+    # tasks 为 [(kinds, file_path)]，每个文件交给一个工作进程，结果按 tasks 顺序返回；
+    # 很大的温度日志切成多段分给多个进程，解析完按文件顺序拼接，并补上跨段的去重和标签变化判断；
+    # 给出 time_range 时只切分这段时间对应的字节范围
+    jobs = jobs or os.cpu_count() or 1
+    chunks = []
+    for index, (kinds, file_path) in enumerate(tasks):
+        spans = [(0, None)]
+        if 'temp' in kinds and jobs > 1:
+            start, end = byte_range(file_path, time_range)[:2] if time_range else (0, None)
+            spans = split_file(file_path, SPLIT_BYTES, start, end)
+        chunks.extend((index, kinds, file_path, start, end, time_range) for start, end in spans)
+    if jobs == 1 or len(chunks) <= 1:
+        results = [parse_log_file(*chunk[1:]) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+            results = list(executor.map(parse_log_file, *list(zip(*chunks))[1:]))
+    parts = [[] for _ in tasks]
+    for chunk, store in zip(chunks, results):
+        parts[chunk[0]].append(store)
+    return [stores[0] if len(stores) == 1 else stitch_chunks(stores, kinds_rule_names(kinds))
+            for (kinds, _), stores in zip(tasks, parts)]
+
+def load_or_parse_log_files(tasks, jobs=None, use_cache=True, time_range=None):
+    # 先查磁盘缓存，只把没有命中的文件交给进程池解析，解析完写回缓存；
+    # 只分析一段时间（time_range）时结果不完整，不读写缓存
+    use_cache = use_cache and not time_range
+
+    def cache_key(kinds):
+        return f"cpu.{'+'.join(kinds)}", ruleset_version(ruleset(kinds_rule_names(kinds)))
+
+    stores = [None] * len(tasks)
+    if use_cache:
+        with stage('cache.load'):
+            stores = [load_cached_store(file_path, *cache_key(kinds)) for kinds, file_path in tasks]
+        print(f"解析缓存命中 {sum(store is not None for store in stores)}/{len(tasks)} 个文件")
+    misses = [index for index, store in enumerate(stores) if store is None]
+    if profiler.enabled:
+        profiler.count('cache.hits', len(tasks) - len(misses))
+    with stage('parse'):
+        parsed = parse_log_files([tasks[index] for index in misses], jobs, time_range)
+    with stage('cache.save'):
+        for index, store in zip(misses, parsed):
+            stores[index] = store
+            if use_cache:
+                kinds, file_path = tasks[index]
+                save_cached_store(file_path, *cache_key(kinds), store)
+    return stores
+
+def process_logs(path, jobs=None, use_cache=True, time_range=None):
+    with stage('scan_log_files'):
+        tasks = [(kinds, file_path) for file_path, kinds in scan_log_files(path)]
+    stores = load_or_parse_log_files(tasks, jobs, use_cache, time_range)
+
+    # 按指标分列存储所有数据，CPU 8个核心分别为 cpu0 ~ cpu7；各文件的结果按时间戳合并
+    with stage('merge_stores'):
+        store = merge_stores(stores)
 
     # 打印数据长度以进行调试
-    print("网络数据长度:")
-    for key, value in network_data.items():
-        print(f"{key}: {len(value)}")
+    store.print_summary("数据长度:")
 
-    return network_data, anr_warning_times, app_not_responding_times  # 修改此行
+    return store
 
-def process_network_file(file_path, network_data):
+def process_file(file_path, store, rule_names, start=0, end=None, time_range=None):
+    # main_log 同时有温度和网络指标，也只扫描一次
     print(f"处理文件: {file_path}")
-    cellular_count = 0
-    wifi_count = 0
-    network_type_count = 0
-    current_network_type = None
-    anr_warning_times = []  # 添加此行
-    app_not_responding_times = []  # 添加此行
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        for line in file:
-            timestamp = extract_timestamp(line)
-            if timestamp is None:
-                continue
-
-            # 匹配手机网络信号强度
-            match = re.search(r'TranSignalStrengthComponentImpl: \[LTE\] dbm: (-?\d+)', line)
-            if match:
-                signal = int(match.group(1))
-                #print(f"找到手机信号: {signal} dBm, 时间戳: {timestamp.strftime('%m-%d %H:%M:%S.%f')}")
-                update_network_data(network_data, timestamp, cellular_signal=signal, network_type=current_network_type)
-                cellular_count += 1
-                continue
-
-            # 匹配WiFi信号强度
-            match = re.search(r'====>>rssi :(-?\d+)', line)
-            if match:
-                signal = int(match.group(1))
-                #(f"找到WiFi信号: {signal} dBm, 时间戳: {timestamp.strftime('%m-%d %H:%M:%S.%f')}")
-                update_network_data(network_data, timestamp, wifi_signal=signal, network_type=current_network_type)
-                wifi_count += 1
-                continue
+    extractor = extract_file(file_path, rule_names, store, start, end, time_range)
+    print(f"文件 {file_path} 中找到 {extractor.summary()}")
+    if 'network_type' in extractor.labels:
+        print(f"最后的网络类型: {extractor.labels['network_type']}")
 
-            # 匹配网络类型变化
-            match = re.search(r'NetworkStatusMonitor: onNetworkTypeChanged (\w+) => (\w+)', line)
-            if match:
-                old_type, new_type = match.group(1), match.group(2)
-                if current_network_type != new_type:  # 网络类型变化才记录
-                    update_network_data(network_data, timestamp, network_type=new_type)
-                print(f"网络类型变化: {old_type} => {new_type}, 时间戳: {timestamp.strftime('%m-%d %H:%M:%S.%f')}")  # 输出变化信息
-                current_network_type = new_type
-                network_type_count += 1
-
-            # 匹配 ANR 警告
-            if re.search(r'\[ANR Warning\]', line):
-                anr_warning_times.append(timestamp)
-
-            # 匹配应用程序未响应
-            if re.search(r'application is not responding', line):
-                app_not_responding_times.append(timestamp)
-
-    print(f"文件 {file_path} 中找到 {cellular_count} 个手机信号, {wifi_count} 个WiFi信号, 和 {network_type_count} 个网络类型变化")
-    print(f"最后的网络类型: {current_network_type}")
-
-    return network_data, anr_warning_times, app_not_responding_times  # 修改此行
-
-def update_network_data(network_data, timestamp, cellular_signal=None, wifi_signal=None, network_type=None):
-    network_data['timestamp'].append(timestamp)
-    network_data['cellular_signal'].append(cellular_signal)
-    network_data['wifi_signal'].append(wifi_signal)
-    network_data['network_type'].append(network_type)
-    if network_type is not None:
-        print(f"更新网络类型: {network_type}, 时间戳: {timestamp.strftime('%m-%d %H:%M:%S.%f')}")
-
-def plot_data(all_temps, network_data, anr_warning_times, app_not_responding_times):
+def plot_data(store, output_dir=None, name='cpu'):
     print("开始绘图...")
 
     # 打印数据长度以进行调试
     print("数据长度检查:")
-    print(f"时间戳: {len(all_temps['timestamp'])}")
-    print(f"wmt信号模块温度: {len(all_temps['wmt'])}")
-    print(f"手机信号强度: {len(network_data['cellular_signal'])}")
-    print(f"WiFi信号强度: {len(network_data['wifi_signal'])}")
+    print(f"wmt信号模块温度: {len(store.get('wmt'))}")
+    print(f"手机信号强度: {len(store.get('cellular_signal'))}")
+    print(f"WiFi信号强度: {len(store.get('wifi_signal'))}")
 
-    font_path = 'C:/Windows/Fonts/simhei.ttf'
-    font_prop = font_manager.FontProperties(fname=font_path)
-    plt.rcParams['font.family'] = font_prop.get_name()
+    plt = pyplot()
+    from decimate import plot_decimated, plot_event_markers
+    font_prop = chinese_font()
 
     fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 18), sharex=True)
 
@@ -260,58 +182,28 @@ def plot_data(all_temps, network_data, anr_warning_times, app_not_responding_tim
         plt.Line2D([0], [0], color='r', linestyle='--', alpha=0.2, lw=2, label='App Not Responding')
     ]
     fig.legend(handles=handles, loc='upper center', bbox_to_anchor=(0.5, 1), ncol=2)
-    # 绘制温度数据
-    label_map = {
-        'tmp1': '芯片组电池温度1',
-        'tmp2': '芯片组电池温度2',
-        'tmp3': '芯片组电池温度3',
-        'batt_temp_kernel': '电池温度 (Kernel)',
-        'batt_temp_main': '电池温度 (Main)',
-        'batt_temp_healthd': '电池温度 (Healthd)',
-        'wmt': 'WMT 温度',
-        'batt_level_main': '电量 (Main)',
-        'batt_level_kernel': '电量 (Kernel)'
-    }
-
-    color_map = {
-        'tmp1': 'red',
-        'tmp2': 'blue',
-        'tmp3': 'green',
-        'batt_temp_kernel': 'orange',
-        'batt_temp_main': 'pink',
-        'batt_temp_healthd': 'brown',
-        'wmt': 'purple',
-        'batt_level_main': 'black',
-        'batt_level_kernel': 'gray'
-    }
-
-    for key in label_map.keys():
-        valid_data = [(t, v) for t, v in zip(all_temps['timestamp'], all_temps[key]) if v is not None]
-        print(f"{key}: {len(valid_data)} 个有效数据点")
-        if valid_data:
-            timestamps, values = zip(*valid_data)
+    # 绘制温度数据；每条曲线都按像素宽度降采样，缩放时从完整数据重新降采样
+    for key in TEMP_LABELS.keys():
+        timestamps, values = store.view(key)
+        print(f"{key}: {len(values)} 个有效数据点")
+        if len(values):
             if 'batt_level' in key:
-                ax1.plot(timestamps, values, label=label_map[key], color=color_map[key], linestyle='--')
+                plot_decimated(ax1, timestamps, values, label=TEMP_LABELS[key], color=TEMP_COLORS[key], linestyle='--')
             else:
-                ax1.plot(timestamps, values, label=label_map[key], color=color_map[key])
+                plot_decimated(ax1, timestamps, values, label=TEMP_LABELS[key], color=TEMP_COLORS[key])
 
     ax1.set_ylabel('温度 (°C) / 电池电量 (%)', fontproperties=font_prop)
     ax1.set_title('温度和电池电量趋势图', fontproperties=font_prop)
     ax1.legend(loc='best', prop=font_prop)
 
     # 绘制网络信号强度数据
-    cellular_signals = [s for s in network_data['cellular_signal'] if s is not None]
-    wifi_signals = [s for s in network_data['wifi_signal'] if s is not None]
+    timestamps, signals = store.view('cellular_signal')
+    if len(signals):
+        plot_decimated(ax2, timestamps, signals, label='手机网络信号强度', color='blue')
 
-    if cellular_signals:
-        cellular_data = [(t, s) for t, s in zip(network_data['timestamp'], network_data['cellular_signal']) if s is not None]
-        timestamps, signals = zip(*cellular_data)
-        ax2.plot(timestamps, signals, label='手机网络信号强度', color='blue')
-    
-    if wifi_signals:
-        wifi_data = [(t, s) for t, s in zip(network_data['timestamp'], network_data['wifi_signal']) if s is not None]
-        timestamps, signals = zip(*wifi_data)
-        ax2.plot(timestamps, signals, label='WiFi信号强度', color='green')
+    timestamps, signals = store.view('wifi_signal')
+    if len(signals):
+        plot_decimated(ax2, timestamps, signals, label='WiFi信号强度', color='green')
     
     ax2.set_ylabel('信号强度 (dBm)', fontproperties=font_prop)
     ax2.set_title('网络信号强度趋势图', fontproperties=font_prop)
@@ -319,15 +211,13 @@ def plot_data(all_temps, network_data, anr_warning_times, app_not_responding_tim
 
     # 绘制CPU使用率数据
     for i in range(8):
-        if all_temps['cpu_usage'][i]:
-            timestamps, usages = zip(*all_temps['cpu_usage'][i])
-            ax3.plot(timestamps, usages, label=f'CPU {i+1} 使用率')
+        timestamps, usages = store.view(f'cpu{i}')
+        if len(usages):
+            plot_decimated(ax3, timestamps, usages, label=f'CPU {i+1} 使用率')
 
-    # 添加 ANR 警告和应用程序未响应的标记
-    for error_time in anr_warning_times:
-        ax3.axvline(x=error_time, color='c', linestyle='--', alpha=0.2)
-    for error_time in app_not_responding_times:
-        ax3.axvline(x=error_time, color='r', linestyle='--', alpha=0.2)
+    # 添加 ANR 警告和应用程序未响应的标记，每种事件一个 LineCollection
+    plot_event_markers(ax3, store.event_view('anr_warning'), color='c', linestyle='--', alpha=0.2)
+    plot_event_markers(ax3, store.event_view('app_not_responding'), color='r', linestyle='--', alpha=0.2)
 
     ax3.set_ylabel('CPU 使用率 (%)', fontproperties=font_prop)
     ax3.set_title('CPU 使用率趋势图', fontproperties=font_prop)
@@ -344,13 +234,126 @@ def plot_data(all_temps, network_data, anr_warning_times, app_not_responding_tim
     
 
     plt.xlabel('时间', fontproperties=font_prop)
+    show_or_save(fig, output_dir, name)
+
+def follow_logs(paths, window_seconds=600, fps=2):
+    # 实时模式：跟踪正在增长的日志目录/文件（或管道 '-'），每帧只解析新增的完整行并追加到 SeriesStore
+    from follow import LogFollower, PipeReader, LiveChart
+    store = SeriesStore()
+    # 每个来源一个 MetricExtractor，去重用的时间戳和最后的网络类型跨帧保持
+    extractors = {}
+
+    def discover():
+        files = []
+        for path in paths:
+            if path == '-':
+                continue
+            if os.path.isdir(path):
+                files.extend(file_path for file_path, kinds in scan_log_files(path, live=True))
+            elif log_file_kinds(os.path.basename(path), live=True):
+                files.append(path)
+        return files
+
+    def extractor_for(source, kinds):
+        extractor = extractors.get(source)
+        if extractor is None:
+            extractor = extractors[source] = MetricExtractor(kinds_rule_names(kinds))
+        return extractor
+
+    follower = LogFollower(discover)
+    pipe = PipeReader() if '-' in paths else None
+
+    def update():
+        for file_path, start, end in follower.poll():
+            extractor = extractor_for(file_path, log_file_kinds(os.path.basename(file_path), live=True))
+            with scan_log(file_path, extractor.anchors, start, end) as lines:
+                extractor.feed(lines, store)
+        if pipe is not None:
+            # 管道按 logcat 格式处理（带 "MM-DD HH:MM:SS.ffffff" 时间戳），温度和网络规则都匹配
+            lines = pipe.poll()
+            if lines:
+                extractor_for('-', ('temp', 'network')).feed(lines, store)
+
+    plt = pyplot()
+    font_prop = chinese_font()
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 18), sharex=True)
+    chart = LiveChart(fig, window_seconds)
+    for key in TEMP_LABELS.keys():
+        chart.add_line(ax1, store, key, label=TEMP_LABELS[key], color=TEMP_COLORS[key],
+                       linestyle='--' if 'batt_level' in key else '-')
+    ax1.set_ylabel('温度 (°C) / 电池电量 (%)', fontproperties=font_prop)
+    ax1.set_title(f'温度和电池电量趋势图（最近 {window_seconds} 秒）', fontproperties=font_prop)
+    chart.add_line(ax2, store, 'cellular_signal', label='手机网络信号强度', color='blue')
+    chart.add_line(ax2, store, 'wifi_signal', label='WiFi信号强度', color='green')
+    ax2.set_ylabel('信号强度 (dBm)', fontproperties=font_prop)
+    ax2.set_title('网络信号强度趋势图', fontproperties=font_prop)
+    for i in range(8):
+        chart.add_line(ax3, store, f'cpu{i}', label=f'CPU {i+1} 使用率')
+    chart.add_markers(ax3, store, 'anr_warning', color='c', linestyle='--', alpha=0.2)
+    chart.add_markers(ax3, store, 'app_not_responding', color='r', linestyle='--', alpha=0.2)
+    ax3.set_ylabel('CPU 使用率 (%)', fontproperties=font_prop)
+    ax3.set_title('CPU 使用率趋势图', fontproperties=font_prop)
+    ax3.set_ylim(0, 100)
+    plt.subplots_adjust(left=0.051, right=0.975, top=0.933, bottom=0.067)
+    plt.xlabel('时间', fontproperties=font_prop)
+    print(f"实时模式：每秒刷新 {fps} 次，关闭窗口结束")
+    chart.start(update, fps)
     plt.show()
+    return store
+
+def render_capture(path, output_dir, use_cache=True, time_range=None):
+    # 批量模式的工作函数：一个抓取目录生成一组图表；已经在进程池里，解析不再另开进程
+    with stage('process_logs'):
+        store = process_logs(path, 1, use_cache, time_range)
+    with stage('plot_data'):
+        plot_data(store, output_dir, f"{capture_name(path)}_cpu")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        temp_path = sys.argv[1]
-    else:
-        temp_path = input("请输入日志文件路径:").strip()
-    all_temps = process_temp_logs(temp_path)
-    network_data, anr_warning_times, app_not_responding_times = process_network_logs(temp_path)
-    plot_data(all_temps, network_data, anr_warning_times, app_not_responding_times)
+    freeze_support()  # 打包成 exe 后子进程需要
+    parser = argparse.ArgumentParser(description='温度、网络信号和CPU使用率日志分析')
+    parser.add_argument('paths', nargs='*', help='APlog 日志文件夹路径；批量模式下可以给多个抓取目录')
+    parser.add_argument('--jobs', type=int, default=None, help='并行解析（批量模式下为并行出图）的进程数，默认等于CPU核心数')
+    parser.add_argument('--no-cache', action='store_true', help='不读写解析缓存，强制重新解析所有日志')
+    parser.add_argument('--output', help='批量模式：不弹窗，把每个抓取目录的图表保存为 PNG 和 HTML 到该目录')
+    parser.add_argument('--follow', action='store_true',
+                        help="实时模式：跟踪正在增长的日志（路径为 '-' 时读标准输入，例如 adb logcat），图表定时刷新")
+    parser.add_argument('--window', type=int, default=600, help='实时模式显示最近多少秒，默认 600')
+    parser.add_argument('--fps', type=float, default=2, help='实时模式每秒刷新次数，默认 2')
+    add_time_range_arguments(parser)
+    add_resample_arguments(parser)
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    time_range = time_range_from_args(args)
+    if profiler.profile_requested(args):
+        # 子进程中的计时无法汇总，统计时在当前进程内解析
+        args.jobs = 1
+    if args.follow and args.output:
+        parser.error('--follow 不能和 --output 一起使用')
+    if args.follow and time_range:
+        parser.error('--follow 不能和 --from / --to 一起使用')
+    if args.follow and profiler.profile_requested(args):
+        parser.error('--follow 不能和 --profile 一起使用')
+    if args.export and (args.follow or args.output):
+        parser.error('--export 只用于分析单个抓取目录，不能和 --follow / --output 一起使用')
+    if args.follow:
+        paths = args.paths or [input("请输入日志文件路径:").strip()]
+        with diagnostics_from_args(args):
+            follow_logs(paths, args.window, args.fps)
+        sys.exit(0)
+    if args.output:
+        with profile_from_args(args), diagnostics_from_args(args):
+            ok = run_batch(render_capture, args.paths, args.jobs, output_dir=args.output,
+                           use_cache=not args.no_cache, time_range=time_range)
+        sys.exit(0 if ok else 1)
+    temp_path = args.paths[0] if args.paths else input("请输入日志文件路径:").strip()
+    with profile_from_args(args), diagnostics_from_args(args):
+        with stage('process_logs'):
+            store = process_logs(temp_path, args.jobs, not args.no_cache, time_range)
+        if args.export:
+            # 温度、电量、信号强度和 CPU 使用率对齐到同一时间网格，便于对比（例如温度和 CPU 负载）
+            with stage('export'):
+                export_from_args(store, args, list(TEMP_LABELS) + ['cellular_signal', 'wifi_signal'] +
+                                 [f'cpu{i}' for i in range(8)])
+        with stage('plot_data'):
+            plot_data(store)
@@ -0,0 +1,108 @@
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.collections import LineCollection
+
+# 绘图前的降采样：
+# 几十万个点直接交给 ax.plot，Tk 窗口要画很久，每次平移/缩放都会卡。
+# 这里按当前可见的时间范围把 x 轴分成与像素列数相同的桶，每个桶只保留最小值和最大值两个点
+# （min/max 分桶，M4 的简化版），曲线上的尖峰在任何缩放级别下都不会丢失，
+# 每条曲线最多约 2 倍像素宽度个点。
+# 缩放/平移（xlim_changed）和窗口大小变化时，从完整数据重新降采样。
+# ANR 等事件竖线同理：每种事件每个子图一个 LineCollection，同一像素列内的竖线合并。
+
+
+def minmax_indices(x, values, lo=None, hi=None, buckets=1000):
+    # 返回应保留的点的下标（升序）；x 必须升序。
+    # 可见范围两侧各多保留一个点，曲线能画到坐标轴边缘
+    count = len(x)
+    start = 0 if lo is None else int(np.searchsorted(x, lo, 'left'))
+    stop = count if hi is None else int(np.searchsorted(x, hi, 'right'))
+    outside = [index for index in (start - 1, stop) if 0 <= index < count]
+    if stop - start <= 2 * buckets:
+        return np.array(sorted(outside + list(range(start, stop))), dtype=np.intp)
+
+    window = x[start:stop]
+    segment = values[start:stop]
+    edges = np.linspace(window[0] if lo is None else lo, window[-1] if hi is None else hi, buckets + 1)
+    # 每个非空桶的起始下标（相对 start）
+    bucket_starts = np.unique(np.concatenate(([0], np.searchsorted(window, edges[1:-1]))))
+    bucket_starts = bucket_starts[bucket_starts < len(window)]
+    lengths = np.diff(np.append(bucket_starts, len(window)))
+
+    keep = [np.array(outside, dtype=np.intp) - start, np.array([0, len(window) - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(segment, bucket_starts)
+        positions = np.flatnonzero(segment == np.repeat(extreme, lengths))
+        # 每个桶里第一个取到极值的位置
+        buckets_of = np.searchsorted(bucket_starts, positions, 'right') - 1
+        keep.append(positions[np.unique(buckets_of, return_index=True)[1]])
+    return np.unique(np.concatenate(keep)) + start
+
+
+class DecimatedLine:
+    def __init__(self, ax, timestamps, values, **kwargs):
+        self.ax = ax
+        self.timestamps = np.asarray(timestamps)
+        self.values = np.asarray(values)
+        # 与坐标轴 xlim 相同单位的 x，用于按可见范围查找
+        if self.timestamps.dtype.kind == 'M':
+            self.x = mdates.date2num(self.timestamps)
+        else:
+            self.x = self.timestamps.astype(float)
+        index = self._indices(None, None)
+        self.line, = ax.plot(self.timestamps[index], self.values[index], **kwargs)
+        # matplotlib 的回调只保存弱引用，挂在 Line2D 上让降采样对象与曲线同生命周期
+        self.line.decimator = self
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.figure.canvas.mpl_connect('resize_event', self.update)
+
+    def _indices(self, lo, hi):
+        buckets = max(int(self.ax.bbox.width), 1)
+        return minmax_indices(self.x, self.values, lo, hi, buckets)
+
+    def update(self, event=None):
+        lo, hi = self.ax.get_xlim()
+        index = self._indices(lo, hi)
+        self.line.set_data(self.timestamps[index], self.values[index])
+
+
+def plot_decimated(ax, timestamps, values, **kwargs):
+    # 代替 ax.plot(timestamps, values, **kwargs)，返回 Line2D
+    return DecimatedLine(ax, timestamps, values, **kwargs).line
+
+
+class EventMarkers:
+    # 一种事件在一个坐标轴上的全部竖线，用一个 LineCollection 绘制（代替逐个 axvline）。
+    # 同一像素列内的多条竖线只画一条，缩放/平移时按新的像素宽度重新合并
+    def __init__(self, ax, times, **kwargs):
+        self.ax = ax
+        times = np.asarray(times)
+        self.x = np.sort(mdates.date2num(times) if times.dtype.kind == 'M' else times.astype(float))
+        # x 为数据坐标，y 为坐标轴坐标 0~1，竖线总是贯穿整个子图
+        self.collection = LineCollection([], transform=ax.get_xaxis_transform(), **kwargs)
+        ax.add_collection(self.collection, autolim=False)
+        if len(self.x):
+            # 与 axvline 一样参与 x 轴自动缩放
+            ax.update_datalim([(self.x[0], 0), (self.x[-1], 0)], updatey=False)
+            ax.autoscale_view(scaley=False)
+        self.collection.decimator = self
+        self.update()
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.figure.canvas.mpl_connect('resize_event', self.update)
+
+    def update(self, event=None):
+        lo, hi = self.ax.get_xlim()
+        visible = self.x[np.searchsorted(self.x, lo, 'left'):np.searchsorted(self.x, hi, 'right')]
+        if len(visible):
+            pixel = (hi - lo) / max(self.ax.bbox.width, 1)
+            columns = np.floor((visible - lo) / pixel)
+            visible = visible[np.flatnonzero(np.diff(columns, prepend=-1))]
+        segments = np.zeros((len(visible), 2, 2))
+        segments[:, 0, 0] = segments[:, 1, 0] = visible
+        segments[:, 1, 1] = 1
+        self.collection.set_segments(segments)
+
+
+def plot_event_markers(ax, times, **kwargs):
+    # 代替 for t in times: ax.axvline(x=t, **kwargs)，返回 LineCollection
+    return EventMarkers(ax, times, **kwargs).collection
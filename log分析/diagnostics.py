@@ -0,0 +1,92 @@
+import logging
+import queue
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# 逐条诊断消息（每命中一行一条，例如"找到手机信号"、"匹配到关键字"）：
+# 原来每条都直接 print，一个抓取目录有几十万行输出，Windows 控制台上光打印就要好几分钟。
+# 现在这类消息都通过 note(类别, 格式, 参数...) 记录：每个类别只累加计数，
+# 默认每类只显示前 SAMPLE_LIMIT 条作为示例，结束时输出超出部分的总数；-v 显示全部，-q 都不显示。
+# 显示的消息经 QueueHandler 交给后台线程写控制台，解析循环不会因为控制台 I/O 阻塞。
+# 没有调用 configure()（例如被其它脚本导入）时只计数，不输出。
+
+SAMPLE_LIMIT = 3
+
+logger = logging.getLogger('aplog')
+_counts = Counter()
+_limit = SAMPLE_LIMIT
+_listener = None
+
+
+class Lazy:
+    # note() 的参数：真正输出时才调用 func(*args)，超出示例条数的消息不用先构造参数
+    # （例如 Lazy(str.strip, line)、Lazy(to_datetime, timestamp)）
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+def note(kind, message, *args):
+    # message 用 % 格式，只有真正输出时才格式化；需要计算的参数用 Lazy 包装
+    count = _counts[kind] + 1
+    _counts[kind] = count
+    if count <= _limit:
+        logger.info(message, *args)
+
+
+def configure(verbose=False, quiet=False):
+    global _limit, _listener
+    if _listener is not None:
+        shutdown()
+    _limit = float('inf') if verbose else 0 if quiet else SAMPLE_LIMIT
+    _counts.clear()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _listener = QueueListener(queue.SimpleQueue(), handler)
+    logger.addHandler(QueueHandler(_listener.queue))
+    logger.setLevel(logging.WARNING if quiet else logging.INFO)
+    logger.propagate = False
+    _listener.start()
+
+
+def summarize():
+    # 各类别超出示例条数的部分只输出总数
+    for kind, count in _counts.items():
+        if count > _limit:
+            logger.info("%s: 共 %d 条（只显示了前 %d 条，加 -v 显示全部）", kind, count, _limit)
+    _counts.clear()
+
+
+def shutdown():
+    # 输出汇总，等后台线程把队列中的消息写完
+    global _listener
+    if _listener is None:
+        return
+    summarize()
+    _listener.stop()
+    for handler in [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]:
+        logger.removeHandler(handler)
+    _listener = None
+    sys.stdout.flush()
+
+
+def add_logging_arguments(parser):
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help=f'显示每一条匹配消息（默认每类只显示前 {SAMPLE_LIMIT} 条，结束时输出总数）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不显示逐条匹配消息和它们的汇总')
+
+
+@contextmanager
+def diagnostics_from_args(args):
+    configure(args.verbose, args.quiet)
+    try:
+        yield
+    finally:
+        shutdown()
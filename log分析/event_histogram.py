@@ -0,0 +1,65 @@
+import numpy as np
+
+# 事件按固定时间桶计数（触摸、帧率变化、ANR 警告、应用无响应等）：
+# 原来用 defaultdict 逐个事件累加，这里对整数微秒时间戳数组一次 np.bincount 完成。
+# 柱子上的数字只给当前可见的柱子创建文字，缩放/平移时更新，长时间的日志也不会有成千上万个 Text。
+
+ONE_SECOND_US = 1000000
+# 可见柱子超过这个数量时不显示数字（已经挤在一起看不清了）
+MAX_BAR_LABELS = 200
+
+# 可以计数的数据：事件直接取时间戳；数值序列（如帧率）每个采样点算一次变化
+EVENT_NAMES = ('touch', 'anr_warning', 'app_not_responding')
+SERIES_NAMES = ('fps',)
+
+
+def bucket_counts(timestamps, bucket_seconds=60, keep_empty=False):
+    # timestamps 为整数微秒时间戳（或 datetime64[us]），返回 (桶起始时间 datetime64[us], 计数)
+    timestamps = np.asarray(timestamps).view(np.int64)
+    if len(timestamps) == 0:
+        return np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype=np.int64)
+    width = int(bucket_seconds * ONE_SECOND_US)
+    origin = timestamps.min() // width * width
+    counts = np.bincount((timestamps - origin) // width)
+    buckets = np.arange(len(counts))
+    if not keep_empty:
+        buckets = np.flatnonzero(counts)
+        counts = counts[buckets]
+    return (origin + buckets * width).view('datetime64[us]'), counts
+
+
+def event_counts(store, names=EVENT_NAMES + SERIES_NAMES, bucket_seconds=60):
+    # 返回 {名称: (桶起始时间, 计数)}，store 中没有的名称跳过
+    result = {}
+    for name in names:
+        if name in store.events:
+            result[name] = bucket_counts(np.frombuffer(store.events[name], dtype=np.int64), bucket_seconds)
+        elif name in store.series:
+            result[name] = bucket_counts(store.series[name].view()[0], bucket_seconds)
+    return result
+
+
+class VisibleBarLabels:
+    # 只给 x 轴可见范围内的柱子标数字，缩放/平移时重建
+    def __init__(self, ax, bars, fontsize=10):
+        self.ax = ax
+        self.fontsize = fontsize
+        self.x = np.array([bar.get_x() + bar.get_width() / 2 for bar in bars])
+        self.heights = np.array([bar.get_height() for bar in bars])
+        self.texts = []
+        self.update()
+        # matplotlib 的回调只保存弱引用，挂在坐标轴上保持存活
+        ax.visible_bar_labels = self
+        ax.callbacks.connect('xlim_changed', self.update)
+
+    def update(self, ax=None):
+        for text in self.texts:
+            text.remove()
+        self.texts = []
+        lo, hi = self.ax.get_xlim()
+        visible = np.flatnonzero((self.x >= lo) & (self.x <= hi))
+        if len(visible) > MAX_BAR_LABELS:
+            return
+        for index in visible:
+            self.texts.append(self.ax.text(self.x[index], self.heights[index], f'{int(self.heights[index])}',
+                                           ha='center', va='bottom', fontsize=self.fontsize))
@@ -0,0 +1,199 @@
+import mmap
+import os
+import queue
+import sys
+import threading
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from decimate import minmax_indices
+from ktime_convert import SYNC_ANCHORS, is_raw_kernel_log
+
+# 实时模式（类似 tail -f）：
+# 每个日志文件记住已经解析到的字节偏移量，每次只把新增的完整行 [start, end) 交给原来的
+# scan_log + 解析代码，结果追加到同一个 SeriesStore，不重新读整个文件；
+# 最后一个换行之后的半行留到下次，文件变短（被截断或轮转）时从头重新读。
+# 也可以从管道读取（例如 adb logcat | python cpu.py --follow -），由后台线程逐行读入。
+# 图表按固定帧率刷新，只显示最近 window 秒，每条曲线按像素宽度 min/max 降采样；
+# 每条曲线只保留窗口内的样本，每帧从 SeriesStore 取上次之后新增的部分，不复制、不扫描整个历史。
+
+# 原始 kernel_log 出现第一个时间同步点之前无法换算本地时间，先不解析，最多等这么多字节
+MAX_UNSYNCED_BYTES = 64 * 1024 * 1024
+
+
+class LogFollower:
+    def __init__(self, discover):
+        # discover() 返回当前要跟踪的文件列表；每次 poll 都重新调用，新出现的日志文件会自动加入
+        self.discover = discover
+        self.offsets = {}
+        self.synced = set()
+
+    def poll(self):
+        # 返回 [(file_path, start, end)]：各文件自上次 poll 以来新增的完整行
+        ranges = []
+        for file_path in self.discover():
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+            start = self.offsets.get(file_path, 0)
+            if size < start:
+                print(f"文件变短，从头重新读取: {file_path}")
+                start = 0
+                self.synced.discard(file_path)
+            if size == start:
+                continue
+            end = self._complete_end(file_path, start, size)
+            if end is not None:
+                self.offsets[file_path] = end
+                ranges.append((file_path, start, end))
+        return ranges
+
+    def _complete_end(self, file_path, start, size):
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            end = mm.rfind(b'\n', start, size) + 1
+            if end <= start:
+                return None
+            if is_raw_kernel_log(file_path) and file_path not in self.synced:
+                if any(mm.find(anchor.encode('utf-8'), 0, end) >= 0 for anchor in SYNC_ANCHORS):
+                    self.synced.add(file_path)
+                elif end < MAX_UNSYNCED_BYTES:
+                    return None
+        return end
+
+
+class PipeReader:
+    # 后台线程逐行读取管道（默认标准输入），poll() 取走已经读到的行
+    def __init__(self, stream=None):
+        self.lines = queue.SimpleQueue()
+        self.closed = False
+        thread = threading.Thread(target=self._read, args=(stream or sys.stdin.buffer,), daemon=True)
+        thread.start()
+
+    def _read(self, stream):
+        for line in stream:
+            self.lines.put(line.decode('utf-8', errors='ignore'))
+        self.closed = True
+
+    def poll(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.lines.get_nowait())
+            except queue.Empty:
+                return lines
+
+
+class _Window:
+    # 一条曲线（或一组事件）最近 window 秒的样本；count 为已经从 SeriesStore 取过的样本数
+    def __init__(self):
+        self.count = 0
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float32)
+
+    def extend(self, timestamps, values=None):
+        # 追加新增的样本，返回其中最新的时间戳（没有新样本时为 None）
+        self.count += len(timestamps)
+        if not len(timestamps):
+            return None
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        if values is not None:
+            self.values = np.concatenate((self.values, values))
+        return int(timestamps.max())
+
+    def trim(self, lo_us):
+        # 丢掉窗口之前的样本，之后的帧不再处理它们
+        if len(self.timestamps) and self.timestamps.min() < lo_us:
+            keep = self.timestamps >= lo_us
+            self.timestamps = self.timestamps[keep]
+            if len(self.values):
+                self.values = self.values[keep]
+
+
+class LiveChart:
+    # 曲线和事件竖线直接绑定 SeriesStore 中的指标，refresh() 时取最近 window 秒的数据重画
+    def __init__(self, fig, window_seconds=600):
+        self.fig = fig
+        self.window_us = int(window_seconds * 1000000)
+        self.lines = []
+        self.markers = []
+        self.legend_sizes = {}
+        self.latest = None
+
+    def add_line(self, ax, store, name, **kwargs):
+        # 曲线一开始没有数据，matplotlib 不知道 x 轴是时间，显式指定
+        ax.xaxis_date()
+        line, = ax.plot([], [], **kwargs)
+        self.lines.append((ax, line, store, name, _Window()))
+        return line
+
+    def add_markers(self, ax, store, name, **kwargs):
+        collection = LineCollection([], transform=ax.get_xaxis_transform(), **kwargs)
+        ax.add_collection(collection, autolim=False)
+        self.markers.append((ax, collection, store, name, _Window()))
+        return collection
+
+    def _pull(self, window, timestamps, values=None):
+        newest = window.extend(timestamps, values)
+        if newest is not None and (self.latest is None or newest > self.latest):
+            self.latest = newest
+
+    def newest(self):
+        # 先把各曲线和事件新增的样本收进各自的窗口，返回所有曲线中最新的时间戳（微秒），没有数据时为 None
+        for _, _, store, name, window in self.lines:
+            series = store.series.get(name)
+            if series is not None and len(series) > window.count:
+                self._pull(window, *series.tail(window.count))
+        for _, _, store, name, window in self.markers:
+            events = store.events.get(name)
+            if events is not None and len(events) > window.count:
+                # 切片是一份副本：事件数组还会继续追加，不能留着导出的缓冲区
+                window.extend(np.frombuffer(events[window.count:], dtype=np.int64))
+        return self.latest
+
+    def refresh(self):
+        newest = self.newest()
+        if newest is None:
+            return
+        lo_us, hi_us = newest - self.window_us, newest
+        lo, hi = mdates.date2num(np.array([lo_us, hi_us]).view('datetime64[us]'))
+        for ax, line, store, name, window in self.lines:
+            window.trim(lo_us)
+            # 同一指标可能来自多个文件，窗口内不保证有序
+            order = np.argsort(window.timestamps, kind='stable')
+            x = mdates.date2num(window.timestamps[order].view('datetime64[us]'))
+            values = window.values[order]
+            index = minmax_indices(x, values, buckets=max(int(ax.bbox.width), 1))
+            line.set_data(x[index], values[index])
+        for ax, collection, store, name, window in self.markers:
+            window.trim(lo_us)
+            times = window.timestamps
+            segments = np.zeros((len(times), 2, 2))
+            segments[:, 0, 0] = segments[:, 1, 0] = mdates.date2num(times.view('datetime64[us]'))
+            segments[:, 1, 1] = 1
+            collection.set_segments(segments)
+        for ax in dict.fromkeys(ax for ax, _, _, _, _ in self.lines):
+            ax.set_xlim(lo, hi)
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+            # 有数据的曲线变多时更新图例
+            visible = sum(len(line.get_xdata()) > 0 for line_ax, line, _, _, _ in self.lines if line_ax is ax)
+            if visible != self.legend_sizes.get(ax):
+                self.legend_sizes[ax] = visible
+                handles = [line for line_ax, line, _, _, _ in self.lines if line_ax is ax and len(line.get_xdata())]
+                ax.legend(handles=handles, loc='upper left')
+        self.fig.canvas.draw_idle()
+
+    def start(self, update, fps=2):
+        # 每帧先调用 update() 解析新增内容，再刷新图表；定时器挂在 figure 上保持存活
+        def tick():
+            update()
+            self.refresh()
+        timer = self.fig.canvas.new_timer(interval=max(int(1000 / fps), 1))
+        timer.add_callback(tick)
+        self.fig.live_timer = timer
+        tick()
+        timer.start()
+        return timer
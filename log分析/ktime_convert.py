@@ -0,0 +1,398 @@
+import argparse
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from multiprocessing import freeze_support
+
+# 用 Python 代替 ktime_convert.exe：把 kernel_log 里的开机时间 "[  123.456789]"
+# 换算成手机本地时间，在每行前面加上 "MM-DD HH:MM:SS.ffffff "，格式与 .localtime 文件一致。
+#
+# 开机时间和墙上时间的对应关系来自日志里的同步点：
+#   MTK 的 "android time 2024-10-21 14:03:00.123456"（本地时间）
+#   Android 的 "PM: suspend entry/exit 2024-10-21 06:03:00.123456789 UTC"
+# 休眠期间开机时间不走，所以每遇到一个同步点就重新计算偏移量（见 ClockSync）；
+# 第一个可用同步点之前的行用之后第一个可用同步点补上。
+#
+# iter_localtime_lines() 是流式转换，解析脚本用 open_log() 直接读取原始 kernel_log，
+# 不再生成中间文件；需要 .localtime 文件时用 convert_folder() 批量并行转换。
+
+_KTIME_RE = re.compile(r'(?:<\d+>)?\[\s*(\d+)\.(\d{1,6})\]')
+_ANDROID_TIME_RE = re.compile(r'android time (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.(\d+))?')
+_SUSPEND_UTC_RE = re.compile(r'PM: suspend (entry|exit) (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.(\d+))? UTC')
+_RAW_KERNEL_LOG_RE = re.compile(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}$')
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+# 时区都是 15 分钟的整数倍
+_ZONE_STEP_US = 15 * 60 * 1000000
+# 不能预先查看整个日志时，第一个可用同步点之前最多缓存的行数，超过后只用 UTC 同步点或者按原样输出
+MAX_PENDING_LINES = 1 << 20
+# 时间同步点所在行的字面锚点，按字节查找同步点时使用
+SYNC_ANCHORS = ('android time', 'PM: suspend')
+
+
+def is_raw_kernel_log(file_path):
+    return _RAW_KERNEL_LOG_RE.match(os.path.basename(file_path)) is not None
+
+
+def _wall_us(text, fraction):
+    # "YYYY-MM-DD HH:MM:SS" + 小数部分 -> 微秒时间戳（按时间的数值，不做时区处理）
+    wall = datetime.strptime(text, '%Y-%m-%d %H:%M:%S')
+    return (wall - _EPOCH) // _ONE_US + int((fraction or '0')[:6].ljust(6, '0'))
+
+
+def _sync_point(line, uptime_us):
+    # 同步点所在行返回 (类型, 墙上时间 - 开机时间)，其余行返回 None。
+    # 类型为 'android'（墙上时间是手机本地时间）或 'entry' / 'exit'（墙上时间是 UTC）
+    if 'android time' not in line and 'PM: suspend' not in line:
+        return None
+    match = _ANDROID_TIME_RE.search(line)
+    if match is not None:
+        return 'android', _wall_us(match.group(1), match.group(2)) - uptime_us
+    match = _SUSPEND_UTC_RE.search(line)
+    if match is not None:
+        return match.group(1), _wall_us(match.group(2), match.group(3)) - uptime_us
+    return None
+
+
+def uptime_us(line):
+    # 行首开机时间 "[  123.456789]" 的微秒数，没有时返回 None
+    match = _KTIME_RE.match(line)
+    if match is None:
+        return None
+    return int(match.group(1)) * 1000000 + int(match.group(2).ljust(6, '0'))
+
+
+def sync_point(line):
+    # 时间同步点所在行返回 (类型, 墙上时间 - 开机时间（微秒）)，其余行返回 None
+    uptime = uptime_us(line)
+    if uptime is None:
+        return None
+    return _sync_point(line, uptime)
+
+
+def _zone(local, utc):
+    # 中间没有休眠的两个同步点，本地时间偏移量与 UTC 偏移量之差就是手机的时区
+    return round((local - utc) / _ZONE_STEP_US) * _ZONE_STEP_US
+
+
+def early_offset(utc, first):
+    # 第一个可用同步点之前的行：first 为 (之后第一个可用同步点的偏移量, 时区)，
+    # 之前有 UTC 同步点并且时区已知时用 UTC 同步点加上时区，能跨过中间的休眠
+    offset, zone = first
+    return offset if utc is None or zone is None else utc + zone
+
+
+class ClockSync:
+    # 换算状态：offset 为当前的 本地时间 - 开机时间（微秒），每个同步点更新一次。
+    # UTC 同步点要加上手机的时区才是本地时间，时区从相邻的两种同步点得出（不用分析机器的时区）：
+    # suspend exit 之后的 android time、android time 之后的 suspend entry，两者之间没有休眠。
+    # local 为 True 时按 android time 换算，UTC 同步点在时区已知之后才使用；
+    # 为 False 时日志里没有 android time，只用 UTC 同步点，换算出的是 UTC 时间；
+    # 为 None 时还不知道（不能预先查看整个日志），由 iter_localtime_lines() 缓存等待
+    def __init__(self, local=None):
+        self.local = local
+        self.zone = None
+        self.offset = None
+        # 上一个同步点 (类型, 偏移量)，最近一个 UTC 同步点的偏移量
+        self.previous = None
+        self.utc = None
+        # 第一个可用同步点之前的行用的 (偏移量, 时区)，见 early_offset()
+        self.first = None
+
+    def update(self, kind, value):
+        previous, self.previous = self.previous, (kind, value)
+        if kind == 'android':
+            if previous is not None and previous[0] == 'exit':
+                self.zone = _zone(value, previous[1])
+            if self.local is not False:
+                self.local = True
+                self.offset = value
+            return
+        self.utc = value
+        if kind == 'entry' and previous is not None and previous[0] == 'android':
+            self.zone = _zone(previous[1], value)
+        if self.local is False:
+            self.offset = value
+        elif self.local and self.zone is not None:
+            self.offset = value + self.zone
+
+
+def sync_points(mm, lo, hi, reverse=False):
+    # mmap 中 [lo, hi) 范围内的时间同步点 (行首位置, 类型, 偏移量)，reverse 时从后往前
+    anchors = [anchor.encode('utf-8') for anchor in SYNC_ANCHORS]
+    find = mm.rfind if reverse else mm.find
+    hits = [find(anchor, lo, hi) for anchor in anchors]
+    while True:
+        found = [hit for hit in hits if hit >= 0]
+        if not found:
+            return
+        hit = max(found) if reverse else min(found)
+        line_start = mm.rfind(b'\n', 0, hit) + 1
+        line_end = mm.find(b'\n', hit)
+        line_end = len(mm) if line_end < 0 else line_end
+        point = sync_point(mm[line_start:line_end].decode('utf-8', errors='ignore'))
+        if point is not None:
+            yield (line_start,) + point
+        # 同一行里的锚点不再重复查找
+        if reverse:
+            hi = line_start
+            hits = [find(anchor, lo, hi) if old >= line_start else old for anchor, old in zip(anchors, hits)]
+        else:
+            lo = line_end
+            hits = [find(anchor, lo, hi) if 0 <= old < line_end else old for anchor, old in zip(anchors, hits)]
+
+
+def has_android_time(mm):
+    anchor = SYNC_ANCHORS[0].encode('utf-8')
+    pos = mm.find(anchor)
+    while pos >= 0:
+        line_start = mm.rfind(b'\n', 0, pos) + 1
+        line_end = mm.find(b'\n', pos)
+        point = sync_point(mm[line_start:len(mm) if line_end < 0 else line_end].decode('utf-8', errors='ignore'))
+        if point is not None and point[0] == 'android':
+            return True
+        pos = -1 if line_end < 0 else mm.find(anchor, line_end)
+    return False
+
+
+def clock_at(mm, start):
+    # 从 start（行首）开始读取时的换算状态，与从头读到 start 时一致。
+    # 往前只找必要的同步点：最近一个同步点、最近一个 android time 和 UTC 同步点、最近一对能得出时区的相邻同步点；
+    # 前面没有可用的同步点时往后找第一个可用的
+    clock = ClockSync(local=has_android_time(mm))
+    first_anchor = {kind: mm.find(anchor.encode('utf-8'), 0, start) for kind, anchor in zip(('android', 'utc'), SYNC_ANCHORS)}
+    android = None
+    later = None
+    for pos, kind, value in sync_points(mm, 0, start, reverse=True):
+        if later is None:
+            clock.previous = (kind, value)
+        if kind == 'android':
+            android = value if android is None else android
+        elif clock.utc is None:
+            clock.utc = value
+        if later is not None and clock.zone is None:
+            if kind == 'exit' and later[0] == 'android':
+                clock.zone = _zone(later[1], value)
+            elif kind == 'android' and later[0] == 'entry':
+                clock.zone = _zone(value, later[1])
+        later = (kind, value)
+        if not clock.local:
+            if clock.utc is not None:
+                break
+        elif clock.zone is not None:
+            break
+        else:
+            # 更早的同步点里已经没有另一种类型，不会再有能得出时区的一对
+            other = first_anchor['utc' if kind == 'android' else 'android']
+            if not 0 <= other < pos:
+                break
+    if not clock.local:
+        clock.offset = clock.utc
+    elif clock.zone is not None:
+        kind, value = clock.previous
+        clock.offset = value if kind == 'android' else value + clock.zone
+    else:
+        clock.offset = android
+    if clock.offset is None and not clock.local:
+        clock.first = next(((value, 0) for _, kind, value in sync_points(mm, start, len(mm)) if kind != 'android'), None)
+    elif clock.offset is None:
+        # 之后第一个 android time 的偏移量，以及之后第一对能得出时区的相邻同步点
+        offset = zone = None
+        previous = clock.previous
+        head = None
+        for pos, kind, value in sync_points(mm, start, len(mm)):
+            head = (kind, value) if head is None else head
+            if kind == 'android':
+                offset = value if offset is None else offset
+                if previous is not None and previous[0] == 'exit':
+                    zone = _zone(value, previous[1])
+            elif kind == 'entry' and previous is not None and previous[0] == 'android':
+                zone = _zone(previous[1], value)
+            if offset is not None and zone is not None:
+                break
+            previous = (kind, value)
+        if offset is not None and zone is not None and head[0] != 'android':
+            # 在第一个同步点之前的行也能跨过之后的休眠
+            offset = head[1] + zone
+        clock.first = None if offset is None else (offset, zone)
+    return clock
+
+
+def file_clock(file_path, start=0):
+    # 原始 kernel_log 从 start 开始读取时的换算状态
+    with open(file_path, 'rb') as file:
+        if start >= os.fstat(file.fileno()).st_size:
+            return ClockSync()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return clock_at(mm, start)
+
+
+class _Formatter:
+    # 同一秒内的行共用一次 strftime
+    def __init__(self):
+        self.second = None
+        self.head = None
+
+    def __call__(self, us, line):
+        second, fraction = divmod(us, 1000000)
+        if second != self.second:
+            self.second = second
+            self.head = (_EPOCH + timedelta(seconds=second)).strftime('%m-%d %H:%M:%S')
+        return f"{self.head}.{fraction:06d} {line}"
+
+
+def _resolve(pending, offset, zone, format_line):
+    # 缓存的行补上时间：offset 为第一个可用同步点的偏移量，时区已知时用缓存中的 UTC 同步点
+    first_utc = next((utc for _, _, utc in pending if utc is not None), None)
+    first = (offset if first_utc is None or zone is None else first_utc + zone, zone)
+    for uptime, line, utc in pending:
+        yield line if uptime is None else format_line(uptime + early_offset(utc, first), line)
+
+
+def _settle(pending, clock, format_line):
+    # 一直没有等到 android time：有 UTC 同步点时只用 UTC 同步点，否则按原样输出
+    first_utc = next((utc for _, _, utc in pending if utc is not None), None)
+    if first_utc is None:
+        print("kernel_log 中没有找到时间同步点，无法换算本地时间")
+        for _, line, _ in pending:
+            yield line
+        return
+    print("kernel_log 中没有 android time 同步点，按 UTC 时间换算")
+    clock.local = False
+    clock.offset = clock.utc
+    yield from _resolve(pending, first_utc, 0, format_line)
+
+
+def iter_localtime_lines(lines, clock=None):
+    # 流式转换：输入原始 kernel_log 的行，输出带本地时间前缀的行。
+    # 没有开机时间的行（续行等）沿用上一行的时间。
+    # clock 为 clock_at() / file_clock() 得到的换算状态；不给时第一个可用同步点之前的行先缓存，
+    # 等到 android time 再补上，缓存满了还没有等到时改为只用 UTC 同步点
+    clock = clock or ClockSync()
+    format_line = _Formatter()
+    pending = []
+    # 没有可用的同步点时放弃等待：之后的行不再缓存，直接原样输出，直到出现同步点
+    gave_up = False
+    last_uptime = None
+    for line in lines:
+        match = _KTIME_RE.match(line)
+        if match is not None:
+            last_uptime = int(match.group(1)) * 1000000 + int(match.group(2).ljust(6, '0'))
+            point = _sync_point(line, last_uptime)
+            if point is not None:
+                clock.update(*point)
+                if pending and clock.offset is not None:
+                    yield from _resolve(pending, clock.offset, clock.zone, format_line)
+                    pending = []
+
+        offset = clock.offset
+        if offset is None and clock.first is not None:
+            offset = early_offset(clock.utc, clock.first)
+        if offset is None and not gave_up:
+            if clock.local is None and len(pending) < MAX_PENDING_LINES:
+                pending.append((last_uptime, line, clock.utc))
+                continue
+            yield from _settle(pending, clock, format_line)
+            pending = []
+            offset = clock.offset
+            gave_up = offset is None
+        if offset is None or last_uptime is None:
+            yield line
+        else:
+            yield format_line(last_uptime + offset, line)
+
+    if pending:
+        yield from _settle(pending, clock, format_line)
+
+
+def _read_bytes(file, size):
+    # 从当前位置逐行读取约 size 字节（到行尾为止）
+    for line in file:
+        if size <= 0:
+            return
+        size -= len(line)
+        yield line
+
+
+@contextmanager
+def open_log(file_path, start=0, end=None):
+    # 打开日志用于逐行读取；原始 kernel_log 在读取时直接换算成本地时间。
+    # 给出 [start, end) 时只读这一段（start 必须在行首），原始 kernel_log 用 start 之前的同步点接上时间
+    if start == 0 and end is None:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+            if is_raw_kernel_log(file_path):
+                yield iter_localtime_lines(file, file_clock(file_path))
+            else:
+                yield file
+        return
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        file.seek(start)
+        lines = (line.decode('utf-8', errors='ignore') for line in _read_bytes(file, end - start))
+        if is_raw_kernel_log(file_path):
+            yield iter_localtime_lines(lines, file_clock(file_path, start))
+        else:
+            yield lines
+
+
+def convert_file(file_path):
+    # 生成与 ktime_convert.exe 相同的 .localtime 文件，返回其路径
+    localtime_file = file_path + '.localtime'
+    temp_file = f"{localtime_file}.{os.getpid()}.tmp"
+    with open_log(file_path) as lines, open(temp_file, 'w', encoding='utf-8') as output:
+        output.writelines(lines)
+    os.replace(temp_file, localtime_file)
+    return localtime_file
+
+
+def kernel_log_source(file_path):
+    # 原始 kernel_log 已有不比它旧的 .localtime 时直接读 .localtime，否则读取原始日志边读边转换
+    localtime_file = file_path + '.localtime'
+    if os.path.exists(localtime_file) and os.path.getmtime(localtime_file) >= os.path.getmtime(file_path):
+        return localtime_file
+    return file_path
+
+
+def find_stale_kernel_logs(folder):
+    # 没有 .localtime 或 .localtime 比原始日志旧的 kernel_log
+    stale = []
+    for root, dirs, files in os.walk(folder):
+        for file in files:
+            if not is_raw_kernel_log(file):
+                continue
+            file_path = os.path.join(root, file)
+            if kernel_log_source(file_path) == file_path:
+                stale.append(file_path)
+    return sorted(stale)
+
+
+def convert_folder(folder, jobs=None):
+    # 批量模式：文件夹下所有需要转换的 kernel_log 分给多个进程并行转换
+    files = find_stale_kernel_logs(folder)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) <= 1:
+        converted = [convert_file(file_path) for file_path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as executor:
+            converted = list(executor.map(convert_file, files))
+    for localtime_file in converted:
+        print(f"成功转换文件: {localtime_file}")
+    return converted
+
+
+if __name__ == "__main__":
+    freeze_support()
+    parser = argparse.ArgumentParser(description='把 kernel_log 的开机时间转换为本地时间，生成 .localtime 文件')
+    parser.add_argument('paths', nargs='+', help='kernel_log 文件或包含 kernel_log 的文件夹')
+    parser.add_argument('--jobs', type=int, default=None, help='并行转换的进程数，默认等于 CPU 核数')
+    args = parser.parse_args()
+    for path in args.paths:
+        if os.path.isdir(path):
+            convert_folder(path, args.jobs)
+        else:
+            print(f"成功转换文件: {convert_file(path)}")
@@ -0,0 +1,82 @@
+import re
+from time import perf_counter
+
+import profiler
+
+# 单次分类的行匹配引擎：
+# 先用所有规则的字面锚点拼成的一个正则做预过滤（绝大多数行在这一步就被排除），
+# 命中后再按优先级只对锚点出现在行内的规则执行各自预编译好的正则。
+
+
+class Rule:
+    def __init__(self, name, anchor, pattern, anchor_is_prefix=True):
+        # anchor 是 pattern 开头的字面量时从锚点位置开始搜索；
+        # 否则 anchor 只是行内一定出现的字面量，正则从行首搜索
+        self.name = name
+        self.anchor = anchor
+        self.regex = re.compile(pattern)
+        self.search_from_anchor = anchor_is_prefix
+
+
+class LineClassifier:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        anchors = sorted({rule.anchor for rule in self.rules}, key=len, reverse=True)
+        self.prefilter = re.compile('|'.join(re.escape(anchor) for anchor in anchors))
+
+    def match(self, line):
+        # 返回优先级最高的 (规则名, match)，没有命中返回 None
+        if not self.prefilter.search(line):
+            return None
+        for rule in self.rules:
+            pos = line.find(rule.anchor)
+            if pos < 0:
+                continue
+            match = rule.regex.search(line, pos if rule.search_from_anchor else 0)
+            if match:
+                return rule.name, match
+        return None
+
+    def match_all(self, line):
+        # 按优先级返回所有命中的 (规则名, match)
+        if not self.prefilter.search(line):
+            return []
+        hits = []
+        for rule in self.rules:
+            pos = line.find(rule.anchor)
+            if pos < 0:
+                continue
+            match = rule.regex.search(line, pos if rule.search_from_anchor else 0)
+            if match:
+                hits.append((rule.name, match))
+        return hits
+
+
+class ProfiledClassifier(LineClassifier):
+    # --profile 时使用：与 LineClassifier 结果相同，另外记录预过滤和每条规则正则的耗时、命中次数
+    def match(self, line):
+        hits = self._timed_hits(line, first_only=True)
+        return hits[0] if hits else None
+
+    def match_all(self, line):
+        return self._timed_hits(line, first_only=False)
+
+    def _timed_hits(self, line, first_only):
+        start = perf_counter()
+        found = self.prefilter.search(line)
+        profiler.rule_hit('(预过滤)', perf_counter() - start, found)
+        hits = []
+        if not found:
+            return hits
+        for rule in self.rules:
+            pos = line.find(rule.anchor)
+            if pos < 0:
+                continue
+            start = perf_counter()
+            match = rule.regex.search(line, pos if rule.search_from_anchor else 0)
+            profiler.rule_hit(rule.name, perf_counter() - start, match)
+            if match:
+                hits.append((rule.name, match))
+                if first_only:
+                    break
+        return hits
@@ -1,11 +1,24 @@
 import os
 import re
-import matplotlib.pyplot as plt
-from datetime import datetime
-from matplotlib import font_manager
-import subprocess
+import sys
+from metric_rules import ruleset, extract_file
+from series_store import SeriesStore, merge_stores
+from ktime_convert import kernel_log_source
+from time_index import add_time_range_arguments, time_range_from_args
+from report import select_backend, pyplot, chinese_font, show_or_save, run_batch, capture_name
+from parse_cache import ruleset_version, load_cached_store, save_cached_store
+from profiler import add_profile_arguments, profile_from_args, profile_requested, stage
+from diagnostics import add_logging_arguments, diagnostics_from_args
+import argparse
+from multiprocessing import freeze_support
+
+# 批量出图(--output)时使用 Agg 后端，不弹窗
+select_backend()
+
+TEMP_RULE_NAMES = ('mtk_bh', 'batt_temp_kernel', 'wmt', 'battery_main', 'healthd')
+
 # 温度数据处理
-def process_log_files(path):
+def process_log_files(path, use_cache=True, output_dir=None, time_range=None):
     log_files = []
     
     # 遍历给定路径下的所有文件
@@ -14,131 +27,54 @@ def process_log_files(path):
             if re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}\.localtime$', file):
                 log_files.append(os.path.join(root, file))
             elif re.match(r'kernel_log_\d+__\d{4}_\d{4}_\d{6}$', file):
-                # 如果找到非.localtime的kernel日志,尝试转换
-                convert_kernel_log(os.path.join(root, file))
-                localtime_file = os.path.join(root, file + '.localtime')
-                if os.path.exists(localtime_file):
-                    log_files.append(localtime_file)
+                # 非.localtime的kernel日志：已有最新的 .localtime 时读 .localtime，否则读取时直接换算本地时间
+                log_files.append(kernel_log_source(os.path.join(root, file)))
             elif re.match(r'main_log_\d+__\d{4}_\d{4}_\d{6}', file):
                 log_files.append(os.path.join(root, file))
     
     # 按文件名排序,确保按顺序处理
     log_files.sort()
     
-    # 用于存储所有温度数据的字典
-    all_temps = {
-        'timestamp': [], 'tmp1': [], 'tmp2': [], 'tmp3': [], 
-        'batt_temp_kernel': [], 'batt_temp_main': [], 'batt_temp_healthd': [],
-        'wmt': [], 'batt_level_main': [], 'batt_level_kernel': []
-    }
-    
-    # 处理每个日志文件
-    processed_files = set()  # 用于跟踪已处理的文件
-    for file_path in log_files:
-        if file_path not in processed_files:
-            process_file(file_path, all_temps)
-            processed_files.add(file_path)
+    # 处理每个日志文件，每个文件的结果先查磁盘缓存，没有命中再解析并写回缓存；
+    # 只分析一段时间（time_range）时结果不完整，不读写缓存
+    use_cache = use_cache and not time_range
+    version = ruleset_version(ruleset(TEMP_RULE_NAMES))
+    file_stores = []
+    for file_path in dict.fromkeys(log_files):  # 去掉重复的文件
+        store = load_cached_store(file_path, 'list_files.temp', version) if use_cache else None
+        if store is None:
+            store = SeriesStore()
+            with stage('process_file'):
+                process_file(file_path, store, time_range)
+            if use_cache:
+                save_cached_store(file_path, 'list_files.temp', version, store)
+        else:
+            print(f"使用解析缓存: {file_path}")
+        file_stores.append(store)
+
+    # 按指标分列存储所有温度数据，各文件的结果按时间戳合并
+    all_temps = merge_stores(file_stores)
     
     # 打印数据长度以进行调试
-    print("数据长度:")
-    for key, value in all_temps.items():
-        print(f"{key}: {len(value)}")
+    all_temps.print_summary("数据长度:")
     
     # 绘制图表
-    plot_temperatures(all_temps)
-
-def convert_kernel_log(file_path):
-    ktime_convert = os.path.join(os.path.dirname(__file__), 'ktime_convert.exe')
-    if os.path.exists(ktime_convert):
-        try:
-            subprocess.run([ktime_convert, file_path], check=True)
-            print(f"成功转换文件: {file_path}")
-        except subprocess.CalledProcessError:
-            print(f"转换文件失败: {file_path}")
-    else:
-        print("未找到 ktime_convert.exe 文件,无法转换 kernel 日志")
+    with stage('plot_temperatures'):
+        plot_temperatures(all_temps, output_dir, f"{capture_name(path)}_temperature")
 
-def process_file(file_path, all_temps):
+def process_file(file_path, all_temps, time_range=None):
     print(f"处理文件: {file_path}")
-    wmt_count = 0
-    processed_timestamps = set()
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        for line in file:
-            timestamp = extract_timestamp(line)
-            if timestamp is None or timestamp in processed_timestamps:
-                continue
-            processed_timestamps.add(timestamp)
-
-            # 匹配MTK_BH温度 (kernel_log)
-            match = re.search(r'MTK_BH:.*tmp:(\d+) (\d+) (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, tmp1=int(match.group(1)), tmp2=int(match.group(2)), tmp3=int(match.group(3)))
-                continue
-
-            # 匹配电池温度 (kernel_log)
-            match = re.search(r'orignal batt_temp = (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_temp_kernel=int(match.group(1)) / 10)
-                continue
+    # 只解码含有规则锚点的行，其余行在 bytes 层面直接跳过
+    extractor = extract_file(file_path, TEMP_RULE_NAMES, all_temps, time_range=time_range)
+    print(f"文件 {file_path} 中找到 {extractor.summary()}")
 
-            # 匹配无线通讯内部温度 (kernel_log)
-            match = re.search(r'wmt_dev_tm_temp_query.*current_temp = (0x[0-9a-fA-F]+)', line)
-            if match:
-                wmt_temp = int(match.group(1), 16)
-                update_temps(all_temps, timestamp, wmt=wmt_temp)
-                wmt_count += 1
-                print(f"找到无线通讯温度: {wmt_temp}°C, 时间戳: {timestamp}")
-                continue
+def plot_temperatures(temps, output_dir=None, name='temperature'):
+    plt = pyplot()
+    from decimate import plot_decimated
+    font_prop = chinese_font()
 
-            # 匹配电池电量和温度 (main_log)
-            match = re.search(r'BatteryLabService: current level == (\d+), temperature == (\d+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_temp_main=int(match.group(2)) / 10, batt_level_main=int(match.group(1)))
-                continue
-
-            # 匹配kernel日志中的电池信息
-            match = re.search(r'healthd: battery l=(\d+) v=\d+ t=([\d.]+)', line)
-            if match:
-                update_temps(all_temps, timestamp, batt_level_kernel=int(match.group(1)), batt_temp_healthd=float(match.group(2)))
-                continue
-
-    print(f"文件 {file_path} 中找到 {wmt_count} 个无线通讯温度数据点")
-
-def update_temps(all_temps, timestamp, tmp1=None, tmp2=None, tmp3=None, 
-                 batt_temp_kernel=None, batt_temp_main=None, batt_temp_healthd=None, 
-                 wmt=None, batt_level_main=None, batt_level_kernel=None):
-    all_temps['timestamp'].append(timestamp)
-    all_temps['tmp1'].append(tmp1)
-    all_temps['tmp2'].append(tmp2)
-    all_temps['tmp3'].append(tmp3)
-    all_temps['batt_temp_kernel'].append(batt_temp_kernel)
-    all_temps['batt_temp_main'].append(batt_temp_main)
-    all_temps['batt_temp_healthd'].append(batt_temp_healthd)
-    if wmt is not None:
-        print(f"更新无线通讯温度: {wmt}°C, 时间戳: {timestamp}")
-    all_temps['wmt'].append(wmt)
-    all_temps['batt_level_main'].append(batt_level_main)
-    all_temps['batt_level_kernel'].append(batt_level_kernel)
-
-def extract_timestamp(line):
-    # 首先尝试匹配kernel日志的时间戳格式
-    match = re.search(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})', line)
-    if match:
-        return datetime.strptime(match.group(1), '%m-%d %H:%M:%S.%f')
-    
-    # 如果没有匹配到,尝试匹配healthd日志的时间戳格式
-    match = re.search(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})', line)
-    if match:
-        return datetime.strptime(match.group(1), '%m-%d %H:%M:%S.%f')
-    
-    return None
-
-def plot_temperatures(temps):
-    font_path = 'C:/Windows/Fonts/simhei.ttf'
-    font_prop = font_manager.FontProperties(fname=font_path)
-    plt.rcParams['font.family'] = font_prop.get_name()
-    
-    plt.figure(figsize=(12, 6))
+    fig = plt.figure(figsize=(12, 6))
+    ax = plt.gca()
     
     label_map = {
         'tmp1': 'MTK_BH 温度1',
@@ -165,14 +101,14 @@ def plot_temperatures(temps):
     }
     
     for key in label_map.keys():
-        valid_data = [(t, v) for t, v in zip(temps['timestamp'], temps[key]) if v is not None]
-        print(f"{key}: {len(valid_data)} 个有效数据点")
-        if valid_data:
-            timestamps, values = zip(*valid_data)
+        timestamps, values = temps.view(key)
+        print(f"{key}: {len(values)} 个有效数据点")
+        if len(values):
+            # 按像素宽度降采样，缩放时从完整数据重新降采样
             if 'batt_level' in key:
-                plt.plot(timestamps, values, label=label_map[key], color=color_map[key], linestyle='--')
+                plot_decimated(ax, timestamps, values, label=label_map[key], color=color_map[key], linestyle='--')
             else:
-                plt.plot(timestamps, values, label=label_map[key], color=color_map[key])
+                plot_decimated(ax, timestamps, values, label=label_map[key], color=color_map[key])
 
     plt.xlabel('时间', fontproperties=font_prop)
     plt.ylabel('温度 (°C) / 电池电量 (%)', fontproperties=font_prop)
@@ -180,8 +116,32 @@ def plot_temperatures(temps):
     plt.legend(loc='best', prop=font_prop)
     plt.gcf().autofmt_xdate()
     plt.tight_layout()
-    plt.show()
+    show_or_save(fig, output_dir, name)
+
+def render_capture(path, output_dir, use_cache=True, time_range=None):
+    # 批量模式的工作函数：一个抓取目录生成一张温度图
+    process_log_files(path, use_cache, output_dir, time_range)
 
 if __name__ == "__main__":
-    log_path = input("请输入日志文件路径: ")
-    process_log_files(log_path)
\ No newline at end of file
+    freeze_support()  # 打包成 exe 后子进程需要
+    parser = argparse.ArgumentParser(description='温度和电池电量日志分析')
+    parser.add_argument('paths', nargs='*', help='APlog 日志文件夹路径；批量模式下可以给多个抓取目录')
+    parser.add_argument('--no-cache', action='store_true', help='不读写解析缓存，强制重新解析所有日志')
+    parser.add_argument('--output', help='批量模式：不弹窗，把每个抓取目录的图表保存为 PNG 和 HTML 到该目录')
+    parser.add_argument('--jobs', type=int, default=None, help='批量模式并行出图的进程数，默认等于CPU核心数')
+    add_time_range_arguments(parser)
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    time_range = time_range_from_args(args)
+    if profile_requested(args):
+        # 子进程中的计时无法汇总，统计时在当前进程内出图
+        args.jobs = 1
+    if args.output:
+        with profile_from_args(args), diagnostics_from_args(args):
+            ok = run_batch(render_capture, args.paths, args.jobs, output_dir=args.output,
+                           use_cache=not args.no_cache, time_range=time_range)
+        sys.exit(0 if ok else 1)
+    log_path = args.paths[0] if args.paths else input("请输入日志文件路径: ")
+    with profile_from_args(args), diagnostics_from_args(args), stage('process_log_files'):
+        process_log_files(log_path, not args.no_cache, time_range=time_range)
\ No newline at end of file
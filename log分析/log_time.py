@@ -0,0 +1,67 @@
+import re
+from datetime import datetime, timedelta
+
+# 固定格式 "MM-DD HH:MM:SS.ffffff" 的快速时间戳解析
+# 解析结果是整数微秒（相对 1970-01-01），只有绘图时才转换成 datetime
+
+# 原来 strptime('%m-%d %H:%M:%S.%f') 不带年份，得到的是 1900 年，这里保持一致
+DEFAULT_YEAR = 1900
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+_TIMESTAMP_RE = re.compile(r'\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}')
+
+# "MM-DD HH:MM:SS" -> 该秒的微秒时间戳；同一秒内的几千行共用一次计算
+_second_cache = {}
+_CACHE_LIMIT = 1 << 16
+
+
+def _second_base(head):
+    base = _second_cache.get(head)
+    if base is None:
+        try:
+            dt = datetime(DEFAULT_YEAR, int(head[0:2]), int(head[3:5]),
+                          int(head[6:8]), int(head[9:11]), int(head[12:14]))
+        except ValueError:
+            return None
+        base = (dt - _EPOCH) // _ONE_US
+        if len(_second_cache) >= _CACHE_LIMIT:
+            _second_cache.clear()
+        _second_cache[head] = base
+    return base
+
+
+def parse_timestamp(line):
+    # 快速路径：时间戳在行首，且这一秒已经在缓存里
+    base = _second_cache.get(line[:14])
+    if base is not None and line[14:15] == '.':
+        frac = line[15:21]
+        if len(frac) == 6 and frac.isdigit():
+            return base + int(frac)
+
+    # 慢速路径：时间戳不在行首（或缓存未命中），用正则定位后切片
+    match = _TIMESTAMP_RE.search(line)
+    if match is None:
+        return None
+    text = match.group()
+    base = _second_base(text[:14])
+    if base is None:
+        return None
+    return base + int(text[15:21])
+
+
+def parse_second(text):
+    # "MM-DD HH:MM:SS" -> 该秒的微秒时间戳，无法解析时返回 None
+    return _second_base(text)
+
+
+def to_datetime(us):
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def to_datetimes(values):
+    return [_EPOCH + timedelta(microseconds=us) for us in values]
+
+
+def format_timestamp(us, fmt='%m-%d %H:%M:%S.%f'):
+    return to_datetime(us).strftime(fmt)
@@ -1,94 +1,92 @@
-import matplotlib.pyplot as plt
-import matplotlib
-import matplotlib.dates as mdates
-from mpl_toolkits.mplot3d import Axes3D
 from datetime import datetime, timedelta
-from collections import defaultdict
-import plotly.graph_objs as go
-import plotly.offline as pyo
 import re
-import subprocess
 import os
 import sys
-
-# 设置支持中文的字体
-matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 黑体
-matplotlib.rcParams['axes.unicode_minus'] = False
-
-def convert_kernel_log_to_localtime(log_file):
-    # 生成 .localtime 后缀的文件名
-    localtime_file = f"{log_file}.localtime"
-    
-    # 调用 ktime_convert.exe 工具
-    try:
-        subprocess.run(['ktime_convert.exe', log_file], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error occurred while running ktime_convert.exe: {e}")
-        return None
-    
-    # 检查 .localtime 文件是否生成
-    if not os.path.exists(localtime_file):
-        print(f"Error: The .localtime file '{localtime_file}' was not created.")
-        return None
-
-    return localtime_file
-
-
-
-def plot_kernel_log(log_file):
-    # 定义正则表达式模式
-    time_pattern = re.compile(r'\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
-    cpu_usage_pattern = re.compile(r'Cpus Usage\s+\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]\s*,?\s*\[(\d+)\]')
-    touch_pattern = re.compile(r'touch_report info: touch (down|up)\[res:8\] :Finger 0: x = ([0-9]+), y = ([0-9]+)')
-    perf_start_pattern = re.compile(r'\[.*\]\[.*\] \[K\]\[Perf\] TRAN Perf Statistic start \((\d{2}-\d{2} \d{2}:\d{2}:\d{2})\)')
-    fps_pattern = re.compile(r'\[DISP\]\[fps\]: drm_invoke_fps_chg_callbacks,new_fps =(\d+)')
-
-    # 初始化数据
-    cpu_data = []
-    touch_data = []
-    fps_data = []
-    perf_start_time = None
-
+import argparse
+
+from series_store import SeriesStore, merge_stores
+from parse_cache import ruleset_version, load_cached_store, save_cached_store
+from log_time import to_datetimes
+from metric_rules import ruleset, extract_file
+from ktime_convert import kernel_log_source
+from time_index import add_time_range_arguments, time_range_from_args
+from event_histogram import event_counts, VisibleBarLabels
+from report import select_backend, pyplot, headless_requested, show_or_save, run_batch, capture_name
+from profiler import add_profile_arguments, profile_from_args, profile_requested, stage
+from multiprocessing import freeze_support
+
+# 批量出图(--output)时使用 Agg 后端，不弹窗。
+# matplotlib 在第一次绘图时才导入（pyplot()），同时设置中文字体（黑体）和负号显示，
+# 输入提示和日志解析不用等绘图库加载
+select_backend()
+
+# 时间戳 "MM-DD HH:MM:SS"（精确到秒），行内没有时间戳的行跳过
+time_pattern = re.compile(r'\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+# 要提取的指标（正则、曲线名、比例等见 metric_rules.json），每个日志只扫描一次；
+# CPU、电量、手机信号和 WiFi 用本脚本原来的写法（*_relaxed / *_any_tag / *_tagged），与其它脚本共用的规则写法不同
+KERNEL_RULE_NAMES = ('cpu_usage_relaxed', 'touch', 'perf_start', 'fps')
+MAIN_RULE_NAMES = ('cellular_signal_any_tag', 'battery_any_tag', 'backlight', 'anr_warning', 'app_not_responding',
+                   'wifi_signal_tagged')
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+# "MM-DD HH:MM:SS" -> 微秒时间戳，同一秒的多行只计算一次
+_second_cache = {}
+
+
+def parse_second(text):
+    timestamp = _second_cache.get(text)
+    if timestamp is None:
+        # 假设年份是 2024 年
+        timestamp = (datetime.strptime(f"2024-{text}", "%Y-%m-%d %H:%M:%S") - _EPOCH) // _ONE_US
+        _second_cache[text] = timestamp
+    return timestamp
+
+
+def line_second(line):
+    time_match = time_pattern.search(line)
+    return parse_second(time_match.group()) if time_match else None
+
+
+def load_or_parse(log_file, kind, rule_names, parse, use_cache=True, time_range=None):
+    # 日志和规则都没变时直接读取上次的解析结果；只分析一段时间（time_range）时不读写缓存
+    use_cache = use_cache and not time_range
+    version = ruleset_version(ruleset(rule_names))
+    store = load_cached_store(log_file, kind, version) if use_cache else None
+    if store is not None:
+        print(f"使用解析缓存: {log_file}")
+        return store
+    with stage(parse.__name__):
+        store = parse(log_file, time_range)
+    # 按时间戳排序
+    store = merge_stores([store])
+    if use_cache:
+        save_cached_store(log_file, kind, version, store)
+    return store
+
+
+def parse_log(log_file, rule_names, time_range=None):
+    # 只解码可能命中的行；时间戳只精确到秒，同一秒的多行都要保留，不按时间戳去重
+    store = SeriesStore()
+    extract_file(log_file, rule_names, store, time_range=time_range,
+                 line_time=line_second, group_time=parse_second, dedupe=False)
+    return store
+
+
+def parse_kernel_log(log_file, time_range=None):
+    # CPU 使用率、触摸事件（绘图只统计次数）、帧率变化和校准时间
+    return parse_log(log_file, KERNEL_RULE_NAMES, time_range)
+
+
+def plot_kernel_log(log_file, use_cache=True, bucket_seconds=60, output_dir=None, name=None, time_range=None):
     try:
-        # 读取并解析日志文件
-        with open(log_file, 'r', encoding='utf-8', errors='ignore') as file:
-            timestamps = []
-            for line in file:
-                # 找到时间戳
-                time_match = time_pattern.search(line)
-                if time_match:
-                    time_str = f"2024-{time_match.group()}"  # 假设年份是 2024 年
-                    current_timestamp = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                    timestamps.append(current_timestamp)
-
-                # 找到 CPU 使用率数据
-                cpu_usage_match = cpu_usage_pattern.search(line)
-                if cpu_usage_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    usage_data = [int(cpu_usage_match.group(i)) for i in range(1, 9)]
-                    cpu_data.append((timestamp, usage_data))
-
-                # 找到触摸事件数据
-                touch_match = touch_pattern.search(line)
-                if touch_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    event_type = touch_match.group(1)
-                    x = int(touch_match.group(2))
-                    y = int(touch_match.group(3))
-                    touch_data.append((timestamp, event_type, x, y))
-
-                # 找到帧率变化数据
-                fps_match = fps_pattern.search(line)
-                if fps_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    fps = int(fps_match.group(1))
-                    fps_data.append((timestamp, fps))
-
-                # 找到校准时间
-                perf_start_match = perf_start_pattern.search(line)
-                if perf_start_match:
-                    perf_start_date_str = f"2024-{perf_start_match.group(1)}"
-                    perf_start_time = datetime.strptime(perf_start_date_str, "%Y-%m-%d %H:%M:%S")
+        store = load_or_parse(log_file, 'main.kernel', KERNEL_RULE_NAMES, parse_kernel_log, use_cache, time_range)
+        cpu_series = [store.series.get(f'cpu{i}') for i in range(8)]
+        cpu_data = cpu_series[0]
+        touch_data = store.events.get('touch')
+        fps_data = store.series.get('fps')
+        perf_start_time = store.events.get('perf_start')
 
         if not cpu_data:
             print("No CPU data found.")
@@ -103,33 +101,29 @@ def plot_kernel_log(log_file):
             print("No calibration time found.")
             return
 
-        # 对数据进行排序
-        cpu_data.sort(key=lambda x: x[0])
-        touch_data.sort(key=lambda x: x[0])
-        fps_data.sort(key=lambda x: x[0])
-
-        # 解包数据
-        time_stamps_cpu, core_usage = zip(*cpu_data)
-        time_stamps_fps, fps_values = zip(*fps_data)
+        # 解包数据（零拷贝的 NumPy 视图）
+        time_stamps_cpu = cpu_data.view()[0]
+        core_usage = [series.view()[1] for series in cpu_series]
+        time_stamps_fps, fps_values = fps_data.view()
 
         # 确保时间戳一致
-        min_time = min(min(time_stamps_cpu), min(time_stamps_fps))
-        max_time = max(max(time_stamps_cpu), max(time_stamps_fps))
+        min_time = min(time_stamps_cpu.min(), time_stamps_fps.min())
+        max_time = max(time_stamps_cpu.max(), time_stamps_fps.max())
 
-        # 计算每分钟的触摸事件数
-        touch_counts_per_minute = defaultdict(int)
-        for ts, _, _, _ in touch_data:
-            minute_key = ts.replace(second=0, microsecond=0)
-            touch_counts_per_minute[minute_key] += 1
+        # 计算每个时间桶（默认每分钟）的触摸事件数
+        counts = event_counts(store, ('touch',), bucket_seconds)
+        bucket_label = '每分钟' if bucket_seconds == 60 else f'每 {bucket_seconds} 秒'
 
         # 创建图表
+        plt = pyplot()
+        import matplotlib.dates as mdates
+        from decimate import plot_decimated
         fig, (ax1, ax2, ax3) = plt.subplots(nrows=3, ncols=1, figsize=(14, 14), sharex=True)
         print("左上角可以操作图表，右上角可以看坐标信息")
 
-        # 绘制 CPU 使用率图表
+        # 绘制 CPU 使用率图表；按像素宽度降采样，缩放时从完整数据重新降采样
         for i in range(8):
-            core_data = [usage[i] for usage in core_usage]
-            ax1.plot(time_stamps_cpu, core_data, label=f'核心 {i+1}')
+            plot_decimated(ax1, time_stamps_cpu, core_usage[i], label=f'核心 {i+1}')
         ax1.set_title('Kernel Log CPU 使用率随时间变化')
         ax1.set_ylabel('CPU 使用率 (%)')
         ax1.set_ylim(0, 100)  # 设置 y 轴范围为 0 到 100
@@ -137,24 +131,21 @@ def plot_kernel_log(log_file):
         ax1.grid(True)
 
         # 绘制 FPS 变化图表
-        ax2.plot(time_stamps_fps, fps_values, color='b', label='帧率 (fps)', marker='o', linestyle='-')
+        plot_decimated(ax2, time_stamps_fps, fps_values, color='b', label='帧率 (fps)', marker='o', linestyle='-')
         ax2.set_title('帧率随时间变化')
         ax2.set_ylabel('帧率 (fps)')
         ax2.legend()
         ax2.grid(True)
 
-        # 绘制每分钟的触摸事件统计柱状图
-        sorted_minutes = sorted(touch_counts_per_minute.keys())
-        sorted_counts = [touch_counts_per_minute[minute] for minute in sorted_minutes]
-        bars = ax3.bar(sorted_minutes, sorted_counts, width=0.0005, color='b', label='Touch Down Events')
-        # 在柱子上方显示事件数
-        for bar in bars:
-            height = bar.get_height()
-            ax3.text(bar.get_x() + bar.get_width() / 2, height, f'{int(height)}', ha='center', va='bottom', fontsize=10)
+        # 绘制每个时间桶的触摸事件统计柱状图，柱宽约为桶宽的 0.72（一分钟时为 0.0005 天）
+        bucket_starts, touch_counts = counts['touch']
+        bars = ax3.bar(bucket_starts, touch_counts, width=bucket_seconds * 0.0005 / 60, color='b', label='Touch Down Events')
+        # 在柱子上方显示事件数，只给可见的柱子创建文字
+        VisibleBarLabels(ax3, bars, fontsize=10)
 
         ax3.set_xlabel('时间')
         ax3.set_ylabel('触摸事件数量')
-        ax3.set_title('每分钟触摸事件数量统计')
+        ax3.set_title(f'{bucket_label}触摸事件数量统计')
         ax3.grid(True)
 
         # 设置 x 轴格式和范围
@@ -162,106 +153,37 @@ def plot_kernel_log(log_file):
         ax3.xaxis.set_major_locator(mdates.SecondLocator(interval=30))
         plt.gcf().autofmt_xdate()
         plt.tight_layout()
-        plt.show()
+        show_or_save(fig, output_dir, name)
 
     except Exception as e:
         print(f"Error occurred while processing the log file: {e}")
 
 
-def plot_main_log(log_file):
-    # 定义正则表达式模式
-    time_pattern = re.compile(r'\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
-    signal_strength_pattern = re.compile(r'\[LTE\] dbm: (-\d+)')
-    battery_pattern = re.compile(r'current level == (\d+), temperature == (\d+)')
-    backlight_pattern = re.compile(r'write (\d+) to /sys/class/leds/lcd-backlight/brightness')
-    anr_warning_pattern = re.compile(r'\[ANR Warning\]')
-    application_not_responding_pattern = re.compile(r'application is not responding')
-    # 添加WiFi信号强度模式
-    wifi_strength_pattern = re.compile(r'TranWifiSmartAssistantController: ====>>rssi :(-\d+)')
-    # 初始化数据
-    wifi_strength_data = []
-    signal_strength_data = []
-    battery_data = []
-    backlight_data = []
-    anr_warning_times = []
-    app_not_responding_times = []
+def parse_main_log(log_file, time_range=None):
+    # 信号强度、电池电量和温度、背光亮度、ANR 和 WiFi 信号强度
+    return parse_log(log_file, MAIN_RULE_NAMES, time_range)
+
+
+def _unpack(store, *names):
+    # 返回 (datetime 时间戳列表, 各列数值列表)，没有数据时都是空列表
+    series = store.series.get(names[0])
+    if series is None:
+        return ([],) + tuple([] for _ in names)
+    return (to_datetimes(series.raw()[0]),) + tuple(store.series[name].raw()[1].tolist() for name in names)
 
+
+def plot_main_log(log_file, use_cache=True, output_dir=None, name=None, time_range=None):
     try:
-        # 读取并解析日志文件
-        with open(log_file, 'r', encoding='utf-8', errors='ignore') as file:
-            timestamps = []
-            for line in file:
-                # 找到时间戳
-                time_match = time_pattern.search(line)
-                if time_match:
-                    time_str = f"2024-{time_match.group()}"  # 假设年份是 2024 年
-                    current_timestamp = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                    timestamps.append(current_timestamp)
-
-                # 找到信号强度数据
-                signal_strength_match = signal_strength_pattern.search(line)
-                if signal_strength_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    signal_strength = int(signal_strength_match.group(1))
-                    signal_strength_data.append((timestamp, signal_strength))
-
-                # 找到电池数据
-                battery_match = battery_pattern.search(line)
-                if battery_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    level = int(battery_match.group(1))
-                    temperature = int(battery_match.group(2)) / 10  # 修正温度数据
-                    if level != -1 and temperature != -1:
-                        battery_data.append((timestamp, level, temperature))
-
-                # 找到背光亮度数据
-                backlight_match = backlight_pattern.search(line)
-                if backlight_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    brightness = int(backlight_match.group(1))
-                    backlight_data.append((timestamp, brightness))
-
-                # 找到 ANR Warning
-                if anr_warning_pattern.search(line) and timestamps:
-                    timestamp = timestamps[-1]
-                    anr_warning_times.append(timestamp)
-
-                # 找到 application is not responding
-                if application_not_responding_pattern.search(line) and timestamps:
-                    timestamp = timestamps[-1]
-                    app_not_responding_times.append(timestamp)
-
-                # 找到WiFi信号强度数据
-                wifi_strength_match = wifi_strength_pattern.search(line)
-                if wifi_strength_match and timestamps:
-                    timestamp = timestamps[-1]  # 使用最新的时间戳
-                    wifi_strength = int(wifi_strength_match.group(1))
-                    wifi_strength_data.append((timestamp, wifi_strength))
-
-        if not signal_strength_data and not battery_data and not backlight_data:
+        store = load_or_parse(log_file, 'main.main', MAIN_RULE_NAMES, parse_main_log, use_cache, time_range)
+        if not any(name in store.series for name in ('cellular_signal', 'batt_level_main', 'backlight')):
             print("No data found.")
             return
 
-        # 对信号强度数据按照时间戳进行排序
-        if signal_strength_data:
-            signal_strength_data.sort(key=lambda x: x[0])
-            time_stamps_signal, signal_strength = zip(*signal_strength_data)
-        else:
-            time_stamps_signal, signal_strength = [], []
-
-        # 对电池数据按照时间戳进行排序
-        if battery_data:
-            battery_data.sort(key=lambda x: x[0])
-            time_stamps_battery, battery_levels, temperatures = zip(*battery_data)
-        else:
-            time_stamps_battery, battery_levels, temperatures = [], [], []
-
-        # 对背光数据按照时间戳进行排序
-        if backlight_data:
-            backlight_data.sort(key=lambda x: x[0])
-            time_stamps_backlight, backlight_levels = zip(*backlight_data)
-        else:
-            time_stamps_backlight, backlight_levels = [], []
+        time_stamps_signal, signal_strength = _unpack(store, 'cellular_signal')
+        time_stamps_battery, battery_levels, temperatures = _unpack(store, 'batt_level_main', 'batt_temp_main')
+        time_stamps_backlight, backlight_levels = _unpack(store, 'backlight')
+        anr_warning_times = store.event_view('anr_warning')
+        app_not_responding_times = store.event_view('app_not_responding')
 
         # 计算时间跨度
         if time_stamps_signal:
@@ -270,15 +192,13 @@ def plot_main_log(log_file):
         else:
             interval = 60  # 默认值
 
-        # 对WiFi信号强度数据按照时间戳进行排序
-        if wifi_strength_data:
-            wifi_strength_data.sort(key=lambda x: x[0])
-            time_stamps_wifi, wifi_strength = zip(*wifi_strength_data)
-        else:
-            time_stamps_wifi, wifi_strength = [], []
+        time_stamps_wifi, wifi_strength = _unpack(store, 'wifi_signal')
 
 
         # 创建一个窗口包含三个子图
+        plt = pyplot()
+        import matplotlib.dates as mdates
+        from decimate import plot_event_markers
         fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(14, 18), sharex=True)
         print("左上角可以操作图表，右上角可以看坐标信息")
 
@@ -296,13 +216,9 @@ def plot_main_log(log_file):
             ax1.axhspan(min(signal_strength + wifi_strength), -90, color='red', alpha=0.3, label='非常弱信号区域')
 
 
-            # 绘制 ANR Warning 标记
-            for error_time in anr_warning_times:
-                ax1.axvline(x=error_time, color='c', linestyle='--', alpha=0.2)
-
-            # 绘制 application is not responding 标记
-            for error_time in app_not_responding_times:
-                ax1.axvline(x=error_time, color='r', linestyle='--', alpha=0.2)
+            # 绘制 ANR Warning 和 application is not responding 标记，每种事件一个 LineCollection
+            plot_event_markers(ax1, anr_warning_times, color='c', linestyle='--', alpha=0.2)
+            plot_event_markers(ax1, app_not_responding_times, color='r', linestyle='--', alpha=0.2)
 
             ax1.xaxis.set_major_formatter(mdates.DateFormatter('%M:%S'))
             ax1.xaxis.set_major_locator(mdates.SecondLocator(interval=interval))
@@ -318,13 +234,9 @@ def plot_main_log(log_file):
             ax4.set_ylabel('温度 (°C)', color='r')
             ax2.set_title('电池电量和温度随时间变化')
 
-            # 绘制 ANR Warning 标记
-            for error_time in anr_warning_times:
-                ax2.axvline(x=error_time, color='c', linestyle='--', alpha=0.2)
-
-            # 绘制 application is not responding 标记
-            for error_time in app_not_responding_times:
-                ax2.axvline(x=error_time, color='r', linestyle='--', alpha=0.2)
+            # 绘制 ANR Warning 和 application is not responding 标记，每种事件一个 LineCollection
+            plot_event_markers(ax2, anr_warning_times, color='c', linestyle='--', alpha=0.2)
+            plot_event_markers(ax2, app_not_responding_times, color='r', linestyle='--', alpha=0.2)
 
             ax2.xaxis.set_major_formatter(mdates.DateFormatter('%M:%S'))
             ax2.xaxis.set_major_locator(mdates.SecondLocator(interval=interval))
@@ -345,13 +257,9 @@ def plot_main_log(log_file):
             ax3.set_title('背光亮度随时间变化')
             ax3.set_ylabel('背光亮度')
 
-            # 绘制 ANR Warning 标记
-            for error_time in anr_warning_times:
-                ax3.axvline(x=error_time, color='c', linestyle='--', alpha=0.2)
-
-            # 绘制 application is not responding 标记
-            for error_time in app_not_responding_times:
-                ax3.axvline(x=error_time, color='r', linestyle='--', alpha=0.2)
+            # 绘制 ANR Warning 和 application is not responding 标记，每种事件一个 LineCollection
+            plot_event_markers(ax3, anr_warning_times, color='c', linestyle='--', alpha=0.2)
+            plot_event_markers(ax3, app_not_responding_times, color='r', linestyle='--', alpha=0.2)
 
             ax3.xaxis.set_major_formatter(mdates.DateFormatter('%M:%S'))
             ax3.xaxis.set_major_locator(mdates.SecondLocator(interval=interval))
@@ -370,7 +278,7 @@ def plot_main_log(log_file):
         plt.tight_layout(pad=3.0)
         # 调整布局，确保四边文字显示不全
         plt.subplots_adjust(left=0.1, right=0.9, top=0.9, bottom=0.1)
-        plt.show()
+        show_or_save(fig, output_dir, name)
 
     except FileNotFoundError:
         print(f"Error: The file '{log_file}' was not found.")
@@ -378,39 +286,79 @@ def plot_main_log(log_file):
         print(f"An error occurred: {e}")
 
 
-def main():
-    if len(sys.argv) > 1:
-        log_file = sys.argv[1]
-    else:
-        log_file = input("Enter the path to the log file: ").strip()
-
+def plot_log_file(log_file, use_cache=True, bucket_seconds=60, output_dir=None, name=None, time_range=None):
     # 检查文件是否已经是 .localtime 文件
     if log_file.endswith('.localtime'):
         # 如果是 .localtime 文件，直接绘制
         if 'kernel_log' in log_file:
-            plot_kernel_log(log_file)
+            with stage('plot_kernel_log'):
+                plot_kernel_log(log_file, use_cache, bucket_seconds, output_dir, name, time_range)
         elif 'main_log' in log_file:
-            plot_main_log(log_file)
+            with stage('plot_main_log'):
+                plot_main_log(log_file, use_cache, output_dir, name, time_range)
         else:
             print("Unknown log type. Please provide a valid log file.")
     else:
-        # 如果不是 .localtime 文件，调用转换工具
+        # 如果不是 .localtime 文件，读取时直接把开机时间换算成本地时间
         if 'kernel_log' in log_file:
-            localtime_file = convert_kernel_log_to_localtime(log_file)
-            if localtime_file:
-                plot_kernel_log(localtime_file)
-            else:
-                print("Failed to convert kernel log file to .localtime format.")
+            with stage('plot_kernel_log'):
+                plot_kernel_log(kernel_log_source(log_file), use_cache, bucket_seconds, output_dir, name, time_range)
         elif 'main_log' in log_file:
-            plot_main_log(log_file)
+            with stage('plot_main_log'):
+                plot_main_log(log_file, use_cache, output_dir, name, time_range)
         else:
             print("Unknown log type. Please provide a valid log file.")
 
 
+def render_capture(path, output_dir, use_cache=True, bucket_seconds=60, time_range=None):
+    # 批量模式的工作函数：path 为单个日志文件，或抓取目录（绘制其中所有 kernel_log / main_log）
+    if os.path.isfile(path):
+        name = os.path.basename(path)
+        plot_log_file(path, use_cache, bucket_seconds, output_dir,
+                      name[:-len('.localtime')] if name.endswith('.localtime') else name, time_range)
+        return
+    log_files = {}
+    for file in sorted(os.listdir(path)):
+        if file.startswith(('kernel_log', 'main_log')):
+            # 同一份 kernel_log 的原始文件和 .localtime 只画一次
+            base = file[:-len('.localtime')] if file.endswith('.localtime') else file
+            log_files.setdefault(base, os.path.join(path, file))
+    for base, log_file in log_files.items():
+        plot_log_file(log_file, use_cache, bucket_seconds, output_dir, f"{capture_name(path)}_{base}", time_range)
 
-if __name__ == "__main__":
 
+def main():
+    parser = argparse.ArgumentParser(description='kernel_log / main_log 图表')
+    parser.add_argument('log_files', nargs='*', help='日志文件路径；批量模式下可以是多个日志文件或抓取目录')
+    parser.add_argument('--no-cache', action='store_true', help='不读写解析缓存，强制重新解析日志')
+    parser.add_argument('--bucket', type=int, default=60, help='kernel_log 触摸事件统计的时间桶宽度（秒），默认 60')
+    parser.add_argument('--output', help='批量模式：不弹窗，把每个日志的图表保存为 PNG 和 HTML 到该目录')
+    parser.add_argument('--jobs', type=int, default=None, help='批量模式并行出图的进程数，默认等于CPU核心数')
+    add_time_range_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    use_cache = not args.no_cache
+    time_range = time_range_from_args(args)
+    if profile_requested(args):
+        # 子进程中的计时无法汇总，统计时在当前进程内出图
+        args.jobs = 1
+
+    if args.output:
+        with profile_from_args(args):
+            ok = run_batch(render_capture, args.log_files, args.jobs, output_dir=args.output,
+                           use_cache=use_cache, bucket_seconds=args.bucket, time_range=time_range)
+        sys.exit(0 if ok else 1)
+
+    log_file = args.log_files[0] if args.log_files else input("Enter the path to the log file: ").strip()
+    with profile_from_args(args):
+        plot_log_file(log_file, use_cache, args.bucket, time_range=time_range)
+
+
+
+if __name__ == "__main__":
+    freeze_support()  # 打包成 exe 后子进程需要
     print("运行中ing")
     main()
-    # 保持窗口显示
-    input("Press Enter to exit...")
\ No newline at end of file
+    # 保持窗口显示；批量模式直接退出
+    if not headless_requested():
+        input("Press Enter to exit...")
\ No newline at end of file
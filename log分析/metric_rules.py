@@ -0,0 +1,221 @@
+import json
+import os
+from array import array
+from collections import deque
+
+import numpy as np
+
+import profiler
+from diagnostics import note, Lazy
+from line_classifier import Rule, LineClassifier, ProfiledClassifier
+from log_time import parse_timestamp, parse_second, to_datetime
+from mmap_scan import scan_log
+from series_store import Series, SeriesStore
+
+# 指标规则注册表：
+# 各脚本要提取的指标（正则、单位、比例、写入哪条曲线）都写在 metric_rules.json 里，
+# 这里编译成一个 LineClassifier，MetricExtractor 对每个文件只扫描一次，同时提取所有请求的指标。
+# 新增指标只需在 json 中加一条规则，脚本按规则名挑选，不会多一次扫描。
+#
+# 规则字段：
+#   name / description    规则名（脚本中按名称挑选）、说明（诊断消息和汇总中显示）
+#   anchor / pattern      字面锚点和正则；锚点不在正则开头时写 "anchor_is_prefix": false
+#   series                [{name 曲线名, group 捕获组, type int|float|hex（默认 int）, scale 比例, unit 单位}]
+#   event                 {name 事件名, time_group 事件时间取自哪个捕获组（"MM-DD HH:MM:SS"，默认取行时间）}
+#   label                 {name 标签名, group 捕获组, changes_only 只在值变化时记录}
+#   unique_timestamp      同一条规则在同一时间戳只取第一行（不同规则的同一时间戳互不影响）
+#   note                  每次记录时输出的诊断消息（% 格式，参数为提取出的值）
+# 规则在文件中的顺序即优先级。
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metric_rules.json')
+
+# 去重时每条规则记住的最近时间戳个数：日志基本按时间排序，重复的行总是挨在一起，
+# 只比较最近一小段就够了，内存固定，不随文件大小增长
+DEDUPE_WINDOW = 64
+
+CONVERTERS = {
+    'int': int,
+    'float': float,
+    'hex': lambda text: int(text, 16),
+}
+
+
+class MetricRule(Rule):
+    def __init__(self, spec):
+        super().__init__(spec['name'], spec['anchor'], spec['pattern'], spec.get('anchor_is_prefix', True))
+        self.spec = spec
+        self.description = spec.get('description', spec['name'])
+        # [(曲线名, 捕获组, 转换函数, 比例)]
+        self.series = [(item['name'], item['group'], CONVERTERS[item.get('type', 'int')], item.get('scale', 1))
+                       for item in spec.get('series', ())]
+        self.units = {item['name']: item.get('unit', '') for item in spec.get('series', ())}
+        event = spec.get('event')
+        self.event = (event['name'], event.get('time_group')) if event else None
+        label = spec.get('label')
+        self.label = (label['name'], label['group'], label.get('changes_only', False)) if label else None
+        self.unique_timestamp = spec.get('unique_timestamp', False)
+        self.note = spec.get('note')
+        # 诊断消息的完整格式只拼接一次，时间戳参数用 Lazy 包装，只有真正输出时才转换
+        self.note_format = self.note + ", 时间戳: %s" if self.note else None
+
+
+def load_rules(file_path=RULES_FILE):
+    with open(file_path, encoding='utf-8') as file:
+        specs = json.load(file)['rules']
+    rules = {}
+    for spec in specs:
+        rule = MetricRule(spec)
+        if rule.name in rules:
+            raise ValueError(f"{file_path}: 规则名 {rule.name} 重复")
+        rules[rule.name] = rule
+    return rules
+
+
+RULES = load_rules()
+_classifiers = {}
+
+
+def get_classifier(names):
+    # 按规则名挑选子集（优先级按注册表顺序），同一组规则只编译一次；--profile 时换成记录规则耗时的分类器
+    key = (tuple(names), profiler.enabled)
+    classifier = _classifiers.get(key)
+    if classifier is None:
+        unknown = set(key[0]) - set(RULES)
+        if unknown:
+            raise KeyError(f"{RULES_FILE} 中没有这些规则: {', '.join(sorted(unknown))}")
+        rules = [rule for rule in RULES.values() if rule.name in key[0]]
+        classifier = (ProfiledClassifier if profiler.enabled else LineClassifier)(rules)
+        _classifiers[key] = classifier
+    return classifier
+
+
+def ruleset(names):
+    # 参与解析缓存键的规则内容：除了正则，单位、比例、曲线名的改动也使旧缓存失效
+    return [json.dumps(RULES[name].spec, sort_keys=True, ensure_ascii=False) for name in names]
+
+
+class RecentTimestamps:
+    # 最近 size 个时间戳，add() 返回是否第一次出现。日志基本按时间排序：
+    # 比已见过的都新的时间戳直接记下，只有不比最新的新（重复或乱序）时才在窗口里查找
+    def __init__(self, size=DEDUPE_WINDOW):
+        self.order = deque(maxlen=size)
+        self.latest = None
+
+    def add(self, timestamp):
+        latest = self.latest
+        if latest is None or timestamp > latest:
+            self.latest = timestamp
+        elif timestamp in self.order:
+            return False
+        self.order.append(timestamp)
+        return True
+
+
+class MetricExtractor:
+    # 一个日志文件（或实时模式的一个来源）的提取状态；feed 可以多次调用，
+    # 各规则最近的时间戳、标签的上一个值和各规则的命中次数跨调用保持。
+    #   line_time(line)  每行的时间戳，默认 "MM-DD HH:MM:SS.ffffff" 精确到微秒
+    #   group_time(text) event.time_group 捕获的 "MM-DD HH:MM:SS" 的时间戳
+    #   dedupe           是否按规则的 unique_timestamp 去重
+    def __init__(self, names, line_time=parse_timestamp, group_time=parse_second, dedupe=True):
+        self.classifier = get_classifier(names)
+        self.rules = {rule.name: rule for rule in self.classifier.rules}
+        self.anchors = [rule.anchor for rule in self.classifier.rules]
+        self.line_time = line_time
+        self.group_time = group_time
+        self.counts = dict.fromkeys(self.rules, 0)
+        self.labels = {}
+        # 按 (规则, 时间戳) 去重，每条规则只记住最近 DEDUPE_WINDOW 个时间戳
+        self.recent = {name: RecentTimestamps() for name, rule in self.rules.items() if rule.unique_timestamp and dedupe}
+
+    def feed(self, lines, store):
+        classifier = self.classifier
+        rules = self.rules
+        recent = self.recent
+        for line in lines:
+            # 只读到含有锚点的行，"上一行"不是文件中真正的上一行，没有时间戳的行直接跳过
+            timestamp = self.line_time(line)
+            if timestamp is None:
+                continue
+
+            for name, match in classifier.match_all(line):
+                # 同一条规则在这个时间戳已经记录过时跳过（重复打印的行）
+                if name in recent and not recent[name].add(timestamp):
+                    continue
+                self._record(rules[name], match, timestamp, store)
+
+    def _record(self, rule, match, timestamp, store):
+        values = []
+        if rule.event is not None:
+            name, time_group = rule.event
+            if time_group is not None:
+                timestamp = self.group_time(match.group(time_group))
+            if timestamp is None:
+                return
+            store.add_event(name, timestamp)
+        elif timestamp is None:
+            return
+        for name, group, convert, scale in rule.series:
+            value = convert(match.group(group))
+            if scale != 1:
+                value = value * scale
+            store.append(name, timestamp, value)
+            values.append(value)
+        if rule.label is not None:
+            name, group, changes_only = rule.label
+            text = match.group(group)
+            if not changes_only or self.labels.get(name) != text:
+                store.add_label(name, timestamp, text)
+                values.append(text)
+            self.labels[name] = text
+        self.counts[rule.name] += 1
+        if rule.note_format and values:
+            note(rule.description, rule.note_format, *values, Lazy(to_datetime, timestamp))
+
+    def summary(self):
+        return ', '.join(f"{self.rules[name].description} {count} 条" for name, count in self.counts.items())
+
+
+def extract_file(file_path, names, store, start=0, end=None, time_range=None, **options):
+    # 扫描一次文件的 [start, end)（只解码含有任一规则锚点的行），把 names 中所有规则的结果写入 store
+    extractor = MetricExtractor(names, **options)
+    with scan_log(file_path, extractor.anchors, start, end, time_range) as lines:
+        extractor.feed(lines, store)
+    return extractor
+
+
+def stitch_chunks(stores, names):
+    # 一个文件切成多段分别提取时，每段的去重窗口和"只在变化时记录"的标签都从空状态开始，
+    # 段的开头会多出与上一段末尾重复的样本和没有变化的标签。
+    # stores 为各段按文件顺序的结果，拼接后按规则重新去重、去掉与上一个值相同的标签，结果与整个文件一次提取一致
+    merged = SeriesStore()
+    owners = {}
+    for rule in get_classifier(names).rules:
+        for name, _, _, _ in rule.series:
+            owners[name] = rule
+    masks = {}
+    for name in dict.fromkeys(name for store in stores for name in store.series):
+        parts = [store.series[name].raw() for store in stores if name in store.series]
+        timestamps = np.concatenate([np.frombuffer(ts, dtype=np.int64) for ts, _ in parts])
+        values = np.concatenate([np.frombuffer(vals, dtype=np.float32) for _, vals in parts])
+        rule = owners.get(name)
+        if rule is not None and rule.unique_timestamp:
+            # 同一条规则的各条曲线每次命中各追加一个样本，时间戳相同，共用一个掩码
+            mask = masks.get(rule.name)
+            if mask is None:
+                recent = RecentTimestamps()
+                mask = masks[rule.name] = np.fromiter((recent.add(timestamp) for timestamp in timestamps.tolist()),
+                                                      dtype=bool, count=len(timestamps))
+            timestamps, values = timestamps[mask], values[mask]
+        merged.series[name] = Series.from_numpy(name, timestamps, values)
+    for name in dict.fromkeys(name for store in stores for name in store.events):
+        for store in stores:
+            if name in store.events:
+                merged.events.setdefault(name, array('q')).extend(store.events[name])
+    changes_only = {rule.label[0] for rule in get_classifier(names).rules if rule.label is not None and rule.label[2]}
+    for name in dict.fromkeys(name for store in stores for name in store.labels):
+        labels = [label for store in stores for label in store.labels.get(name, ())]
+        if name in changes_only:
+            labels = [label for index, label in enumerate(labels) if index == 0 or label[1] != labels[index - 1][1]]
+        merged.labels[name] = labels
+    return merged
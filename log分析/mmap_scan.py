@@ -0,0 +1,81 @@
+import mmap
+import os
+from contextlib import contextmanager
+
+from ktime_convert import SYNC_ANCHORS, clock_at, is_raw_kernel_log, iter_localtime_lines
+from time_index import byte_range, filter_lines, line_timer
+import profiler
+
+# 内存映射 + bytes 级扫描：
+# 大部分行什么规则都不命中，原来每一行都要解码成 str 再跑正则。
+# 这里把文件 mmap 进来，直接在 bytes 上查找各规则的字面锚点，
+# 只把命中的那一行解码成 str 交给原来的解析代码，其余的字节不解码、不切行。
+#
+# 文件可以按换行对齐切成多段 (start, end)，每段由不同进程/线程独立扫描。
+# 给出 time_range（--from / --to）时先用时间索引把范围缩小到这段时间对应的字节。
+
+
+def split_file(file_path, chunk_bytes, start=0, end=None):
+    # 把 [start, end) 按大约 chunk_bytes 切分，每段都从行首开始、在换行之后结束（start 必须在行首）
+    size = os.path.getsize(file_path) if end is None else end
+    if size - start <= chunk_bytes:
+        return [(start, size)]
+    chunks = []
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start < size:
+            end = mm.find(b'\n', min(start + chunk_bytes, size) - 1, size)
+            end = size if end < 0 else end + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def _matching_lines(mm, anchors, start, end):
+    # 每个锚点各自用 mmap.find 向后查找（C 实现的子串搜索，比正则多选一快得多），
+    # 取位置最小的命中，扩展到整行后解码；同一行内的其它命中一起跳过
+    next_hits = [mm.find(anchor, start, end) for anchor in anchors]
+    while True:
+        pos = min((hit for hit in next_hits if hit >= 0), default=-1)
+        if pos < 0:
+            return
+        line_start = mm.rfind(b'\n', start, pos) + 1 or start
+        line_end = mm.find(b'\n', pos, end)
+        line_end = end if line_end < 0 else line_end + 1
+        yield mm[line_start:line_end].decode('utf-8', errors='ignore')
+        for index, hit in enumerate(next_hits):
+            if 0 <= hit < line_end:
+                next_hits[index] = mm.find(anchors[index], line_end, end)
+
+
+@contextmanager
+def scan_log(file_path, anchors, start=0, end=None, time_range=None):
+    # 逐行读取 [start, end) 范围内含有任一锚点的行（str），其余行直接跳过；
+    # 原始 kernel_log 的行同样换算成本地时间；time_range 之外的行不读取
+    window = None
+    if time_range:
+        range_start, range_end, lo, hi = byte_range(file_path, time_range)
+        start, end = max(start, range_start), range_end if end is None else min(end, range_end)
+        window = (lo, hi, line_timer(file_path))
+    raw_kernel_log = is_raw_kernel_log(file_path)
+    if raw_kernel_log:
+        # 边读边换算本地时间，需要同时保留时间同步点所在的行
+        anchors = tuple(anchors) + SYNC_ANCHORS
+    anchors = [anchor.encode('utf-8') for anchor in dict.fromkeys(anchors)]
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0 or (end is not None and start >= end):
+            yield iter(())
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size if end is None else min(end, size)
+            lines = _matching_lines(mm, anchors, start, end)
+            if profiler.enabled:
+                # 扫描的字节数和真正解码出来的行数（其余行没有切分，不计行数）
+                profiler.count('scan.bytes', end - start)
+                lines = profiler.counted(lines, 'scan.lines_decoded')
+            if raw_kernel_log:
+                # 只读一段时，用这段之前（或之后第一个）同步点接上换算状态
+                lines = iter_localtime_lines(lines, clock_at(mm, start))
+            if window is not None:
+                lines = filter_lines(lines, *window)
+            yield lines
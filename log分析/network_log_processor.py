@@ -1,13 +1,20 @@
 import os
 import re
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib import font_manager
-import matplotlib
+import argparse
+import numpy as np
+from metric_rules import extract_file
+from series_store import SeriesStore
+from time_index import add_time_range_arguments, time_range_from_args
+from report import select_backend, pyplot, chinese_font
+from profiler import add_profile_arguments, profile_from_args, stage, idle
+from diagnostics import add_logging_arguments, diagnostics_from_args
 
-matplotlib.use('TkAgg')  # 或者尝试 'Qt5Agg'
+# 或者尝试 'Qt5Agg'；matplotlib 在第一次绘图时才导入（pyplot()），输入提示不用等绘图库加载
+select_backend('TkAgg')
 
-def process_network_logs(path):
+NETWORK_RULE_NAMES = ('cellular_signal', 'wifi_signal', 'network_type')
+
+def process_network_logs(path, time_range=None):
     log_files = []
     
     # 遍历给定路径下的所有文件
@@ -19,120 +26,57 @@ def process_network_logs(path):
     # 按文件名排序,确保按顺序处理
     log_files.sort()
     
-    # 用于存储所有网络数据的字典
-    network_data = {
-        'timestamp': [],
-        'cellular_signal': [],
-        'wifi_signal': [],
-        'network_type': []  # 存储网络类型
-    }
+    # 按指标分列存储网络数据，网络类型变化单独记录
+    network_data = SeriesStore()
     
     # 处理每个日志文件
     for file_path in log_files:
-        process_file(file_path, network_data)
+        with stage('process_file'):
+            process_file(file_path, network_data, time_range)
     
     # 打印数据长度以进行调试
-    print("数据长度:")
-    for key, value in network_data.items():
-        print(f"{key}: {len(value)}")
+    network_data.print_summary("数据长度:")
     
     # 绘制图表
-    plot_network_data(network_data)
+    with stage('plot_network_data'):
+        plot_network_data(network_data)
 
-def process_file(file_path, network_data):
+def process_file(file_path, network_data, time_range=None):
     print(f"处理文件: {file_path}")
-    cellular_count = 0
-    wifi_count = 0
-    network_type_count = 0
-    current_network_type = None
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        for line in file:
-            timestamp = extract_timestamp(line)
-            if timestamp is None:
-                continue
-
-            # 匹配手机网络信号强度
-            match = re.search(r'TranSignalStrengthComponentImpl: \[LTE\] dbm: (-?\d+)', line)
-            if match:
-                signal = int(match.group(1))
-                print(f"找到手机信号: {signal} dBm, 时间戳: {timestamp}")
-                update_network_data(network_data, timestamp, cellular_signal=signal, network_type=current_network_type)
-                cellular_count += 1
-                continue
-
-            # 匹配WiFi信号强度
-            match = re.search(r'====>>rssi :(-?\d+)', line)
-            if match:
-                signal = int(match.group(1))
-                print(f"找到WiFi信号: {signal} dBm, 时间戳: {timestamp}")
-                update_network_data(network_data, timestamp, wifi_signal=signal, network_type=current_network_type)
-                wifi_count += 1
-                continue
-
-            # 匹配网络类型变化
-            match = re.search(r'NetworkStatusMonitor: onNetworkTypeChanged (\w+) => (\w+)', line)
-            if match:
-                old_type, new_type = match.group(1), match.group(2)
-                if current_network_type != new_type:  # 网络类型变化才记录
-                    print(f"网络类型变化: {old_type} => {new_type}, 时间戳: {timestamp}")
-                    update_network_data(network_data, timestamp, network_type=new_type)
-                current_network_type = new_type
-                network_type_count += 1
-
-    print(f"文件 {file_path} 中找到 {cellular_count} 个手机信号, {wifi_count} 个WiFi信号, 和 {network_type_count} 个网络类型变化")
-    print(f"最后的网络类型: {current_network_type}")
-
-def update_network_data(network_data, timestamp, cellular_signal=None, wifi_signal=None, network_type=None):
-    network_data['timestamp'].append(timestamp)
-    network_data['cellular_signal'].append(cellular_signal)
-    network_data['wifi_signal'].append(wifi_signal)
-    network_data['network_type'].append(network_type)
-    if network_type is not None:
-        print(f"更新网络类型: {network_type}, 时间戳: {timestamp}")
-
-def extract_timestamp(line):
-    match = re.search(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})', line)
-    if match:
-        return datetime.strptime(match.group(1), '%m-%d %H:%M:%S.%f')
-    return None
+    extractor = extract_file(file_path, NETWORK_RULE_NAMES, network_data, time_range=time_range)
+    print(f"文件 {file_path} 中找到 {extractor.summary()}")
+    print(f"最后的网络类型: {extractor.labels.get('network_type')}")
 
 def plot_network_data(network_data):
     print("开始绘图...")
-    print(f"时间戳数量: {len(network_data['timestamp'])}")
-    cellular_signals = [s for s in network_data['cellular_signal'] if s is not None]
-    wifi_signals = [s for s in network_data['wifi_signal'] if s is not None]
-    network_types = [nt for nt in network_data['network_type'] if nt is not None]
+    cellular_timestamps, cellular_signals = network_data.view('cellular_signal')
+    wifi_timestamps, wifi_signals = network_data.view('wifi_signal')
+    network_types = [nt for _, nt in network_data.labels.get('network_type', [])]
     print(f"手机网络信号数量: {len(cellular_signals)}")
     print(f"WiFi信号数量: {len(wifi_signals)}")
     print(f"网络类型变化数量: {len(network_types)}")
     print(f"网络类型: {set(network_types)}")
 
-    if not cellular_signals and not wifi_signals:
+    if not len(cellular_signals) and not len(wifi_signals):
         print("警告：没有有效的信号数据可以绘图")
         return
 
-    font_path = 'C:/Windows/Fonts/simhei.ttf'
-    font_prop = font_manager.FontProperties(fname=font_path)
-    plt.rcParams['font.family'] = font_prop.get_name()
-    plt.rcParams['axes.unicode_minus'] = False
+    plt = pyplot()
+    font_prop = chinese_font()
 
     fig, ax = plt.subplots(figsize=(12, 6))
 
     # 绘制手机网络信号强度
-    cellular_data = [(t, s) for t, s in zip(network_data['timestamp'], network_data['cellular_signal']) if s is not None]
-    if cellular_data:
-        timestamps, signals = zip(*cellular_data)
-        ax.plot(timestamps, signals, label='手机网络信号强度', color='blue')
-        print(f"手机网络信号范围: {min(signals)} 到 {max(signals)} dBm")
+    if len(cellular_signals):
+        ax.plot(cellular_timestamps, cellular_signals, label='手机网络信号强度', color='blue')
+        print(f"手机网络信号范围: {cellular_signals.min():.0f} 到 {cellular_signals.max():.0f} dBm")
     else:
         print("没有有效的手机网络信号数据")
 
     # 绘制WiFi信号强度
-    wifi_data = [(t, s) for t, s in zip(network_data['timestamp'], network_data['wifi_signal']) if s is not None]
-    if wifi_data:
-        timestamps, signals = zip(*wifi_data)
-        ax.plot(timestamps, signals, label='WiFi信号强度', color='green')
-        print(f"WiFi信号范围: {min(signals)} 到 {max(signals)} dBm")
+    if len(wifi_signals):
+        ax.plot(wifi_timestamps, wifi_signals, label='WiFi信号强度', color='green')
+        print(f"WiFi信号范围: {wifi_signals.min():.0f} 到 {wifi_signals.max():.0f} dBm")
     else:
         print("没有有效的WiFi信号数据")
 
@@ -155,12 +99,20 @@ def plot_network_data(network_data):
     plt.tight_layout()
 
     # 确保y轴显示负值
-    all_signals = cellular_signals + wifi_signals
-    if all_signals:
-        ax.set_ylim(bottom=min(all_signals) - 10, top=max(all_signals) + 10)
+    all_signals = np.concatenate([cellular_signals, wifi_signals])
+    if len(all_signals):
+        ax.set_ylim(bottom=all_signals.min() - 10, top=all_signals.max() + 10)
 
-    plt.show()
+    with idle():
+        plt.show()
 
 if __name__ == "__main__":
-    log_path = input("请输入日志文件路径: ")
-    process_network_logs(log_path)
+    parser = argparse.ArgumentParser(description='网络信号日志分析')
+    parser.add_argument('path', nargs='?', help='APlog 日志文件夹路径，不给出时提示输入')
+    add_time_range_arguments(parser)
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    log_path = args.path or input("请输入日志文件路径: ")
+    with profile_from_args(args), diagnostics_from_args(args), stage('process_network_logs'):
+        process_network_logs(log_path, time_range_from_args(args))
@@ -0,0 +1,91 @@
+import hashlib
+import os
+from array import array
+
+import numpy as np
+
+from series_store import Series, SeriesStore
+
+# 解析结果的磁盘缓存：每个日志文件解析出的 SeriesStore 以 .npz 保存在缓存目录中，
+# 以 (绝对路径, 文件大小, 修改时间, 解析类型, 规则集版本) 作为键。
+# 日志没变、规则没变时再次打开同一份 log 直接读缓存，不再重新读文件跑正则。
+# 缓存目录按最近使用时间做 LRU 淘汰，总大小不超过 CACHE_LIMIT_MB。
+
+# 解析逻辑（而不仅是正则）有变化时手动加一，使所有旧缓存失效
+PARSER_VERSION = 5
+CACHE_DIR = os.environ.get('LOG_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.mmi_log_cache')
+CACHE_LIMIT_MB = 1024
+
+
+def ruleset_version(patterns):
+    digest = hashlib.sha1(str(PARSER_VERSION).encode())
+    for pattern in patterns:
+        digest.update(b'\0' + pattern.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _cache_path(file_path, kind, ruleset):
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{kind}|{ruleset}"
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+
+def load_cached_store(file_path, kind, ruleset):
+    try:
+        cache_path = _cache_path(file_path, kind, ruleset)
+        with np.load(cache_path, allow_pickle=False) as data:
+            store = SeriesStore()
+            for key in data.files:
+                section, name, part = key.split(':', 2)
+                if section == 's' and part == 't':
+                    store.series[name] = Series.from_numpy(name, data[key], data[f's:{name}:v'])
+                elif section == 'e':
+                    store.events[name] = array('q', data[key].astype(np.int64).tobytes())
+                elif section == 'l' and part == 't':
+                    store.labels[name] = list(zip(data[key].tolist(), data[f'l:{name}:x'].tolist()))
+        # 更新修改时间，作为 LRU 的"最近使用"
+        os.utime(cache_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return store
+
+
+def save_cached_store(file_path, kind, ruleset, store):
+    arrays = {}
+    for name, series in store.series.items():
+        timestamps, values = series.raw()
+        arrays[f's:{name}:t'] = np.frombuffer(timestamps, dtype=np.int64)
+        arrays[f's:{name}:v'] = np.frombuffer(values, dtype=np.float32)
+    for name, events in store.events.items():
+        arrays[f'e:{name}:t'] = np.frombuffer(events, dtype=np.int64)
+    for name, labels in store.labels.items():
+        arrays[f'l:{name}:t'] = np.array([timestamp for timestamp, _ in labels], dtype=np.int64)
+        arrays[f'l:{name}:x'] = np.array([text for _, text in labels], dtype=str)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        cache_path = _cache_path(file_path, kind, ruleset)
+        # 先写临时文件再改名，并行写同一个缓存时不会读到半个文件
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as cache_file:
+            np.savez(cache_file, **arrays)
+        os.replace(temp_path, cache_path)
+        _evict(CACHE_LIMIT_MB * 1024 ** 2)
+    except OSError as e:
+        print(f"写入解析缓存失败: {e}")
+
+
+def _evict(limit_bytes):
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith('.npz'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
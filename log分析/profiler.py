@@ -0,0 +1,194 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# 分阶段计时和计数（--profile）：
+# stage(name) 记录一个阶段的耗时，count(name, n) 累加计数器（读取的字节数、扫描的行数等），
+# rule_hit() 记录每条规则的命中次数和正则耗时。
+# 默认关闭：stage() 只多一次函数调用，热循环里的计数都先判断 profiler.enabled，
+# 未开启时规则匹配使用原来的类，没有额外开销。
+# 开启后结束时打印汇总表；还可以写 Chrome trace 格式的 JSON（chrome://tracing 或 ui.perfetto.dev 打开），
+# 或者 cProfile 结果（python -m pstats 文件 / snakeviz 查看）。
+# 计时只在当前进程内汇总，开启时各工具都在当前进程内解析（不开进程池）。
+# 交互窗口打开期间（idle()）是在等用户，这段时间不计入所在阶段和总耗时。
+
+enabled = False
+_origin = time.perf_counter()
+# 阶段名 -> [次数, 秒]，按第一次进入的顺序（外层阶段在前）
+_stages = {}
+_counters = {}
+# 规则名 -> [调用次数, 命中次数, 秒]
+_rules = {}
+_events = []
+_idle_seconds = 0.0
+
+
+def reset():
+    global _origin, _idle_seconds
+    _origin = time.perf_counter()
+    _idle_seconds = 0.0
+    _stages.clear()
+    _counters.clear()
+    _rules.clear()
+    _events.clear()
+
+
+@contextmanager
+def stage(name):
+    if not enabled:
+        yield
+        return
+    total = _stages.setdefault(name, [0, 0.0])
+    start = time.perf_counter()
+    idle_start = _idle_seconds
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        total[0] += 1
+        total[1] += elapsed - (_idle_seconds - idle_start)
+        _trace_event(name, start, elapsed)
+
+
+@contextmanager
+def idle():
+    global _idle_seconds
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _idle_seconds += elapsed
+        _trace_event('(等待窗口)', start, elapsed)
+
+
+def _trace_event(name, start, elapsed):
+    _events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                    'ts': round((start - _origin) * 1e6, 1), 'dur': round(elapsed * 1e6, 1)})
+
+
+def count(name, value=1):
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def rule_hit(name, seconds, matched):
+    total = _rules.get(name)
+    if total is None:
+        total = _rules[name] = [0, 0, 0.0]
+    total[0] += 1
+    total[1] += bool(matched)
+    total[2] += seconds
+
+
+def counted(lines, name):
+    # 逐行透传并把行数累加到计数器 name；未开启时原样返回
+    if not enabled:
+        return lines
+    return _count_lines(lines, name)
+
+
+def _count_lines(lines, name):
+    number = 0
+    try:
+        for line in lines:
+            number += 1
+            yield line
+    finally:
+        count(name, number)
+
+
+def timed(name, func):
+    # 包装 func，每次调用记一次规则耗时，返回值为真时算命中
+    def wrapper(*args):
+        start = time.perf_counter()
+        result = func(*args)
+        rule_hit(name, time.perf_counter() - start, result)
+        return result
+    return wrapper
+
+
+def summary_lines(wall):
+    lines = [f"{'阶段':<36}{'次数':>8}{'耗时(s)':>12}{'占比':>9}"]
+    for name, (calls, seconds) in _stages.items():
+        lines.append(f"{name:<38}{calls:>8}{seconds:>12.3f}{seconds / wall if wall else 0:>9.1%}")
+    lines.append(f"{'总耗时':<35}{'':>8}{wall:>12.3f}")
+    if _idle_seconds:
+        lines.append(f"{'等待窗口（不计入）':<31}{'':>8}{_idle_seconds:>12.3f}")
+    if _rules:
+        lines.append('')
+        lines.append(f"{'规则':<36}{'调用':>12}{'命中':>12}{'正则耗时(s)':>14}")
+        for name, (calls, hits, seconds) in sorted(_rules.items(), key=lambda item: -item[1][2]):
+            lines.append(f"{name:<38}{calls:>12,}{hits:>12,}{seconds:>14.3f}")
+    if _counters:
+        lines.append('')
+        lines.append(f"{'计数':<36}{'值':>19}")
+        for name, value in sorted(_counters.items()):
+            value = f"{value:,.3f}" if isinstance(value, float) else f"{value:,}"
+            lines.append(f"{name:<38}{value:>20}")
+    return lines
+
+
+def write_trace(file_path, wall):
+    # Chrome trace 事件格式；汇总数据放在 profile 字段里，查看器会忽略
+    counters = [{'name': name, 'ph': 'C', 'pid': os.getpid(), 'tid': 0, 'ts': round(wall * 1e6, 1),
+                 'args': {'value': value}} for name, value in sorted(_counters.items())]
+    trace = {
+        'traceEvents': _events + counters,
+        'displayTimeUnit': 'ms',
+        'profile': {
+            'wall_seconds': wall,
+            'idle_seconds': _idle_seconds,
+            'stages': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in _stages.items()},
+            'rules': {name: {'calls': calls, 'matches': hits, 'seconds': seconds}
+                      for name, (calls, hits, seconds) in _rules.items()},
+            'counters': dict(_counters),
+        },
+    }
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(trace, file, ensure_ascii=False, indent=1)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help='统计各阶段耗时、读取字节数、扫描行数和各规则的命中次数/正则耗时，结束时打印汇总表')
+    parser.add_argument('--profile-json', metavar='FILE',
+                        help='同时把计时写成 Chrome trace 格式的 JSON（chrome://tracing 打开），隐含 --profile')
+    parser.add_argument('--profile-cprofile', metavar='FILE',
+                        help='同时用 cProfile 记录函数级耗时并保存到 FILE（python -m pstats FILE 查看），隐含 --profile')
+
+
+def profile_requested(args):
+    return bool(args.profile or args.profile_json or args.profile_cprofile)
+
+
+@contextmanager
+def profile_from_args(args):
+    # 包住整个运行过程：开启计时，结束（包括 sys.exit）时打印汇总并写出文件
+    global enabled
+    if not profile_requested(args):
+        yield
+        return
+    enabled = True
+    reset()
+    profile = cProfile.Profile() if args.profile_cprofile else None
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        wall = time.perf_counter() - _origin - _idle_seconds
+        enabled = False
+        print('\n'.join(['', '==== 性能统计 ===='] + summary_lines(wall)))
+        if args.profile_json:
+            write_trace(args.profile_json, wall)
+            print(f"已保存计时: {args.profile_json}")
+        if profile is not None:
+            profile.dump_stats(args.profile_cprofile)
+            print(f"已保存 cProfile 结果: {args.profile_cprofile}")
@@ -0,0 +1,176 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from profiler import stage, idle
+
+# 无界面批量出图：
+# 命令行带 --output DIR 时使用 Agg 后端（不会导入 tkinter），图表不弹窗，
+# 每个抓取目录保存一张 PNG 和一个自带 plotly.js 的 HTML，多个抓取目录分给多个进程并行处理。
+#
+# 启动速度：matplotlib / plotly 导入要一秒以上，本模块不在导入时加载它们。
+# select_backend 只记下要用的后端，第一次绘图调用 pyplot() 时才导入 matplotlib，
+# 解析日志和输入提示不用等绘图库加载完。
+
+# HTML 中每条曲线最多保留的点数，超过时按 min/max 分桶降采样，尖峰不会丢失
+HTML_MAX_POINTS = 20000
+
+# 中文字体：优先用 Windows 自带的黑体文件，找不到时按名称在已安装字体中查找
+FONT_PATH = 'C:/Windows/Fonts/simhei.ttf'
+FONT_FAMILIES = ('SimHei', 'Microsoft YaHei', 'Noto Sans CJK SC', 'WenQuanYi Zen Hei', 'Source Han Sans SC')
+
+_backend = None
+
+
+def headless_requested(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    return any(arg == '--output' or arg.startswith('--output=') for arg in argv)
+
+
+def select_backend(interactive=None):
+    # 必须在创建任何图表之前调用；interactive 为 None 时保持 matplotlib 的默认后端。
+    # 这里只记录，真正切换后端在 pyplot() 第一次导入 matplotlib.pyplot 之前
+    global _backend
+    _backend = 'Agg' if headless_requested() else interactive
+
+
+@lru_cache(maxsize=None)
+def chinese_font():
+    # 每个进程只解析一次字体文件（读取 ttf 并查询字体名较慢），之后直接复用
+    from matplotlib import font_manager
+    if os.path.exists(FONT_PATH):
+        return font_manager.FontProperties(fname=FONT_PATH)
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    family = next((name for name in FONT_FAMILIES if name in installed), None)
+    if family is None:
+        print("未找到中文字体，图表中的中文可能显示为方块")
+        return font_manager.FontProperties()
+    return font_manager.FontProperties(family=family)
+
+
+@lru_cache(maxsize=None)
+def pyplot():
+    # 第一次绘图时才导入 matplotlib.pyplot：先切换后端、设置中文字体，再返回 plt
+    import matplotlib
+    if _backend:
+        matplotlib.use(_backend)
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.family'] = chinese_font().get_name()
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+
+def show_or_save(fig, output_dir=None, name=None):
+    # 交互模式下弹出窗口；批量模式下保存 PNG 和 HTML 后关闭图表
+    plt = pyplot()
+    if output_dir is None:
+        with idle():
+            plt.show()
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    png_path = os.path.join(output_dir, name + '.png')
+    with stage('save_png'):
+        fig.savefig(png_path, dpi=100)
+    html_path = os.path.join(output_dir, name + '.html')
+    try:
+        with stage('save_html'):
+            write_html(fig, html_path)
+    except ImportError:
+        html_path = None
+        print("未安装 plotly，只生成 PNG")
+    plt.close(fig)
+    print(f"已保存: {png_path}" + (f", {html_path}" if html_path else ''))
+    return png_path
+
+
+def _as_dates(values):
+    import matplotlib.dates as mdates
+    import numpy as np
+    values = np.asarray(values)
+    if values.dtype.kind in 'fi':
+        # matplotlib 的日期数值（天）转回 datetime64
+        return (values * 86400e6).astype(np.int64).view('datetime64[us]') + (
+            np.datetime64(mdates.get_epoch()) - np.datetime64('1970-01-01T00:00:00'))
+    return values
+
+
+def _full_line_data(line):
+    # 降采样过的曲线从完整数据生成 HTML，再按 HTML_MAX_POINTS 重新降采样
+    from decimate import minmax_indices
+    import numpy as np
+    decimator = getattr(line, 'decimator', None)
+    if decimator is None:
+        return np.asarray(line.get_xdata()), np.asarray(line.get_ydata())
+    if len(decimator.x) > HTML_MAX_POINTS:
+        index = minmax_indices(decimator.x, decimator.values, buckets=HTML_MAX_POINTS // 2)
+        return decimator.timestamps[index], decimator.values[index]
+    return decimator.timestamps, decimator.values
+
+
+def write_html(fig, html_path):
+    # 把 matplotlib 图表中的曲线、柱状图和事件竖线转换成一个可缩放的 plotly 页面（离线可用）
+    import plotly.graph_objs as go
+    import plotly.offline as pyo
+    from matplotlib.colors import to_hex
+    from plotly.subplots import make_subplots
+
+    axes = [ax for ax in fig.axes if ax.has_data()]
+    titles = [ax.get_title() or ax.get_ylabel() for ax in axes]
+    figure = make_subplots(rows=max(len(axes), 1), cols=1, shared_xaxes=True, subplot_titles=titles)
+    for row, ax in enumerate(axes, start=1):
+        for line in ax.get_lines():
+            label = line.get_label()
+            x, y = _full_line_data(line)
+            figure.add_trace(go.Scattergl(x=_as_dates(x) if len(x) else x, y=y, mode='lines',
+                                          name=label if not label.startswith('_') else None,
+                                          line=dict(color=to_hex(line.get_color()))), row=row, col=1)
+        for container in ax.containers:
+            x = _as_dates([bar.get_x() + bar.get_width() / 2 for bar in container])
+            y = [bar.get_height() for bar in container]
+            figure.add_trace(go.Bar(x=x, y=y, name=container.get_label()), row=row, col=1)
+        for collection in ax.collections:
+            markers = getattr(collection, 'decimator', None)
+            if markers is None or not len(markers.x):
+                continue
+            # 所有竖线画成一条用 None 断开的折线，数量再多也只是一个 trace
+            bottom, top = ax.get_ylim()
+            x = []
+            for time in _as_dates(markers.x).tolist():
+                x += [time, time, None]
+            y = [bottom, top, None] * len(markers.x)
+            figure.add_trace(go.Scattergl(x=x, y=y, mode='lines', opacity=0.3, showlegend=False,
+                                          line=dict(color=to_hex(collection.get_edgecolor()[0]), dash='dash')),
+                             row=row, col=1)
+        figure.update_yaxes(title_text=ax.get_ylabel(), row=row, col=1)
+    title = os.path.splitext(os.path.basename(html_path))[0]
+    figure.update_layout(title=title, height=350 * max(len(axes), 1))
+    pyo.plot(figure, filename=html_path, auto_open=False, include_plotlyjs=True)
+
+
+def capture_name(path):
+    return os.path.basename(os.path.normpath(path)) or 'capture'
+
+
+def run_batch(render, paths, jobs=None, **kwargs):
+    # 每个抓取目录交给一个工作进程调用 render(path, **kwargs)；单个目录失败不影响其它目录
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        results = [_render_safely(render, path, kwargs) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+            results = list(executor.map(_render_safely, [render] * len(paths), paths, [kwargs] * len(paths)))
+    failed = [path for path, ok in zip(paths, results) if not ok]
+    print(f"批量出图完成: {len(paths) - len(failed)}/{len(paths)} 个抓取目录成功")
+    for path in failed:
+        print(f"失败: {path}")
+    return not failed
+
+
+def _render_safely(render, path, kwargs):
+    try:
+        render(path, **kwargs)
+        return True
+    except Exception as e:
+        print(f"处理 {path} 时出错: {e}")
+        return False
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import re
+
+import numpy as np
+
+# 多个指标对齐到同一时间网格：
+# 各指标的采样频率差别很大（CPU 每秒一次，WMT 几秒一次，LTE 信号不定期），原来只能在图上肉眼对比。
+# 这里把每条曲线按固定宽度的时间桶聚合（mean / min / max / last），
+# 没有样本的桶用之前最后一个样本的值填上（as-of 连接，可以限制最长沿用多久），
+# 得到一张 行 = 时间桶、列 = 指标 的 float32 矩阵，可以写成 CSV 或 .npz 列存储，也可以直接算相关系数。
+# 全部用 NumPy 向量化：样本已按时间排序时，每条曲线只做一次 reduceat 和一次 np.repeat（按段前向填充）。
+
+ONE_SECOND_US = 1000000
+AGGREGATES = ('mean', 'min', 'max', 'last')
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(us|ms|s|m|min|h)?$')
+_UNIT_US = {'us': 1, 'ms': 1000, 's': ONE_SECOND_US, None: ONE_SECOND_US,
+            'm': 60 * ONE_SECOND_US, 'min': 60 * ONE_SECOND_US, 'h': 3600 * ONE_SECOND_US}
+
+
+def parse_duration(text):
+    # "1ms"、"500ms"、"1s"、"2m"、"1h"，不带单位时按秒；返回微秒数
+    match = _DURATION_RE.match(text.strip())
+    if match is None:
+        raise ValueError(f"无法识别的时长: {text}")
+    us = round(float(match.group(1)) * _UNIT_US[match.group(2)])
+    if us <= 0:
+        raise ValueError(f"时长必须大于 0: {text}")
+    return us
+
+
+def _sorted(timestamps, values):
+    if len(timestamps) > 1 and not np.all(timestamps[1:] >= timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        return timestamps[order], values[order]
+    return timestamps, values
+
+
+def bucket(timestamps, values, origin, step, count, how='mean', tolerance=None, out=None):
+    # timestamps 为按时间排序的整数微秒；第 i 个桶为 [origin + i*step, origin + (i+1)*step)。
+    # 返回长度为 count 的 float32 列：有样本的桶为聚合值，没有样本的桶为之前最后一个样本的值（as-of），
+    # 之前没有样本或者离桶起始超过 tolerance 微秒时为 NaN
+    keys = (timestamps - origin) // step
+    lo, hi = np.searchsorted(keys, (0, count))
+    values = values[:hi]
+    # 每个非空桶在样本中的 [起始, 结束) 位置
+    if hi > lo:
+        starts = lo + np.flatnonzero(np.concatenate(([True], keys[lo + 1:hi] != keys[lo:hi - 1])))
+        ends = np.append(starts[1:], hi)
+    else:
+        starts = ends = np.empty(0, dtype=np.intp)
+    filled = keys[starts]
+    if how == 'mean':
+        aggregated = np.add.reduceat(values.astype(np.float64), starts) / (ends - starts) if len(starts) else values[:0]
+    elif how == 'min':
+        aggregated = np.minimum.reduceat(values, starts) if len(starts) else values[:0]
+    elif how == 'max':
+        aggregated = np.maximum.reduceat(values, starts) if len(starts) else values[:0]
+    elif how == 'last':
+        aggregated = values[ends - 1]
+    else:
+        raise ValueError(f"未知的聚合方式: {how}（可选 {', '.join(AGGREGATES)}）")
+
+    # 整列是分段常数：第一个非空桶之前沿用 origin 之前的最后一个样本，
+    # 之后每个非空桶是 [聚合值 1 行, 桶内最后一个样本沿用到下一个非空桶之前, 超过 tolerance 的部分为 NaN]，
+    # 按段长 np.repeat 一次生成，不用为每一行查找
+    prefix = filled[0] if len(filled) else count
+    gaps = np.diff(np.append(filled, count)) - 1
+    if tolerance is None:
+        prefix_valid = prefix if lo > 0 else 0
+        valid = gaps
+    else:
+        # 第 i 行还能沿用时间为 t 的样本：origin + i*step - t <= tolerance
+        prefix_valid = min(prefix, (timestamps[lo - 1] + tolerance - origin) // step + 1) if lo > 0 else 0
+        valid = np.clip((timestamps[ends - 1] + tolerance - origin) // step - filled, 0, gaps)
+    segment_values = np.empty((len(filled) + 1, 3), dtype=np.float32)
+    segment_values[0] = (values[lo - 1] if lo > 0 else np.nan, np.nan, np.nan)
+    segment_values[1:, 0] = aggregated
+    segment_values[1:, 1] = values[ends - 1]
+    segment_values[1:, 2] = np.nan
+    segment_counts = np.empty((len(filled) + 1, 3), dtype=np.intp)
+    segment_counts[0] = (max(prefix_valid, 0), prefix - max(prefix_valid, 0), 0)
+    segment_counts[1:, 0] = 1
+    segment_counts[1:, 1] = valid
+    segment_counts[1:, 2] = gaps - valid
+    column = np.repeat(segment_values.ravel(), segment_counts.ravel())
+    if out is None:
+        return column
+    out[:] = column
+    return out
+
+
+class Aligned:
+    # 对齐后的数据：timestamps 为各时间桶起始的整数微秒，matrix[i, j] 为第 i 个桶中指标 names[j] 的值
+    def __init__(self, timestamps, names, matrix, step):
+        self.timestamps = timestamps
+        self.names = list(names)
+        self.matrix = matrix
+        self.step = step
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column(self, name):
+        return self.matrix[:, self.names.index(name)]
+
+    def view(self):
+        # (datetime64[us] 时间, 矩阵)，可以直接交给 matplotlib
+        return self.timestamps.view('datetime64[us]'), self.matrix
+
+    def correlation(self):
+        # 两两相关系数，每一对只用两列都有值的行；有效行少于 3 或者某列不变时为 NaN
+        count = len(self.names)
+        result = np.full((count, count), np.nan)
+        finite = ~np.isnan(self.matrix)
+        for i in range(count):
+            for j in range(i, count):
+                rows = finite[:, i] & finite[:, j]
+                if rows.sum() < 3:
+                    continue
+                x = self.matrix[rows, i].astype(np.float64)
+                y = self.matrix[rows, j].astype(np.float64)
+                if x.std() == 0 or y.std() == 0:
+                    continue
+                result[i, j] = result[j, i] = np.corrcoef(x, y)[0, 1]
+        return result
+
+    def correlation_lines(self):
+        first = max([len(name) for name in self.names] + [4]) + 2
+        widths = [max(len(name), 5) + 2 for name in self.names]
+        lines = [' ' * first + ''.join(f"{name:>{width}}" for name, width in zip(self.names, widths))]
+        for name, row in zip(self.names, self.correlation()):
+            lines.append(f"{name:<{first}}" + ''.join(f"{value:>{width}.2f}" for value, width in zip(row, widths)))
+        return lines
+
+    def to_csv(self, file_path):
+        # 第一列为桶起始时间，空值写成空字符串
+        times = np.datetime_as_string(self.timestamps.view('datetime64[us]'))
+        with open(file_path, 'w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file)
+            writer.writerow(['time'] + self.names)
+            for time, row in zip(times.tolist(), self.matrix.tolist()):
+                writer.writerow([time] + ['' if value != value else f"{value:.6g}" for value in row])
+
+    def to_columns(self, file_path):
+        # 列存储：每个指标一个 float32 数组，时间为 int64 微秒，和解析缓存一样用 .npz
+        np.savez_compressed(file_path, timestamp=self.timestamps, step=np.int64(self.step),
+                            **{f'v:{name}': self.matrix[:, j] for j, name in enumerate(self.names)})
+
+    def save(self, file_path):
+        if file_path.lower().endswith('.npz'):
+            self.to_columns(file_path)
+        else:
+            self.to_csv(file_path)
+
+
+def load_columns(file_path):
+    with np.load(file_path, allow_pickle=False) as data:
+        names = [key[2:] for key in data.files if key.startswith('v:')]
+        matrix = np.column_stack([data[f'v:{name}'] for name in names]) if names else np.empty((len(data['timestamp']), 0), np.float32)
+        return Aligned(data['timestamp'], names, matrix, int(data['step']))
+
+
+def align(store, names=None, step=ONE_SECOND_US, how='mean', tolerance=None, start=None, end=None):
+    # 把 store 中的曲线（默认全部）对齐到从 start 到 end、宽度为 step 微秒的时间网格；
+    # start / end 默认取这些曲线的最早和最晚时间。tolerance 为空桶最长沿用之前的值多久（微秒），None 为不限
+    names = [name for name in (store.series if names is None else names) if name in store.series and len(store.series[name])]
+    columns = []
+    for name in names:
+        timestamps, values = store.series[name].raw()
+        columns.append(_sorted(np.frombuffer(timestamps, dtype=np.int64), np.frombuffer(values, dtype=np.float32)))
+    if start is None:
+        start = min((timestamps[0] for timestamps, _ in columns), default=None)
+    if end is None:
+        end = max((timestamps[-1] for timestamps, _ in columns), default=None)
+    if start is None or end is None:
+        # 没有任何数据
+        origin = 0
+        count = 0
+    else:
+        origin = start // step * step
+        count = max(0, int((end - origin) // step) + 1)
+    grid = origin + np.arange(count, dtype=np.int64) * step
+    # 按列存放（Fortran 顺序），每列连续，写入和导出列存储都不用跨行
+    matrix = np.empty((count, len(names)), dtype=np.float32, order='F')
+    for j, (timestamps, values) in enumerate(columns):
+        bucket(timestamps, values, origin, step, count, how, tolerance, out=matrix[:, j])
+    return Aligned(grid, names, matrix, step)
+
+
+def _duration_argument(text):
+    try:
+        return parse_duration(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_resample_arguments(parser):
+    parser.add_argument('--export', metavar='FILE',
+                        help='把各指标按 --step 对齐成一张表写到 FILE（.csv，或 .npz 列存储），并打印指标间的相关系数')
+    parser.add_argument('--step', type=_duration_argument, default=ONE_SECOND_US, metavar='DURATION',
+                        help='对齐的时间桶宽度，例如 1ms、500ms、1s、1m，默认 1s')
+    parser.add_argument('--agg', choices=AGGREGATES, default='mean', help='同一时间桶内多个样本的合并方式，默认 mean')
+    parser.add_argument('--tolerance', type=_duration_argument, metavar='DURATION',
+                        help='没有样本的时间桶最长沿用之前的值多久，默认不限')
+
+
+def export_from_args(store, args, names=None):
+    aligned = align(store, names, args.step, args.agg, args.tolerance)
+    aligned.save(args.export)
+    print(f"已保存对齐数据: {args.export}（{len(aligned)} 行 x {len(aligned.names)} 列）")
+    print('\n'.join(['相关系数:'] + aligned.correlation_lines()))
+    return aligned
@@ -0,0 +1,156 @@
+from array import array
+
+import numpy as np
+
+# 按指标分列存储的时间序列：
+# 每个指标一组 array('q') 微秒时间戳 + array('f') 数值，不再用 None 补齐其它列。
+# 追加写在活动块里，取视图时把活动块并入只读块，返回零拷贝的 NumPy 视图；
+# 之后继续追加会进入新的活动块，不会影响已经交给绘图代码的视图。
+
+
+class Series:
+    __slots__ = ('name', '_sealed_ts', '_sealed_values', '_ts', '_values')
+
+    def __init__(self, name):
+        self.name = name
+        self._sealed_ts = array('q')
+        self._sealed_values = array('f')
+        self._ts = array('q')
+        self._values = array('f')
+
+    def append(self, timestamp, value):
+        self._ts.append(timestamp)
+        self._values.append(value)
+
+    def extend(self, timestamps, values):
+        self._ts.extend(timestamps)
+        self._values.extend(values)
+
+    @classmethod
+    def from_numpy(cls, name, timestamps, values):
+        series = cls(name)
+        series._sealed_ts.frombytes(np.ascontiguousarray(timestamps, dtype=np.int64).tobytes())
+        series._sealed_values.frombytes(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+        return series
+
+    def __len__(self):
+        return len(self._sealed_ts) + len(self._ts)
+
+    def nbytes(self):
+        return len(self) * (self._ts.itemsize + self._values.itemsize)
+
+    def _seal(self):
+        if self._ts:
+            # 拼接生成新数组，旧数组上已导出的视图仍然有效
+            self._sealed_ts = self._sealed_ts + self._ts
+            self._sealed_values = self._sealed_values + self._values
+            self._ts = array('q')
+            self._values = array('f')
+
+    def tail(self, start):
+        # 返回第 start 个样本之后的 (int64 时间戳, float32 数值)，只复制这部分，不合并活动块；
+        # 实时图表每帧只取新增的样本
+        sealed = len(self._sealed_ts)
+        skip = max(start - sealed, 0)
+        timestamps = self._sealed_ts[start:] + self._ts[skip:]
+        values = self._sealed_values[start:] + self._values[skip:]
+        return np.frombuffer(timestamps, dtype=np.int64), np.frombuffer(values, dtype=np.float32)
+
+    def raw(self):
+        # 返回 (array('q'), array('f'))，用于跨进程传递或写缓存
+        self._seal()
+        return self._sealed_ts, self._sealed_values
+
+    def view(self):
+        # 返回 (datetime64[us] 时间戳, float32 数值) 的零拷贝视图
+        self._seal()
+        return (np.frombuffer(self._sealed_ts, dtype='datetime64[us]'),
+                np.frombuffer(self._sealed_values, dtype=np.float32))
+
+
+class SeriesStore:
+    def __init__(self):
+        self.series = {}
+        # 只有时间戳的事件，例如 ANR
+        self.events = {}
+        # 带文字的稀疏事件，例如网络类型变化
+        self.labels = {}
+
+    def get(self, name):
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = Series(name)
+        return series
+
+    def append(self, name, timestamp, value):
+        self.get(name).append(timestamp, value)
+
+    def add_event(self, name, timestamp):
+        events = self.events.get(name)
+        if events is None:
+            events = self.events[name] = array('q')
+        events.append(timestamp)
+
+    def add_label(self, name, timestamp, text):
+        self.labels.setdefault(name, []).append((timestamp, text))
+
+    def view(self, name):
+        series = self.series.get(name)
+        if series is None:
+            return (np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype=np.float32))
+        return series.view()
+
+    def event_view(self, name):
+        events = self.events.get(name)
+        if events is None:
+            return np.empty(0, dtype='datetime64[us]')
+        return np.frombuffer(events, dtype='datetime64[us]')
+
+    def items(self):
+        return self.series.items()
+
+    def nbytes(self):
+        total = sum(series.nbytes() for series in self.series.values())
+        total += sum(len(events) * events.itemsize for events in self.events.values())
+        return total
+
+    def print_summary(self, title):
+        print(title)
+        for name, series in self.series.items():
+            print(f"{name}: {len(series)}")
+        for name, events in self.events.items():
+            print(f"{name}: {len(events)}")
+        for name, labels in self.labels.items():
+            print(f"{name}: {len(labels)}")
+        print(f"内存占用: {self.nbytes() / 1024:.1f} KB")
+
+
+def _sorted_by_time(timestamps, values=None):
+    # 稳定排序：同一时间戳保持原来的文件顺序；已经有序时直接返回
+    if len(timestamps) > 1 and not np.all(timestamps[1:] >= timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        if values is not None:
+            values = values[order]
+    return timestamps, values
+
+
+def merge_stores(stores):
+    # 合并按文件分别解析出来的 SeriesStore，每个指标按时间戳排序
+    stores = list(stores)
+    merged = SeriesStore()
+    for name in dict.fromkeys(name for store in stores for name in store.series):
+        parts = [store.series[name].raw() for store in stores if name in store.series]
+        timestamps = np.concatenate([np.frombuffer(ts, dtype=np.int64) for ts, _ in parts])
+        values = np.concatenate([np.frombuffer(vals, dtype=np.float32) for _, vals in parts])
+        timestamps, values = _sorted_by_time(timestamps, values)
+        merged.series[name] = Series.from_numpy(name, timestamps, values)
+    for name in dict.fromkeys(name for store in stores for name in store.events):
+        timestamps = np.concatenate([np.frombuffer(store.events[name], dtype=np.int64)
+                                     for store in stores if name in store.events])
+        timestamps, _ = _sorted_by_time(timestamps)
+        merged.events[name] = array('q', timestamps.tobytes())
+    for name in dict.fromkeys(name for store in stores for name in store.labels):
+        labels = [label for store in stores for label in store.labels.get(name, [])]
+        merged.labels[name] = sorted(labels, key=lambda label: label[0])
+    return merged
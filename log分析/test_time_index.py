@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+from mmap_scan import scan_log
+from time_index import TimeRange, load_index, line_timer, time_of_day, line_time, _index_path
+
+# --from / --to 的回归测试：只有 "HH:MM:SS.ffffff"、没有日期的日志（zdy-chart 读的格式）
+# 原来整个被过滤掉；现在按一天中的时间建索引和过滤。用法: python -m pytest test_time_index.py
+
+
+def _write(folder, name, lines):
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        file.write(''.join(line + '\n' for line in lines))
+    return path
+
+
+def _scan(path, time_range=None):
+    with scan_log(path, ['val='], time_range=time_range) as lines:
+        return [line.strip() for line in lines]
+
+
+def test_time_only_log():
+    with tempfile.TemporaryDirectory() as folder:
+        lines = [f"10:00:0{second}.000000 val={second}" for second in range(4)]
+        path = _write(folder, 'time_only.log', lines)
+        assert _scan(path) == lines
+        assert _scan(path, TimeRange('10:00:02')) == lines[2:]
+        assert _scan(path, TimeRange('10:00:02', '10:00:03')) == lines[2:]
+        assert _scan(path, TimeRange(None, '10:00:01')) == lines[:2]
+        # 日志没有日期，--from / --to 中的日期忽略
+        assert _scan(path, TimeRange('10-21 10:00:01', '10-21 10:00:02')) == lines[1:3]
+        index = load_index(path)
+        assert index.time_of_day and len(index.timestamps) == 1
+        assert line_timer(path) is time_of_day
+        assert os.path.exists(_index_path(path))
+
+
+def test_dated_log_unchanged():
+    with tempfile.TemporaryDirectory() as folder:
+        lines = [f"10-21 10:00:0{second}.000000  100  100 I tag: val={second} at 09:00:00.000000" for second in range(4)]
+        path = _write(folder, 'dated.log', lines)
+        assert _scan(path, TimeRange('10:00:02')) == lines[2:]
+        assert not load_index(path).time_of_day
+        assert line_timer(path) is line_time
+
+
+def test_no_timestamps_no_index_file():
+    with tempfile.TemporaryDirectory() as folder:
+        path = _write(folder, 'plain.log', ['val=1', 'val=2'])
+        assert _scan(path, TimeRange('10:00:00')) == []
+        assert not os.path.exists(_index_path(path))
+
+
+if __name__ == "__main__":
+    test_time_only_log()
+    test_dated_log_unchanged()
+    test_no_timestamps_no_index_file()
+    print("OK")
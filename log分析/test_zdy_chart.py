@@ -0,0 +1,46 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+# zdy-chart 数值转换的回归测试：十六进制超过 int64 查表范围、整列转换失败时的逐个转换。
+# 用法: python -m pytest test_zdy_chart.py
+
+pytest.importorskip('tkinter')
+_spec = importlib.util.spec_from_file_location('zdy_chart', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zdy-chart.py'))
+zdy_chart = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(zdy_chart)
+
+
+def test_hex_short():
+    assert zdy_chart.parse_hex(['1f', '0A', 'fffffffffffffff']).tolist() == [0x1f, 0x0a, 0xfffffffffffffff]
+
+
+def test_hex_16_digits_not_wrapped():
+    # 原来按位权在 int64 中求和，ffffffffffffffff 变成 -1
+    assert zdy_chart.parse_hex(['1', '7fffffffffffffff']).tolist() == [1, 0x7fffffffffffffff]
+    with pytest.raises(ValueError, match='ffffffffffffffff'):
+        zdy_chart.parse_hex(['1', 'ffffffffffffffff'])
+    with pytest.raises(ValueError, match='123456789abcdef01'):
+        zdy_chart.parse_hex(['123456789abcdef01'])
+
+
+def test_convert_column():
+    assert zdy_chart.convert_column(['1', '-2', '30'], 'int').dtype == np.int64
+    assert zdy_chart.convert_column(['1', '-2', '30'], 'int').tolist() == [1, -2, 30]
+    assert zdy_chart.convert_column(['1.5', '2e3', '-0.25'], 'float').tolist() == [1.5, 2000.0, -0.25]
+
+
+def test_convert_column_errors():
+    with pytest.raises(ValueError, match='99999999999999999999'):
+        zdy_chart.convert_column(['1', '99999999999999999999'], 'int')
+    with pytest.raises(ValueError, match='abc'):
+        zdy_chart.convert_column(['1', 'abc', '3'], 'int')
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_'):
+            func()
+    print("OK")
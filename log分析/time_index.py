@@ -0,0 +1,345 @@
+import argparse
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from ktime_convert import clock_at, early_offset, is_raw_kernel_log, sync_points, uptime_us
+
+# 时间 -> 字节偏移量的稀疏索引，用于 --from / --to 只读取一段时间内的日志：
+# 每隔 INDEX_STRIDE 字节取一行，记下 (该行的时间戳, 行首偏移量)，
+# 采样只在这些位置 seek，不用读完整个文件，3 GB 的日志也只取几万个点。
+# 索引保存在日志旁边的隐藏文件 ".<日志文件名>.tidx"，日志大小或修改时间变了就重建；
+# 目录不可写时只在内存中使用。
+# 查询时二分查找得到字节范围 [start, end)，前后各多留一个采样间隔容纳轻微乱序，
+# 读出来的行再按时间戳精确过滤。
+#
+# 时间戳按 "MM-DD HH:MM:SS.ffffff" 解析成整数微秒，与 log_time 一样固定为 1900 年；
+# 原始 kernel_log 的开机时间用文件中的同步点换算成本地时间。
+# 整个文件都没有带日期的时间戳时（例如 zdy-chart 读的 "HH:MM:SS.ffffff ..." 日志），改按一天中的时间，
+# 日期固定为 1900-01-01，--from / --to 中的日期忽略；索引中记下文件用的是哪一种。
+
+INDEX_STRIDE = 64 * 1024
+# 每个采样点最多向后看多少字节去找带时间戳的行（跳过续行等）
+SAMPLE_BYTES = 4096
+INDEX_VERSION = 3
+DEFAULT_YEAR = 1900
+# 没有给出的一端
+MIN_TIME = -(1 << 62)
+MAX_TIME = 1 << 62
+
+_HEADER = struct.Struct('<4sIIqqqI')
+_MAGIC = b'TIDX'
+_TIMESTAMP_RE = re.compile(r'(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})\.(\d{1,6})')
+_BYTES_TIMESTAMP_RE = re.compile(_TIMESTAMP_RE.pattern.encode('ascii'))
+# 只有时间没有日期，前面不能紧挨着数字或冒号
+_TIME_OF_DAY_RE = re.compile(r'(?<![\d:])(\d{2}):(\d{2}):(\d{2})\.(\d{1,6})')
+_BYTES_TIME_OF_DAY_RE = re.compile(_TIME_OF_DAY_RE.pattern.encode('ascii'))
+_BOUND_RE = re.compile(r'(?:(\d{1,2})-(\d{1,2})\s+)?(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?$')
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+_ONE_DAY_US = 86400 * 1000000
+
+# (月, 日) -> 当天 0 点的微秒时间戳
+_day_cache = {}
+# 进程内已经加载的索引：路径 -> (大小, 修改时间, 索引)
+_loaded = {}
+
+
+def _day_base(month, day):
+    base = _day_cache.get((month, day))
+    if base is None:
+        try:
+            base = (datetime(DEFAULT_YEAR, month, day) - _EPOCH) // _ONE_US
+        except ValueError:
+            return None
+        _day_cache[(month, day)] = base
+    return base
+
+
+def _match_time(match):
+    base = _day_base(int(match.group(1)), int(match.group(2)))
+    if base is None:
+        return None
+    seconds = int(match.group(3)) * 3600 + int(match.group(4)) * 60 + int(match.group(5))
+    return base + seconds * 1000000 + int(match.group(6).ljust(6, b'0' if isinstance(match.group(6), bytes) else '0'))
+
+
+def _match_time_of_day(match):
+    hour, minute, second = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    fraction = match.group(4)
+    return _day_base(1, 1) + ((hour * 60 + minute) * 60 + second) * 1000000 + int(fraction.ljust(6, b'0' if isinstance(fraction, bytes) else '0'))
+
+
+def line_time(line):
+    # 行中 "MM-DD HH:MM:SS.ffffff" 时间戳的微秒数，没有时返回 None
+    match = _TIMESTAMP_RE.search(line)
+    return None if match is None else _match_time(match)
+
+
+def time_of_day(line):
+    # 行中 "HH:MM:SS.ffffff" 的微秒数（1900-01-01 当天），没有时返回 None；用于没有日期的日志
+    match = _TIME_OF_DAY_RE.search(line)
+    return None if match is None else _match_time_of_day(match)
+
+
+def format_time(us):
+    return (_EPOCH + timedelta(microseconds=us)).strftime('%m-%d %H:%M:%S.%f')
+
+
+def parse_bound(text):
+    # "MM-DD HH:MM[:SS[.ffffff]]" 或只有时间 "HH:MM[:SS[.ffffff]]"；返回 ((月, 日) 或 None, 当天微秒数)
+    match = _BOUND_RE.match(text.strip())
+    if match is None:
+        raise ValueError(f"无法识别的时间: {text}")
+    month, day, hour, minute, second, fraction = match.groups()
+    date = None
+    if month is not None:
+        date = (int(month), int(day))
+        if _day_base(*date) is None:
+            raise ValueError(f"无效的日期: {text}")
+    if int(hour) > 23 or int(minute) > 59 or int(second or 0) > 59:
+        raise ValueError(f"无效的时间: {text}")
+    return date, ((int(hour) * 60 + int(minute)) * 60 + int(second or 0)) * 1000000 + int((fraction or '0').ljust(6, '0'))
+
+
+class TimeRange:
+    # --from / --to 给出的时间窗口（两端都包含）；只有时间没有日期时，用日志文件中第一个时间戳的日期
+    def __init__(self, start=None, end=None):
+        self.start = parse_bound(start) if isinstance(start, str) else start
+        self.end = parse_bound(end) if isinstance(end, str) else end
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    def resolve(self, reference=None, ignore_date=False):
+        # 返回 (lo, hi) 微秒时间戳；reference 为日志中第一个时间戳，None 时按 1 月 1 日；
+        # ignore_date 时两端都只看时间（日志没有日期）
+        reference_day = (reference // _ONE_DAY_US * _ONE_DAY_US) if reference is not None else _day_base(1, 1)
+        start, end = self.start, self.end
+        if ignore_date:
+            start = None if start is None else (None, start[1])
+            end = None if end is None else (None, end[1])
+        lo = MIN_TIME if start is None else self._absolute(start, reference_day)
+        hi = MAX_TIME if end is None else self._absolute(end, reference_day)
+        if start is not None and end is not None and end[0] is None and hi < lo:
+            # --to 只有时间且早于 --from：跨过午夜
+            hi += _ONE_DAY_US
+        return lo, hi
+
+    @staticmethod
+    def _absolute(bound, reference_day):
+        date, time_of_day = bound
+        return (reference_day if date is None else _day_base(*date)) + time_of_day
+
+    def __repr__(self):
+        return f"TimeRange({self.start!r}, {self.end!r})"
+
+
+def _bound_argument(text):
+    # argparse 只显示 ArgumentTypeError 的错误信息
+    try:
+        return parse_bound(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_time_range_arguments(parser):
+    parser.add_argument('--from', dest='time_from', type=_bound_argument, metavar='TIME',
+                        help='只分析这个时间之后的日志，格式 "MM-DD HH:MM:SS" 或 "HH:MM[:SS]"')
+    parser.add_argument('--to', dest='time_to', type=_bound_argument, metavar='TIME',
+                        help='只分析这个时间之前的日志，格式同 --from')
+
+
+def time_range_from_args(args):
+    time_range = TimeRange(args.time_from, args.time_to)
+    return time_range if time_range else None
+
+
+class TimeIndex:
+    def __init__(self, size, mtime_ns, timestamps, offsets, time_of_day=False):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.timestamps = timestamps
+        self.offsets = offsets
+        # 文件中没有日期，时间戳按一天中的时间
+        self.time_of_day = time_of_day
+        # 前缀最大值 / 后缀最小值：日志不严格有序时二分查找仍然单调
+        self._prefix_max = []
+        latest = MIN_TIME
+        for timestamp in timestamps:
+            latest = max(latest, timestamp)
+            self._prefix_max.append(latest)
+        self._suffix_min = [0] * len(timestamps)
+        earliest = MAX_TIME
+        for index in range(len(timestamps) - 1, -1, -1):
+            earliest = min(earliest, timestamps[index])
+            self._suffix_min[index] = earliest
+
+    def first_time(self):
+        return self.timestamps[0] if self.timestamps else None
+
+    def byte_range(self, lo, hi):
+        # [start, end)：start 之前的采样点都早于 lo，end 之后的都晚于 hi，两端再各多留一个采样间隔
+        if not self.timestamps:
+            return 0, self.size
+        first = bisect_left(self._prefix_max, lo) - 2
+        start = self.offsets[first] if first >= 0 else 0
+        last = bisect_right(self._suffix_min, hi) + 1
+        end = self.offsets[last] if last < len(self.offsets) else self.size
+        return start, max(start, end)
+
+
+def _index_path(file_path):
+    folder, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(folder, f'.{name}.tidx')
+
+
+def _raw_kernel_timer(mm, size):
+    # 原始 kernel_log：先按顺序换算所有时间同步点，得到 (位置, 偏移量)，采样行的时间 = 开机时间 + 之前最近同步点的偏移量；
+    # 第一个可用同步点之前的行与 iter_localtime_lines 一样用 clock_at() 往后找到的偏移量补上
+    clock = clock_at(mm, 0)
+    first = clock.first
+    syncs = [] if first is None else [(0, first[0])]
+    for pos, kind, value in sync_points(mm, 0, size):
+        clock.update(kind, value)
+        if clock.offset is not None:
+            syncs.append((pos, clock.offset))
+        elif first is not None:
+            syncs.append((pos, early_offset(clock.utc, first)))
+    positions = [pos for pos, _ in syncs]
+
+    def time_at(line, pos):
+        uptime = uptime_us(line.decode('utf-8', errors='ignore'))
+        if uptime is None or not syncs:
+            return None
+        index = bisect_right(positions, pos) - 1
+        wall = _EPOCH + timedelta(microseconds=uptime + syncs[max(index, 0)][1])
+        base = _day_base(wall.month, wall.day)
+        if base is None:
+            return None
+        return base + ((wall.hour * 60 + wall.minute) * 60 + wall.second) * 1000000 + wall.microsecond
+    return time_at
+
+
+def _text_timer(line, pos):
+    match = _BYTES_TIMESTAMP_RE.search(line)
+    return None if match is None else _match_time(match)
+
+
+def _time_of_day_timer(line, pos):
+    match = _BYTES_TIME_OF_DAY_RE.search(line)
+    return None if match is None else _match_time_of_day(match)
+
+
+def build_index(file_path):
+    # 返回 (时间戳, 偏移量, 是否按一天中的时间)
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return array('q'), array('q'), False
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as mm:
+        if is_raw_kernel_log(file_path):
+            return _sample(mm, size, _raw_kernel_timer(mm, size)) + (False,)
+        timestamps, offsets = _sample(mm, size, _text_timer)
+        if not timestamps:
+            # 没有一个采样点带日期，再按只有时间的格式采样一遍
+            timestamps, offsets = _sample(mm, size, _time_of_day_timer)
+            return timestamps, offsets, bool(timestamps)
+        return timestamps, offsets, False
+
+
+def _sample(mm, size, time_at):
+    # 每隔 INDEX_STRIDE 字节取一个采样点：该位置之后第一行带时间戳的行
+    timestamps = array('q')
+    offsets = array('q')
+    pos = 0
+    while pos < size:
+        # 采样位置之后的第一个行首
+        line_start = mm.find(b'\n', pos - 1, size) + 1 if pos else 0
+        if line_start <= 0 and pos:
+            break
+        limit = min(line_start + SAMPLE_BYTES, size)
+        cursor = line_start
+        while cursor < limit:
+            line_end = mm.find(b'\n', cursor, limit)
+            line_end = limit if line_end < 0 else line_end
+            timestamp = time_at(mm[cursor:line_end], cursor)
+            if timestamp is not None:
+                timestamps.append(timestamp)
+                offsets.append(line_start)
+                break
+            cursor = line_end + 1
+        pos = line_start + INDEX_STRIDE
+    return timestamps, offsets
+
+
+def _read_index(index_path, size, mtime_ns):
+    try:
+        with open(index_path, 'rb') as file:
+            magic, version, stride, indexed_size, indexed_mtime, count, flags = _HEADER.unpack(file.read(_HEADER.size))
+            if (magic, version, stride, indexed_size, indexed_mtime) != (_MAGIC, INDEX_VERSION, INDEX_STRIDE, size, mtime_ns):
+                return None
+            timestamps = array('q')
+            offsets = array('q')
+            timestamps.fromfile(file, count)
+            offsets.fromfile(file, count)
+            return timestamps, offsets, bool(flags & 1)
+    except (OSError, EOFError, struct.error):
+        return None
+
+
+def _write_index(index_path, size, mtime_ns, timestamps, offsets, time_of_day):
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(_HEADER.pack(_MAGIC, INDEX_VERSION, INDEX_STRIDE, size, mtime_ns, len(timestamps), int(time_of_day)))
+            timestamps.tofile(file)
+            offsets.tofile(file)
+        os.replace(temp_path, index_path)
+    except OSError:
+        # 日志目录只读时不保存，下次重新采样
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_index(file_path):
+    # 读取（必要时重建）日志的时间索引
+    stat = os.stat(file_path)
+    loaded = _loaded.get(file_path)
+    if loaded is not None and loaded.size == stat.st_size and loaded.mtime_ns == stat.st_mtime_ns:
+        return loaded
+    index_path = _index_path(file_path)
+    arrays = _read_index(index_path, stat.st_size, stat.st_mtime_ns)
+    if arrays is None:
+        arrays = build_index(file_path)
+        if arrays[0]:
+            # 一个时间戳也没找到时不留索引文件，按时间过滤对这种文件本来就没有意义
+            _write_index(index_path, stat.st_size, stat.st_mtime_ns, *arrays)
+    loaded = _loaded[file_path] = TimeIndex(stat.st_size, stat.st_mtime_ns, *arrays)
+    return loaded
+
+
+def byte_range(file_path, time_range):
+    # 返回 (start, end, lo, hi)：只需读取的字节范围，以及这个文件上按微秒计的时间窗口
+    index = load_index(file_path)
+    lo, hi = time_range.resolve(index.first_time(), ignore_date=index.time_of_day)
+    start, end = index.byte_range(lo, hi)
+    return start, end, lo, hi
+
+
+def line_timer(file_path):
+    # 这个文件的行时间戳解析函数：没有日期的日志按一天中的时间，与 byte_range 给出的窗口一致
+    return time_of_day if load_index(file_path).time_of_day else line_time
+
+
+def filter_lines(lines, lo, hi, timer=line_time):
+    # 只保留时间戳在 [lo, hi] 内的行；timer 为 line_timer(file_path)
+    for line in lines:
+        timestamp = timer(line)
+        if timestamp is not None and lo <= timestamp <= hi:
+            yield line
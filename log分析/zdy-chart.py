@@ -1,66 +1,227 @@
+import os
 import re
+import argparse
 import matplotlib.pyplot as plt
-from datetime import datetime
 import matplotlib as mpl
 import matplotlib.dates as mdates
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as tk
+import numpy as np
+from line_classifier import Rule, LineClassifier
+from mmap_scan import scan_log
+from time_index import add_time_range_arguments, time_range_from_args
 # 设置中文字体
 mpl.rcParams['font.sans-serif'] = ['SimHei']  # 指定默认字体为黑体
 mpl.rcParams['axes.unicode_minus'] = False  # 解决保存图像时负号'-'显示为方块的问题
-def plot_log_data(log_file, pattern, ax=None, fig=None, root=None):
-    data = []
-    timestamps = []
-    # 转义方括号和其他特殊字符
-    escaped_pattern = re.escape(pattern).replace('XXX', r'(-?\d+)')
-    regex = re.compile(escaped_pattern)
-    # 匹配时间的正则表达式
-    time_regex = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{6})')
-    # 读取日志文件
-    with open(log_file, 'r', encoding='utf-8', errors='ignore') as file:
-        for line in file:
-            time_match = time_regex.search(line)
-            rssi_match = regex.search(line)
-            if time_match and rssi_match:
-                time_str = time_match.group(1)
-                time = datetime.strptime(time_str, '%H:%M:%S.%f')
-                timestamps.append(time)
-                data.append(int(rssi_match.group(1)))
-    # 打印数据点数量
-    print(f"找到的数据点数量：{len(data)}")
-    if len(data) == 0:
+# 读取格式（模板）：
+#   XXX            整数，兼容原来的写法（只提取第一个 XXX，曲线名为整个模板）
+#   {名称:int}     整数       {名称:float}   小数（可带指数）
+#   {名称:hex}     十六进制（可带 0x），例如 {temp:hex}
+#   {名称}         同 {名称:int}
+# 一个模板可以有多个命名占位符，例如 "Cpus Usage [{cpu0}], [{cpu1}]" 或
+# "healthd: battery l={level} v={volt} t={temp:float}"，一次扫描得到多条曲线。
+# 匹配时只把时间和各占位符的文字收集起来，每 CONVERT_CHUNK 行用 numpy 批量转换成数组，
+# 不对每个匹配调用 int()/strptime。
+FIELD_TYPES = {
+    'int': r'-?[0-9]+',
+    'float': r'-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?',
+    'hex': r'(?:0[xX])?([0-9a-fA-F]+)',
+}
+CONVERT_CHUNK = 65536
+# 查表求和在 int64 中进行，超过 15 位的十六进制数改为逐个用 int(x, 16) 转换
+MAX_HEX_DIGITS = 15
+_FIELD_RE = re.compile(r'\{([A-Za-z_]\w*)(?::(\w+))?\}|XXX')
+TIME_RE = re.compile(r'[0-9]{2}:[0-9]{2}:[0-9]{2}\.[0-9]{6}')
+# 与原来 strptime('%H:%M:%S.%f') 一样，时间都落在 1900-01-01
+_TIME_BASE = np.datetime64('1900-01-01T00:00:00', 'us')
+_TIME_WEIGHTS = np.array([36000, 3600, 600, 60, 10, 1]) * 1000000
+_HEX_DIGITS = np.zeros(256, dtype=np.int64)
+_HEX_DIGITS[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_HEX_DIGITS[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+_HEX_DIGITS[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+def parse_times(texts):
+    # ["HH:MM:SS.ffffff", ...] -> datetime64[us] 数组
+    digits = np.array(texts, dtype='S15').view(np.uint8).reshape(-1, 15).astype(np.int64) - ord('0')
+    us = digits[:, [0, 1, 3, 4, 6, 7]] @ _TIME_WEIGHTS + digits[:, 9:] @ (10 ** np.arange(5, -1, -1))
+    return _TIME_BASE + us.astype('timedelta64[us]')
+def _convert_each(texts, convert, dtype):
+    # 逐个转换，出错（格式不对或超出 64 位整数）时报出是哪一项
+    values = np.empty(len(texts), dtype=dtype)
+    for index, text in enumerate(texts):
+        try:
+            values[index] = convert(text)
+        except (ValueError, OverflowError):
+            raise ValueError(f"无法转换数值: {text}") from None
+    return values
+def parse_hex(texts):
+    # ["1f", "0A", ...]（已去掉 0x）-> int64 数组：按字节查表得到每一位，再按位权求和
+    raw = np.array(texts, dtype=bytes)
+    width = raw.dtype.itemsize
+    if width > MAX_HEX_DIGITS:
+        # 16 位起按位权求和会溢出 int64
+        return _convert_each(texts, lambda text: int(text, 16), np.int64)
+    codes = raw.view(np.uint8).reshape(-1, width)
+    lengths = (codes != 0).sum(axis=1)
+    exponents = lengths[:, None] - 1 - np.arange(width)
+    return (_HEX_DIGITS[codes] * np.where(exponents >= 0, 16 ** np.maximum(exponents, 0), 0)).sum(axis=1)
+def convert_column(texts, kind):
+    if kind == 'hex':
+        return parse_hex(texts)
+    # 整列交给 numpy 一次转换，比逐个 int()/float() 快得多；有转换不了的项时改为逐个转换，报出出错的那一项
+    dtype = np.float64 if kind == 'float' else np.int64
+    try:
+        return np.array(texts).astype(dtype)
+    except (ValueError, OverflowError):
+        return _convert_each(texts, float if kind == 'float' else int, dtype)
+class Template:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        # [(曲线名, 类型)]，顺序与正则中的捕获组一致
+        self.fields = []
+        literals = []
+        regex = []
+        pos = 0
+        for match in _FIELD_RE.finditer(pattern):
+            literals.append(pattern[pos:match.start()])
+            # 转义方括号和其他特殊字符
+            regex.append(re.escape(literals[-1]))
+            pos = match.end()
+            if match.group() == 'XXX':
+                if any(label == pattern for label, _ in self.fields):
+                    regex.append(f"(?:{FIELD_TYPES['int']})")
+                    continue
+                label, kind = pattern, 'int'
+            else:
+                label, kind = match.group(1), match.group(2) or 'int'
+                if kind not in FIELD_TYPES:
+                    raise ValueError(f"不支持的类型 {kind}，可用: {', '.join(FIELD_TYPES)}")
+                if any(label == existing for existing, _ in self.fields):
+                    raise ValueError(f"名称 {label} 重复")
+            self.fields.append((label, kind))
+            regex.append(FIELD_TYPES[kind] if kind == 'hex' else f'({FIELD_TYPES[kind]})')
+        literals.append(pattern[pos:])
+        regex.append(re.escape(literals[-1]))
+        if not self.fields:
+            raise ValueError("读取格式中没有 XXX 或 {名称:类型}")
+        if not ''.join(literals).strip():
+            raise ValueError("读取格式中除了占位符还需要有固定的文字")
+        # 第一个占位符之前的固定文字作为分类器锚点；扫描文件时按最长的一段固定文字查找（可能以占位符开头）
+        self.rule = Rule(pattern, literals[0], ''.join(regex))
+        self.scan_anchor = max(literals, key=len)
+class _Columns:
+    # 一个模板的匹配结果：每行只记下时间文字和 match.groups()，每 CONVERT_CHUNK 行转置后批量转换成数组
+    def __init__(self, template):
+        self.template = template
+        self.pending_times = []
+        self.pending = []
+        self.times = []
+        self.values = [[] for _ in template.fields]
+    def add(self, time_text, match):
+        self.pending_times.append(time_text)
+        self.pending.append(match.groups())
+        if len(self.pending) >= CONVERT_CHUNK:
+            self.flush()
+    def flush(self):
+        if not self.pending:
+            return
+        self.times.append(parse_times(self.pending_times))
+        for values, column, (_, kind) in zip(self.values, zip(*self.pending), self.template.fields):
+            values.append(convert_column(column, kind))
+        self.pending_times.clear()
+        self.pending.clear()
+    def result(self):
+        # {曲线名: (datetime64 时间数组, 数值数组)}，同一模板的曲线共用时间数组
+        self.flush()
+        times = np.concatenate(self.times) if self.times else np.array([], dtype='datetime64[us]')
+        return {label: (times, np.concatenate(values) if values else np.array([], dtype=np.float64 if kind == 'float' else np.int64))
+                for (label, kind), values in zip(self.template.fields, self.values)}
+# 交互会话：同一个日志文件上输入的所有模板共用一个会话，提取过的数据留在内存里，
+# 叠加（add:）和重画直接用内存中的数据；还没有数据的模板编译进一个多模式匹配器
+# （line_classifier：字面锚点预过滤 + 各自的正则），一次扫描文件同时提取，
+# 且只解码含有锚点的行（mmap_scan）。日志文件变化（例如还在增长）后整体重新提取。
+class ChartSession:
+    def __init__(self, log_file, time_range=None):
+        self.log_file = log_file
+        self.time_range = time_range
+        # 模板 -> {曲线名: (时间数组, 数值数组)}
+        self.series = {}
+        self.version = None
+    def extract(self, patterns):
+        # 返回 {模板: {曲线名: (时间数组, 数值数组)}}，只扫描还没有数据的模板
+        stat = os.stat(self.log_file)
+        if (stat.st_size, stat.st_mtime_ns) != self.version:
+            self.series.clear()
+            self.version = (stat.st_size, stat.st_mtime_ns)
+        missing = [pattern for pattern in dict.fromkeys(patterns) if pattern not in self.series]
+        if missing:
+            self._scan([Template(pattern) for pattern in missing])
+        return {pattern: self.series[pattern] for pattern in patterns}
+    def _scan(self, templates):
+        classifier = LineClassifier(template.rule for template in templates)
+        columns = {template.pattern: _Columns(template) for template in templates}
+        # 给出 time_range 时用时间索引只读取这段时间对应的字节
+        anchors = [template.scan_anchor for template in templates]
+        with scan_log(self.log_file, anchors, time_range=self.time_range) as file:
+            for line in file:
+                hits = classifier.match_all(line)
+                if not hits:
+                    continue
+                time_match = TIME_RE.search(line)
+                if time_match is None:
+                    continue
+                for pattern, match in hits:
+                    columns[pattern].add(time_match.group(), match)
+        for pattern, column in columns.items():
+            self.series[pattern] = column.result()
+def plot_log_data(session, patterns, ax=None, fig=None, root=None):
+    # 在现有或新的图表上重画 patterns 的曲线，返回 (fig, ax, root, 实际画出的模式)
+    series = session.extract(patterns)
+    for pattern in patterns:
+        # 打印数据点数量（同一模板的各条曲线点数相同）
+        print(f"{pattern} 找到的数据点数量：{min(len(times) for times, _ in series[pattern].values())}")
+    patterns = [pattern for pattern in patterns if min(len(times) for times, _ in series[pattern].values())]
+    if not patterns:
         print("没有找到匹配的数据点。请检查日志文件格式和匹配模式。")
-        return None, None, None
+        return fig, ax, root, []
     if ax is None or fig is None or root is None:
         # 创建新的图形窗口
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.set_title('变化图表')
-        ax.set_xlabel('时间')
-        ax.set_ylabel('变化值')
-        ax.grid(True)
-        # 设置x轴时间格式
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-        fig.autofmt_xdate()
         # 创建Tkinter窗口
         root = tk.Tk()
-        root.title(f"变化图表 - {log_file}")
+        root.title(f"变化图表 - {session.log_file}")
         # 将matplotlib图形嵌入Tkinter窗口
         canvas = FigureCanvasTkAgg(fig, master=root)
         canvas.draw()
         canvas.get_tk_widget().pack()
-    # 在现有或新的图表上绘制数据
-    ax.plot(timestamps, data, marker='o', label=pattern)
+    ax.clear()
+    ax.set_title('变化图表')
+    ax.set_xlabel('时间')
+    ax.set_ylabel('变化值')
+    ax.grid(True)
+    for pattern in patterns:
+        for label, (timestamps, data) in series[pattern].items():
+            ax.plot(timestamps, data, marker='o', label=label)
+    # 设置x轴时间格式
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+    fig.autofmt_xdate()
     ax.legend()
     # 更新图表
     fig.canvas.draw_idle()  # 使用 draw_idle() 替代 draw()
     # 非阻塞方式显示窗口
     root.update()
-    return fig, ax, root
+    return fig, ax, root, patterns
 def main():
-    log_file = input("请输入日志文件路径：").strip()
+    parser = argparse.ArgumentParser(description='按自定义格式提取日志中的数值并绘图')
+    parser.add_argument('log_file', nargs='?', help='日志文件路径，不给出时提示输入')
+    add_time_range_arguments(parser)
+    args = parser.parse_args()
+    log_file = args.log_file or input("请输入日志文件路径：").strip()
+    session = ChartSession(log_file, time_range_from_args(args))
     fig = ax = root = None
+    # 当前图表上的模式
+    active = []
     while True:
-        pattern = input("请输入读取格式(使用XXX表示要提取的数值,输入'q'退出,输入'add:'添加数据): ").strip()
+        pattern = input("请输入读取格式(使用XXX或{名称:int/float/hex}表示要提取的数值,输入'q'退出,输入'add:'添加数据): ").strip()
         if pattern.lower() == 'q':
             break
         if not pattern.startswith("add:"):
@@ -68,11 +229,13 @@ def main():
             if root:
                 root.destroy()
             fig = ax = root = None
+            active = []
         else:
             # 如果是添加模式，移除"add:"前缀
             pattern = pattern[4:]
         try:
-            fig, ax, root = plot_log_data(log_file, pattern, ax, fig, root)
+            fig, ax, root, drawn = plot_log_data(session, active + [pattern], ax, fig, root)
+            active = drawn or active
         except FileNotFoundError:
             print(f"错误：找不到文件 '{log_file}'。")
         except Exception as e:
@@ -81,4 +244,4 @@ def main():
     if root:
         root.mainloop()
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
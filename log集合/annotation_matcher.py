@@ -0,0 +1,79 @@
+import re
+
+# 简约日志的注释匹配引擎
+# 原来的做法是对每一行按顺序遍历所有关键字做 key in line，命中第一个就停止，
+# 代价是 行数 × 规则数。这里把所有关键字编译成一个前缀树结构的正则：
+# 在行内每个位置上只沿着前缀树往下走一次，得到从该位置开始的最长关键字，
+# 每行的代价基本只和行长有关，与规则数量无关。
+#
+# 为了保持"按规则文件顺序取第一个命中"的结果：从同一位置开始能命中的关键字，
+# 都是最长命中关键字的前缀，所以预先为每个关键字算出"它和它所有是关键字的前缀中
+# 顺序最靠前的那个"，整行的结果就是所有位置上这个值的最小者。
+
+
+def _build_trie(keys):
+    root = {}
+    for key in keys:
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    return root
+
+
+def _trie_pattern(node):
+    alternatives = [re.escape(ch) + _trie_pattern(child)
+                    for ch, child in sorted(node.items()) if ch != '']
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in node:
+        return alternatives[0]
+    group = '(?:' + '|'.join(alternatives) + ')'
+    # 当前节点本身也是一个关键字时整组可选，贪婪匹配保证先尝试更长的关键字
+    return group + '?' if '' in node else group
+
+
+class AnnotationMatcher:
+    def __init__(self, annotations):
+        self.keys = list(annotations)
+        self.values = [annotations[key] for key in self.keys]
+        rank = {key: index for index, key in enumerate(self.keys)}
+
+        # 空关键字对每一行都成立
+        self.empty_rank = rank.pop('', None)
+
+        # best_rank[key]：key 及其所有是关键字的前缀中，规则顺序最靠前的序号
+        self.best_rank = {}
+        for key in rank:
+            best = rank[key]
+            for end in range(1, len(key)):
+                prefix_rank = rank.get(key[:end])
+                if prefix_rank is not None and prefix_rank < best:
+                    best = prefix_rank
+            self.best_rank[key] = best
+
+        if rank:
+            pattern = _trie_pattern(_build_trie(rank))
+            # 先用普通搜索快速排除不含任何关键字的行，并找到第一个命中位置
+            self.search = re.compile(pattern).search
+            # 零宽前瞻让 finditer 在每个位置都尝试一次，重叠的关键字也不会漏掉
+            self.regex = re.compile('(?=(' + pattern + '))')
+        else:
+            self.regex = None
+
+    def match(self, line):
+        # 返回 (关键字, 注释)，没有命中返回 None
+        best = self.empty_rank
+        if self.regex is not None and best != 0:
+            first = self.search(line)
+            if first is not None:
+                best_rank = self.best_rank
+                for match in self.regex.finditer(line, first.start()):
+                    rank = best_rank[match.group(1)]
+                    if best is None or rank < best:
+                        best = rank
+                        if best == 0:
+                            break
+        if best is None:
+            return None
+        return self.keys[best], self.values[best]
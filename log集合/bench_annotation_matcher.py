@@ -0,0 +1,76 @@
+import random
+import sys
+import time
+
+from annotation_matcher import AnnotationMatcher
+
+# 注释匹配基准：1000 条合成关键字，对比原来逐条 key in line 与 AnnotationMatcher
+# 用法: python bench_annotation_matcher.py [日志行数] [关键字数]
+# 原来的逐条匹配太慢，只在前 BASELINE_LINES 行上测速
+
+BASELINE_LINES = 100000
+BATCH = 100000
+WORDS = ['Activity', 'Manager', 'Window', 'Focus', 'Power', 'Screen', 'Biometric', 'Input', 'Surface',
+         'Display', 'Battery', 'Thermal', 'Wifi', 'Radio', 'Camera', 'Audio', 'Sensor', 'Touch']
+
+
+def make_annotations(count, rng):
+    annotations = {}
+    while len(annotations) < count:
+        key = ''.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))) + rng.choice([':', ' type=', '_'])
+        annotations[key] = f"注释{len(annotations)}"
+    return annotations
+
+
+def synthetic_log(count, keys, rng):
+    for start in range(0, count, BATCH):
+        batch = []
+        for n in range(start, min(start + BATCH, count)):
+            body = ' '.join(rng.choice(WORDS) for _ in range(8))
+            if rng.random() < 0.02:
+                body += ' ' + rng.choice(keys)
+            batch.append(f"10-21 14:03:{n // 1000 % 60:02d}.{n % 1000000:06d}  1000  1000 I Tag: {body} {n}")
+        yield batch
+
+
+def baseline_match(line, annotations):
+    for key, value in annotations.items():
+        if key in line:
+            return key, value
+    return None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    key_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(7)
+    annotations = make_annotations(key_count, rng)
+    keys = list(annotations)
+
+    start = time.perf_counter()
+    matcher = AnnotationMatcher(annotations)
+    print(f"编译 {key_count} 条规则耗时 {time.perf_counter() - start:.3f}s")
+
+    baseline_time = matcher_time = 0.0
+    baseline_count = 0
+    mismatches = 0
+    for batch in synthetic_log(count, keys, rng):
+        start = time.perf_counter()
+        hits = [matcher.match(line) for line in batch]
+        matcher_time += time.perf_counter() - start
+
+        if baseline_count < BASELINE_LINES:
+            start = time.perf_counter()
+            expected = [baseline_match(line, annotations) for line in batch]
+            baseline_time += time.perf_counter() - start
+            baseline_count += len(batch)
+            mismatches += sum(1 for a, b in zip(hits, expected) if a != b)
+
+    print(f"逐条 key in line: {baseline_count / baseline_time:,.0f} 行/秒 (前 {baseline_count:,} 行)")
+    print(f"AnnotationMatcher: {count / matcher_time:,.0f} 行/秒 ({count:,} 行, 耗时 {matcher_time:.2f}s)")
+    if mismatches:
+        print(f"警告：{mismatches} 行的匹配结果与原来不一致")
+
+
+if __name__ == "__main__":
+    main()
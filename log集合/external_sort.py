@@ -0,0 +1,51 @@
+import heapq
+import os
+import tempfile
+from operator import itemgetter
+
+# 外部归并排序：把 (时间戳, 行) 按内存预算切成若干段，每段排好序写到临时目录，
+# 再对所有段做 k 路归并。时间戳相同的行保持原来的先后顺序（稳定排序）。
+
+# 估算一条 (int, str) 元组在内存中除字符本身以外的开销
+ENTRY_OVERHEAD = 150
+# 归并时每个段文件的读缓冲区，段很多时也不会占用太多内存
+RUN_READ_BUFFER = 64 * 1024
+
+
+def _write_run(chunk, temp_dir):
+    chunk.sort(key=itemgetter(0))
+    fd, path = tempfile.mkstemp(suffix='.run', dir=temp_dir)
+    with open(fd, 'w', encoding='utf-8') as run_file:
+        for timestamp, line in chunk:
+            run_file.write(f"{timestamp}\t{line}\n")
+    return path
+
+
+def spill_sorted_runs(entries, temp_dir, run_bytes):
+    runs = []
+    chunk = []
+    size = 0
+    for timestamp, line in entries:
+        chunk.append((timestamp, line))
+        size += len(line) + ENTRY_OVERHEAD
+        if size >= run_bytes:
+            runs.append(_write_run(chunk, temp_dir))
+            chunk = []
+            size = 0
+    if chunk:
+        runs.append(_write_run(chunk, temp_dir))
+    return runs
+
+
+def read_run(path):
+    with open(path, 'r', encoding='utf-8', buffering=RUN_READ_BUFFER) as run_file:
+        for raw in run_file:
+            timestamp, line = raw.rstrip('\n').split('\t', 1)
+            yield int(timestamp), line
+    os.remove(path)
+
+
+def external_sorted_entries(entries, temp_dir, run_bytes):
+    # 返回按时间戳有序的 (时间戳, 行) 迭代器，内存中最多同时保留约 run_bytes 的数据
+    runs = spill_sorted_runs(entries, temp_dir, run_bytes)
+    return heapq.merge(*[read_run(path) for path in runs], key=itemgetter(0))
@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+merge_log = __import__('合并log')
+
+# 乱序计数的回归测试：预扫描 scan_disorder 和写出时的 reorder_entries 用同一种方式计数，
+# 每一行输出时早于已输出最大时间戳的行都计入；外部排序后合并结果严格按时间排序。
+# 用法: python -m pytest test_merge_log.py
+
+BLOCKS = 7
+BLOCK_LINES = 500
+WINDOW = 10
+
+
+def _shuffled_blocks(seed=1):
+    # 7 块各 500 行，块内有序，块的顺序打乱
+    rng = random.Random(seed)
+    blocks = []
+    for block in range(BLOCKS):
+        lines = []
+        for index in range(BLOCK_LINES):
+            us = (block * BLOCK_LINES + index) * 1000
+            second, micro = divmod(us, 1000000)
+            lines.append(f"10-21 14:{second // 60:02d}:{second % 60:02d}.{micro:06d}  100  100 I tag: line {block}-{index}")
+        blocks.append(lines)
+    rng.shuffle(blocks)
+    return [line for block in blocks for line in block]
+
+
+def _expected_late(lines):
+    # 按定义直接数：窗口为 WINDOW 的重排缓冲区输出时，早于已输出最大值的行
+    stats = {'late': 0}
+    entries = [(merge_log.extract_timestamp(line), line) for line in lines]
+    list(merge_log.reorder_entries(iter(entries), WINDOW, stats))
+    return stats['late']
+
+
+def test_disorder_counts_match():
+    lines = _shuffled_blocks()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'main_log_1__2024_1021_140300')
+        with open(path, 'w', encoding='utf-8', newline='\n') as file:
+            file.write('\n'.join(lines) + '\n')
+        late, ordered, count, _ = merge_log.scan_disorder(path, WINDOW)
+    expected = _expected_late(lines)
+    assert not ordered and count == len(lines)
+    assert late == expected
+    # 至少有几个整块放错了位置，而不是只数到块边界上的几次回跳
+    assert late >= BLOCK_LINES
+
+
+def test_sorted_input_has_no_late_lines():
+    lines = sorted(_shuffled_blocks())
+    assert _expected_late(lines) == 0
+
+
+def test_merged_output_sorted():
+    lines = _shuffled_blocks()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, 'main_log_1__2024_1021_140300'), 'w', encoding='utf-8', newline='\n') as file:
+            file.write('\n'.join(lines) + '\n')
+        # 注释规则从当前目录的 log过滤器.txt 读取
+        with open(os.path.join(folder, 'log过滤器.txt'), 'w', encoding='utf-8') as file:
+            file.write('"tag: line 0-": "第一块"\n')
+        os.chdir(folder)
+        try:
+            merge_log.merge_logs(folder, reorder_window=WINDOW)
+        finally:
+            os.chdir(cwd)
+        with open(os.path.join(folder, '完整log集合.log'), encoding='utf-8') as file:
+            merged = file.read().splitlines()
+    timestamps = [merge_log.extract_timestamp(line) for line in merged]
+    assert len(merged) == len(lines)
+    assert timestamps == sorted(timestamps)
+
+
+if __name__ == "__main__":
+    test_disorder_counts_match()
+    test_sorted_input_has_no_late_lines()
+    test_merged_output_sorted()
+    print("OK")
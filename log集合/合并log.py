@@ -1,36 +1,44 @@
 import os
 import glob
-import subprocess
+import mmap
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
+import time
+import heapq
+import argparse
+import tempfile
+from collections import deque
+from itertools import chain
+from operator import itemgetter
+from external_sort import external_sorted_entries, ENTRY_OVERHEAD
+from annotation_matcher import AnnotationMatcher
 
-def convert_kernel_log_to_localtime(log_file):
-    localtime_file = f"{log_file}.localtime"
-    print("当前工作目录:", os.getcwd())
-    
-    # 获取 ktime_convert.exe 的路径
-    ktime_convert_path = get_executable_path()  # 新增获取路径的函数
-
-    try:
-        subprocess.run([ktime_convert_path, log_file], check=True)  # 使用获取的路径
-    except subprocess.CalledProcessError as e:
-        print(f"Error occurred while running ktime_convert.exe: {e}")
-        return None
-    
-    if not os.path.exists(localtime_file):
-        print(f"Error: The .localtime file '{localtime_file}' was not created.")
-        return None
+# ktime_convert / time_index / profiler / diagnostics 只在 log分析 中保存一份，本脚本依赖仓库的目录结构，
+# 从同级的 log分析 目录导入（见 README）。单独复制 log集合 使用时，把这四个文件一起复制到本目录；
+# PyInstaller 打包时加上 --paths ../log分析
+SHARED_MODULES = ('ktime_convert', 'time_index', 'profiler', 'diagnostics')
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'log分析')
+if os.path.isdir(SHARED_DIR):
+    sys.path.append(SHARED_DIR)
+try:
+    from ktime_convert import open_log, is_raw_kernel_log, kernel_log_source
+    from time_index import add_time_range_arguments, time_range_from_args, byte_range, filter_lines, format_time, MIN_TIME, MAX_TIME
+    import profiler
+    from profiler import add_profile_arguments, profile_from_args, stage
+    from diagnostics import note, Lazy, add_logging_arguments, diagnostics_from_args
+except ModuleNotFoundError as e:
+    if e.name not in SHARED_MODULES:
+        raise
+    sys.exit(f"找不到共用模块 {e.name}：合并log.py 需要与 log分析 目录放在同一个上级目录下，"
+             f"或者把 log分析 中的 {', '.join(name + '.py' for name in SHARED_MODULES)} 复制到 "
+             f"{os.path.dirname(os.path.abspath(__file__))}")
 
-    return localtime_file
-
-def get_executable_path():
-    if getattr(sys, 'frozen', False):
-        # 如果是打包后的可执行文件
-        return os.path.join(sys._MEIPASS, 'ktime_convert.exe')
-    else:
-        # 如果是源代码
-        return 'ktime_convert.exe'
+# 每个文件的重排缓冲区行数，单个文件内的乱序距离超过它时需要更大的窗口
+REORDER_WINDOW = 4096
+OUTPUT_BUFFER = 1 << 20
+# 外部排序时的默认内存上限(MB)
+MAX_MEMORY_MB = 512
 
 def load_log_annotations(file_path):
     annotations = {}
@@ -47,27 +55,187 @@ def load_log_annotations(file_path):
                 annotations[key] = value  # 去掉多余的空格
     return annotations
 
+_TIMESTAMP_RE = re.compile(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.(\d+)')
+_EPOCH = datetime(1970, 1, 1)
+_CURRENT_YEAR = datetime.now().year
+# "MM-DD HH:MM:SS" -> 该秒的微秒时间戳，同一秒内的行不再重复解析
+_second_cache = {}
+
 def extract_timestamp(line):
-    try:
-        match = re.search(r'(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+)', line)
-        if match:
-            timestamp_str = match.group(1)
-            current_year = datetime.now().year
-            timestamp_str_with_year = f"{current_year}-{timestamp_str}"
-            timestamp = datetime.strptime(timestamp_str_with_year, '%Y-%m-%d %H:%M:%S.%f')
-            return timestamp
-        else:
-            return None
-    except (ValueError, IndexError) as e:
-        print(f"无法解析时间戳，跳过该行: {line.strip()}，错误信息: {e}")
+    # 返回整数微秒时间戳（相对 1970-01-01），需要显示时再用 format_timestamp 转换
+    match = _TIMESTAMP_RE.search(line)
+    if not match:
         return None
+    head, frac = match.groups()
+    if len(frac) > 6:
+        note('无法解析时间戳', "无法解析时间戳，跳过该行: %s，错误信息: 小数位超过6位", Lazy(str.strip, line))
+        return None
+    base = _second_cache.get(head)
+    if base is None:
+        try:
+            dt = datetime(_CURRENT_YEAR, int(head[0:2]), int(head[3:5]),
+                          int(head[6:8]), int(head[9:11]), int(head[12:14]))
+        except ValueError as e:
+            note('无法解析时间戳', "无法解析时间戳，跳过该行: %s，错误信息: %s", Lazy(str.strip, line), e)
+            return None
+        base = (dt - _EPOCH) // timedelta(microseconds=1)
+        if len(_second_cache) >= 65536:
+            _second_cache.clear()
+        _second_cache[head] = base
+    return base + int(frac.ljust(6, '0'))
+
+def format_timestamp(us):
+    return (_EPOCH + timedelta(microseconds=us)).strftime('%Y-%m-%d %H:%M:%S.%f')
 
 def remove_original_timestamp(line):
     # 使用正则去除日志中原始的时间戳部分，只应用于简约日志
     line = re.sub(r'\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+', '', line, 1).strip()
     return line
 
-def merge_logs(folder_path):
+def read_log_entries(log_file, time_range=None):
+    # 逐行读取单个日志文件，产出 (时间戳, 去掉首尾空白的行)；
+    # 给出 time_range 时用时间索引只读取这段时间对应的字节，范围外的行不输出
+    start, end, lo, hi = byte_range(log_file, time_range) if time_range else (0, None, None, None)
+    with open_log(log_file, start, end) as file:
+        for line in profiler.counted(filter_lines(file, lo, hi) if time_range else file, 'read.lines'):
+            timestamp = extract_timestamp(line)
+            if timestamp is not None:
+                yield timestamp, line.strip()
+            else:
+                note('无效时间戳', "无效时间戳，跳过该行: %s", Lazy(str.strip, line))
+
+def bounded_reorder(items, window, stats, heap=None, high=None):
+    # 有界重排缓冲区：缓冲区满后每进一项就输出其中最早的一项。
+    # 输出时比已经输出过的最大时间戳还早的项即超出窗口的乱序行，计入 stats['late']；
+    # 这样的行不更新最大值，之后的行仍和真正的最大值比较，每一行放错位置的行都会被计数。
+    # items 按元组比较、第一项为时间戳；heap / high 为已经在缓冲区中的项和已输出的最大时间戳（预扫描接续用）
+    heap = [] if heap is None else heap
+    late = 0
+    for item in items:
+        if len(heap) < window:
+            heapq.heappush(heap, item)
+            continue
+        item = heapq.heappushpop(heap, item)
+        if high is not None and item[0] < high:
+            late += 1
+        else:
+            high = item[0]
+        yield item
+    while heap:
+        item = heapq.heappop(heap)
+        if high is not None and item[0] < high:
+            late += 1
+        else:
+            high = item[0]
+        yield item
+    stats['late'] += late
+
+def reorder_entries(entries, window, stats):
+    # 单个文件基本按时间有序，窗口内的轻微乱序在这里排好；同一时间戳按文件中的顺序
+    items = ((timestamp, seq, line) for seq, (timestamp, line) in enumerate(entries))
+    for timestamp, _, line in bounded_reorder(items, window, stats):
+        yield timestamp, line
+
+# 预扫描时直接在字节上取时间戳：普通日志取行首的 "MM-DD HH:MM:SS.fff"（同一年内按字节比较即按时间比较），
+# 原始 kernel_log 取开机时间。以 "\n" 开头只匹配行首，比 (?m)^ 快一倍
+_LINE_TIME_RE = re.compile(rb'\n(\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+)')
+_UPTIME_RE = re.compile(rb'\n(?:<\d+>)?\[\s*(\d+\.\d+)\]')
+
+def _line_heads(pattern, mm, start, end):
+    # start 在行首；文件第一行前面没有换行，单独匹配
+    if start == 0:
+        match = pattern.match(b'\n' + mm[0:min(end, 64)])
+        if match:
+            yield match.group(1)
+    for match in pattern.finditer(mm, max(start - 1, 0), end):
+        yield match.group(1)
+
+def _scan_keys(mm, start, end, raw_kernel_log, lo, hi):
+    if raw_kernel_log:
+        return map(float, _line_heads(_UPTIME_RE, mm, start, end))
+    keys = _line_heads(_LINE_TIME_RE, mm, start, end)
+    # 范围两端换成同样格式的字节串；下界去掉小数末尾的 0，使 ".123" 与 ".123000" 相等时不被排除
+    lo_key = format_time(lo).rstrip('0').rstrip('.').encode() if lo not in (None, MIN_TIME) else None
+    hi_key = format_time(hi).encode() if hi not in (None, MAX_TIME) else None
+    if lo_key is None and hi_key is None:
+        return keys
+    return (key for key in keys if (lo_key is None or key >= lo_key) and (hi_key is None or key <= hi_key))
+
+def scan_disorder(log_file, window, time_range=None):
+    # 写输出之前先预扫描：不解码、不匹配注释，只取出每行的时间戳，用与 reorder_entries 相同的 bounded_reorder 模拟重排缓冲区。
+    # 返回 (超出窗口的乱序行数, 是否完全有序, 行数, 字节数)
+    start, end, lo, hi = byte_range(log_file, time_range) if time_range else (0, None, None, None)
+    with open(log_file, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return 0, True, 0, 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            keys = _scan_keys(mm, start, end, is_raw_kernel_log(log_file), lo, hi)
+            # 有序的部分不用模拟缓冲区：此时缓冲区里就是最近的 window 个时间戳，已输出的最后一个在它们之前
+            recent = deque(maxlen=window + 1)
+            lines = 0
+            for key in keys:
+                if recent and key < recent[-1]:
+                    break
+                recent.append(key)
+                lines += 1
+            else:
+                return 0, lines > 0, lines, end - start
+            # 有序的前缀已经输出到 recent[0]（最大值），缓冲区里是之后的 window 个
+            heap = [(key,) for key in recent]
+            high = heap.pop(0)[0] if len(heap) > window else None
+            buffered = len(heap)
+            stats = {'late': 0}
+            emitted = 0
+            for _ in bounded_reorder(((key,) for key in chain([key], keys)), window, stats, heap, high):
+                emitted += 1
+            # 每读入一行输出一行，缓冲区里原有的行已经计过数
+            lines += emitted - buffered
+    return stats['late'], False, lines, end - start
+
+# 关键字 -> 诊断消息的类别名，每个关键字只拼接一次
+_keyword_kinds = {}
+
+def find_annotation(line, annotation_matcher):
+    hit = annotation_matcher.match(line)
+    if hit is None:
+        return ''
+    key, value = hit
+    # 每个关键字单独计数
+    kind = _keyword_kinds.get(key)
+    if kind is None:
+        kind = _keyword_kinds[key] = f'匹配到关键字 {key}'
+    note(kind, "匹配到关键字: %s -> %s", key, value)
+    return value
+
+def write_merged_logs(streams, annotation_matcher, output_file_path, simplified_log_file_path):
+    # streams 是每个文件一个、已按时间戳排好序的 (时间戳, 行) 迭代器，做 k 路归并后边读边写
+    # heapq.merge 在时间戳相同时按文件顺序输出，与原来的稳定排序结果一致
+    with open(output_file_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER) as output_file, \
+         open(simplified_log_file_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER) as simplified_file:
+        # 同一时间戳的简约日志先攒起来排序再写出，保持原来整体字符串排序的结果
+        pending_timestamp = None
+        pending_logs = []
+        for timestamp, line in heapq.merge(*streams, key=itemgetter(0)):
+            # 完整日志保留原始行，不修改原始时间戳
+            output_file.write(line + '\n')
+
+            # 简约日志中去掉原始时间戳，并加上中文注释
+            annotation = find_annotation(line, annotation_matcher)
+            if annotation:
+                if timestamp != pending_timestamp:
+                    for log in sorted(pending_logs):
+                        simplified_file.write(log + '\n')
+                    pending_timestamp = timestamp
+                    pending_logs = []
+                line_without_timestamp = remove_original_timestamp(line)
+                pending_logs.append(f"{format_timestamp(timestamp)} [{annotation}] {line_without_timestamp}")
+        for log in sorted(pending_logs):
+            simplified_file.write(log + '\n')
+
+def merge_logs(folder_path, reorder_window=REORDER_WINDOW, max_memory=MAX_MEMORY_MB,
+               run_size=None, disorder_threshold=0, time_range=None):
     log_files = glob.glob(os.path.join(folder_path, 'main_log_*')) + \
                 glob.glob(os.path.join(folder_path, 'sys_log_*')) + \
                 glob.glob(os.path.join(folder_path, 'events_log_*')) + \
@@ -75,66 +243,100 @@ def merge_logs(folder_path):
                 glob.glob(os.path.join(folder_path, 'kernel_log_*'))
 
     print(f"找到的日志文件: {log_files}")
-    
-    merged_logs = []
-    simplified_logs = []
 
-    log_annotations = load_log_annotations('log过滤器.txt')
+    # 注释规则只编译一次，每行的匹配代价与规则数量无关
+    with stage('load_annotations'):
+        annotation_matcher = AnnotationMatcher(load_log_annotations('log过滤器.txt'))
+    if profiler.enabled:
+        # 所有关键字合成一个正则，只能统计整体的匹配耗时；各关键字的命中次数见逐条消息的汇总
+        annotation_matcher.match = profiler.timed('注释匹配', annotation_matcher.match)
 
+    # 原始 kernel_log 有最新的 .localtime 时读 .localtime，否则读取时直接换算本地时间；
+    # 同一份 kernel_log 的原始文件和 .localtime 只读其中一个
+    source_files = []
     for log_file in log_files:
-        if 'kernel_log_' in log_file and not log_file.endswith('.localtime'):
-            localtime_file = convert_kernel_log_to_localtime(log_file)
-            if localtime_file:
-                log_file = localtime_file
-
-        with open(log_file, 'r', encoding='utf-8', errors='ignore') as file:
-            for line in file:
-                timestamp = extract_timestamp(line)
-                if timestamp:
-                    # 保留 merged_logs 中的完整日志行，不修改原始时间戳
-                    merged_logs.append((timestamp, line.strip()))
-
-                    # 简约日志中去掉原始时间戳，并加上中文注释
-                    line_without_timestamp = remove_original_timestamp(line)
-                    annotation = ''
-                    for key, value in log_annotations.items():
-                        if key in line:  
-                            annotation = value
-                            print(f"匹配到关键字: {key} -> {value}")
-                            break
-
-                    if annotation:
-                        timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')
-                        simplified_logs.append(f"{timestamp_str} [{annotation}] {line_without_timestamp}")
-                else:
-                    print(f"无效时间戳，跳过该行: {line.strip()}")
-
-    # 按时间戳排序
-    merged_logs.sort(key=lambda x: x[0])
-
-    # 输出完整的 merged_logs 文件
+        if is_raw_kernel_log(log_file):
+            source_files.append(kernel_log_source(log_file))
+        elif not (log_file.endswith('.localtime') and log_file[:-len('.localtime')] in log_files):
+            source_files.append(log_file)
+    if time_range:
+        spans = [byte_range(log_file, time_range)[:2] for log_file in source_files]
+        total_bytes = sum(end - start for start, end in spans)
+    else:
+        total_bytes = sum(os.path.getsize(log_file) for log_file in source_files)
+
     output_file_path = os.path.join(folder_path, '完整log集合.log')
+    simplified_log_file_path = os.path.join(folder_path, '简约log.log')
     os.makedirs(folder_path, exist_ok=True)
+    start_time = time.perf_counter()
 
-    with open(output_file_path, 'w', encoding='utf-8') as output_file:
-        for _, log in merged_logs:
-            output_file.write(log + '\n')
-
-    print(f"合并后的日志文件已创建: {output_file_path}")
-
-    # 输出简约日志，只保留一个格式化的时间戳并加上注释
-    simplified_logs.sort()
+    # 先预扫描每个文件的乱序程度，再决定每个文件怎么读，输出只写一遍：
+    # 完全有序的文件直接归并；窗口内的轻微乱序经过有界重排缓冲区；
+    # 超出窗口的乱序行数超过阈值时，有这种乱序的文件改用外部排序
+    with stage('disorder_scan'):
+        scans = [scan_disorder(log_file, reorder_window, time_range) for log_file in source_files]
+    late_lines = sum(late for late, _, _, _ in scans)
+    external = late_lines > disorder_threshold
+    file_stats = [{'late': 0} for _ in source_files]
+    streams = []
+    reorder_bytes = 0
+    for log_file, (late, ordered, lines, size), stats in zip(source_files, scans, file_stats):
+        entries = read_log_entries(log_file, time_range)
+        if ordered or (external and late):
+            streams.append(entries)
+        else:
+            streams.append(reorder_entries(entries, reorder_window, stats))
+            # 重排缓冲区常驻内存，按平均行长估算，计入外部排序的内存上限
+            reorder_bytes += min(reorder_window, lines) * (size / max(lines, 1) + ENTRY_OVERHEAD)
 
-    simplified_log_file_path = os.path.join(folder_path, '简约log.log')
-    with open(simplified_log_file_path, 'w', encoding='utf-8') as simplified_file:
-        for log in simplified_logs:
-            simplified_file.write(log + '\n')
+    if external:
+        disordered_files = sorted(log_file for log_file, (late, _, _, _) in zip(source_files, scans) if late)
+        # 内存上限先扣除重排缓冲区，剩下的一半给排序段，其余留给归并时的读写缓冲
+        budget = max_memory * 1024 ** 2 - reorder_bytes
+        run_bytes = run_size * 1024 ** 2 if run_size else max(budget / 2, 1024 ** 2)
+        print(f"检测到 {late_lines} 行乱序超出重排窗口({reorder_window} 行)，涉及文件: {disordered_files}")
+        print(f"这些文件改用外部排序，每段 {run_bytes / 1024 ** 2:.0f} MB，"
+              f"其余文件的重排缓冲区约 {reorder_bytes / 1024 ** 2:.0f} MB，内存上限 {max_memory} MB")
+        if budget < run_bytes:
+            print("警告：重排缓冲区和排序段合计超出内存上限，可以减小 --reorder-window 或 --run-size")
+        with stage('external_sort_pass'), tempfile.TemporaryDirectory(prefix='merge_log_') as temp_dir:
+            streams = [external_sorted_entries(entries, temp_dir, run_bytes) if log_file in disordered_files else entries
+                       for log_file, entries in zip(source_files, streams)]
+            write_merged_logs(streams, annotation_matcher, output_file_path, simplified_log_file_path)
+    else:
+        if late_lines:
+            # 阈值以内的乱序不排序，这些行按重排缓冲区输出的位置写出
+            print(f"警告：{late_lines} 行乱序超出重排窗口({reorder_window} 行)，未超过 --disorder-threshold，"
+                  f"合并结果中这些行没有按时间排序")
+        with stage('merge_pass'):
+            write_merged_logs(streams, annotation_matcher, output_file_path, simplified_log_file_path)
+    # 预扫描按字节比较时间戳，与逐行解析的结果应当一致；多出来的乱序说明预扫描漏判
+    remaining = sum(stats['late'] for stats in file_stats)
+    if remaining > (0 if external else late_lines):
+        print(f"警告：合并结果中有 {remaining} 行超出重排窗口的乱序")
 
+    elapsed = time.perf_counter() - start_time
+    if profiler.enabled:
+        profiler.count('read.bytes', total_bytes)
+    print(f"合并后的日志文件已创建: {output_file_path}")
     print(f"简约日志文件已创建: {simplified_log_file_path}")
+    speed = total_bytes / 1024 ** 2 / elapsed if elapsed > 0 else 0
+    print(f"处理 {total_bytes / 1024 ** 2:.1f} MB，耗时 {elapsed:.2f}s，吞吐量 {speed:.1f} MB/s")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        log_file = sys.argv[1]
-    else:
-        log_file = input("请输入APlog文件夹路径: ").strip()
-    merge_logs(log_file)
+    parser = argparse.ArgumentParser(description='合并 APlog 文件夹中的日志')
+    parser.add_argument('folder', nargs='?', help='APlog 文件夹路径')
+    parser.add_argument('--reorder-window', type=int, default=REORDER_WINDOW, help='每个文件的重排缓冲区行数')
+    parser.add_argument('--max-memory', type=int, default=MAX_MEMORY_MB, help='外部排序时的内存上限(MB)')
+    parser.add_argument('--run-size', type=int, default=None, help='外部排序每段的大小(MB)，默认为内存上限扣除重排缓冲区后的一半')
+    parser.add_argument('--disorder-threshold', type=int, default=0,
+                        help='超出重排窗口的乱序行数（放错位置的行数）超过该值时改用外部排序；'
+                             '默认 0，只要有乱序就切换，结果严格按时间排序。大于 0 时阈值以内的乱序行保持原位置')
+    add_time_range_arguments(parser)
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    folder = args.folder or input("请输入APlog文件夹路径: ").strip()
+    with profile_from_args(args), diagnostics_from_args(args), stage('merge_logs'):
+        merge_logs(folder, args.reorder_window, args.max_memory, args.run_size, args.disorder_threshold,
+                   time_range_from_args(args))